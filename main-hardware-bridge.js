@@ -516,6 +516,11 @@ async function handlePythonEvent(event) {
       await handleFingerScanned(event);
       break;
     
+    case 'attendance_backfilled':
+      // Recovered from the device log after capture was interrupted; never opens the door
+      broadcastToWindows('attendance-backfilled', event);
+      break;
+    
     case 'enrollment_started':
       broadcastToWindows('enrollment-started', event);
       break;
@@ -548,6 +553,13 @@ async function handleFingerScanned(data) {
   
   log.info(`Finger scanned: user_id=${user_id}, punch_type=${punch_type}`);
   
+  // Events re-sent by a journal replay are old punches; the member is not at the door
+  if (data.replayed || data.backfilled) {
+    log.info(`Ignoring replayed scan for user_id=${user_id} (punched at ${data.punched_at})`);
+    broadcastToWindows('attendance-backfilled', data);
+    return;
+  }
+  
   try {
     // user_id from fingerprint device is the register_id in members table
     // Search by register_id and get full member data with activations in ONE call
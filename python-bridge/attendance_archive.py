@@ -0,0 +1,258 @@
+"""
+Attendance Archive - Local, verified copy of cleared attendance logs
+Before the device log is cleared, every record is written to a gzip
+compressed NDJSON file and read back to verify its record count and
+SHA-256 checksum. Cleared records are then served from the archive, so
+device-side pulls stay small however long the gym has been open.
+
+Layout:
+    <directory>/attendance-<created>.ndjson.gz   one file per archive run
+    <directory>/manifest.json                    entries with counts, checksums
+                                                 and the newest (timestamp, uid) key
+"""
+
+from zk.attendance import Attendance
+from attendance_sync import record_key, encode_cursor, decode_cursor
+from streaming import ndjson_stream, gzip_stream
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+FILE_PREFIX = "attendance-"
+FILE_SUFFIX = ".ndjson.gz"
+
+
+class AttendanceArchiveError(Exception):
+    """Raised when an archive fails verification"""
+
+
+def record_to_dict(record: Attendance) -> Dict:
+    """Archive line for one record (the API record plus the device status)"""
+    return {
+        "uid": record.uid,
+        "user_id": record.user_id,
+        "timestamp": record.timestamp.isoformat(),
+        "status": record.status,
+        "punch_type": record.punch
+    }
+
+
+def record_from_dict(line: Dict) -> Attendance:
+    return Attendance(line["user_id"], datetime.fromisoformat(line["timestamp"]),
+                      line.get("status", 1), line.get("punch_type", 0), line.get("uid", 0))
+
+
+class AttendanceArchive:
+    def __init__(self, directory: str = "data/attendance_archive"):
+        """
+        Initialize attendance archive (loads the manifest)
+
+        Args:
+            directory: Folder holding the archive files and manifest.json
+        """
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / "manifest.json"
+        self.entries: List[Dict] = []
+        self.load()
+
+    def load(self):
+        """Load the manifest (if any)"""
+        if not self.manifest_path.exists():
+            return
+
+        try:
+            with open(self.manifest_path, 'r') as f:
+                self.entries = json.load(f).get("archives", [])
+            logger.info(f"Loaded attendance archive manifest: {len(self.entries)} archive(s)")
+        except Exception as e:
+            logger.error(f"Error loading attendance archive manifest from {self.manifest_path}: {e}")
+
+    def _save_manifest(self):
+        """Persist the manifest (written atomically)"""
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"archives": self.entries, "updated_at": datetime.now().isoformat()}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    # ---------- writing ----------
+
+    def write(self, records: List[Attendance]) -> Dict:
+        """
+        Archive records and verify the file before it is committed
+
+        Args:
+            records: The full device log
+
+        Returns:
+            The manifest entry
+
+        Raises:
+            AttendanceArchiveError: If the written file does not read back
+                                    with the same count and checksum
+        """
+        records = sorted(records, key=record_key)
+        created = datetime.now()
+        path = self.directory / f"{FILE_PREFIX}{created:%Y%m%d-%H%M%S-%f}{FILE_SUFFIX}"
+        tmp_path = path.with_name(path.name + ".tmp")
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+
+        def hashed(chunks):
+            for chunk in chunks:
+                digest.update(chunk)
+                yield chunk
+
+        with open(tmp_path, 'wb') as f:
+            for chunk in gzip_stream(hashed(ndjson_stream(records, record_to_dict))):
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry = {
+            "file": path.name,
+            "records": len(records),
+            "sha256": digest.hexdigest(),
+            "bytes": size,
+            "first_timestamp": records[0].timestamp.isoformat() if records else None,
+            "last_timestamp": records[-1].timestamp.isoformat() if records else None,
+            "last_key": encode_cursor(record_key(records[-1])) if records else None,
+            "created_at": created.isoformat()
+        }
+
+        try:
+            self._verify_file(tmp_path, entry)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        os.replace(tmp_path, path)
+        self.entries.append(entry)
+        self._save_manifest()
+        logger.info(f"[OK] Archived {len(records)} attendance records to {path.name} "
+                    f"({size} bytes, sha256 {entry['sha256'][:12]})")
+        return entry
+
+    def discard(self, entry: Dict):
+        """
+        Remove an archive run whose records are still on the device (the
+        clear after it failed), so they are not served twice
+        """
+        self.entries.remove(entry)
+        self._save_manifest()
+        (self.directory / entry["file"]).unlink(missing_ok=True)
+        logger.warning(f"Discarded archive {entry['file']}: the device log was not cleared")
+
+    @staticmethod
+    def _verify_file(path: Path, entry: Dict):
+        """Re-read an archive file and check its record count and checksum"""
+        digest = hashlib.sha256()
+        count = 0
+        try:
+            with gzip.open(path, 'rb') as f:
+                for line in f:
+                    digest.update(line)
+                    count += 1
+        except (OSError, EOFError) as e:
+            raise AttendanceArchiveError(f"Archive {path.name} is unreadable: {e}")
+
+        if count != entry["records"]:
+            raise AttendanceArchiveError(f"Archive {path.name} holds {count} records, expected {entry['records']}")
+        if digest.hexdigest() != entry["sha256"]:
+            raise AttendanceArchiveError(f"Archive {path.name} checksum mismatch")
+
+    def verify(self) -> List[Dict]:
+        """Re-read every archive in the manifest and check counts and checksums"""
+        results = []
+        for entry in self.entries:
+            try:
+                self._verify_file(self.directory / entry["file"], entry)
+                results.append({"file": entry["file"], "ok": True})
+            except AttendanceArchiveError as e:
+                results.append({"file": entry["file"], "ok": False, "error": str(e)})
+        return results
+
+    # ---------- reading ----------
+
+    def records(self, since: Optional[Tuple[datetime, int]] = None) -> Iterator[Attendance]:
+        """
+        Read archived records, oldest first (blocking file I/O)
+
+        Args:
+            since: Only yield records with a (timestamp, uid) key above this;
+                   archives whose newest key is not above it are not opened
+        """
+        previous = None
+        for entry in self.entries:
+            if not entry["records"]:
+                continue
+            if since is None or decode_cursor(entry["last_key"]) > since:
+                # A run after an unconfirmed clear repeats the previous run's records
+                records = self._entry_records(entry)
+                if previous:
+                    records = self._without(records, previous)
+                for record in records:
+                    if since is None or record_key(record) > since:
+                        yield record
+            previous = entry
+
+    def _entry_records(self, entry: Dict) -> Iterator[Attendance]:
+        with gzip.open(self.directory / entry["file"], 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield record_from_dict(json.loads(line))
+
+    def _without(self, records: Iterable[Attendance], entry: Dict) -> Iterator[Attendance]:
+        """
+        Records not in an archive run, matched on (user_id, timestamp)
+        The run is only read when a record is not newer than its last key.
+        """
+        last_key = decode_cursor(entry["last_key"])
+        archived = None
+        for record in records:
+            if record_key(record) <= last_key:
+                if archived is None:
+                    archived = {(str(item.user_id), item.timestamp) for item in self._entry_records(entry)}
+                if (str(record.user_id), record.timestamp) in archived:
+                    continue
+            yield record
+
+    def drop_archived(self, records: Iterable[Attendance]) -> Iterator[Attendance]:
+        """
+        Device records not already served from the archive
+        After a clear that failed (or whose outcome is unknown) the device
+        still holds the newest run's records; they are skipped here.
+        """
+        newest = next((entry for entry in reversed(self.entries) if entry["records"]), None)
+        if newest is None:
+            return iter(records)
+        return self._without(records, newest)
+
+    def last_key(self) -> Optional[Tuple[datetime, int]]:
+        """Newest archived (timestamp, uid) key"""
+        keys = [decode_cursor(entry["last_key"]) for entry in self.entries if entry.get("last_key")]
+        return max(keys) if keys else None
+
+    def get_stats(self) -> Dict:
+        """Archive totals and the most recent runs"""
+        return {
+            "directory": str(self.directory),
+            "archives": len(self.entries),
+            "records": sum(entry["records"] for entry in self.entries),
+            "bytes": sum(entry["bytes"] for entry in self.entries),
+            "first_timestamp": next((entry["first_timestamp"] for entry in self.entries
+                                     if entry["first_timestamp"]), None),
+            "last_timestamp": next((entry["last_timestamp"] for entry in reversed(self.entries)
+                                    if entry["last_timestamp"]), None),
+            "recent": self.entries[-5:]
+        }
@@ -0,0 +1,207 @@
+"""
+Attendance Backfill - Reconcile the device attendance log against emitted scans
+Punches made while live capture is suspended (enrollment, long commands) or
+dead (after an error, until the supervisor reconnects) land in the device log
+but never reach /ws/events. The backfill diffs the device log since the last
+reconciled punch against an index of the scans already seen and re-emits the
+missing ones as attendance_backfilled events (never finger_scanned, so a
+recovered punch cannot open the door).
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ScanIndex:
+    def __init__(self):
+        """(user_id, timestamp) index of punches already emitted or seen live"""
+        self._by_user: Dict[str, List[datetime]] = {}  # user_id -> timestamps, ascending
+        self.size = 0
+
+    def add(self, user_id: str, timestamp: datetime):
+        timestamps = self._by_user.setdefault(str(user_id), [])
+        position = bisect_left(timestamps, timestamp)
+        if position < len(timestamps) and timestamps[position] == timestamp:
+            return
+        timestamps.insert(position, timestamp)
+        self.size += 1
+
+    def contains(self, user_id: str, timestamp: datetime) -> bool:
+        timestamps = self._by_user.get(str(user_id))
+        if not timestamps:
+            return False
+        position = bisect_left(timestamps, timestamp)
+        return position < len(timestamps) and timestamps[position] == timestamp
+
+    def has_recent(self, user_id: str, timestamp: datetime, window: float) -> bool:
+        """True if the user has an indexed punch in [timestamp - window, timestamp]"""
+        timestamps = self._by_user.get(str(user_id))
+        if not timestamps or window <= 0:
+            return False
+        position = bisect_left(timestamps, timestamp - timedelta(seconds=window))
+        return position < len(timestamps) and timestamps[position] <= timestamp
+
+    def latest(self) -> Optional[datetime]:
+        return max((timestamps[-1] for timestamps in self._by_user.values()), default=None)
+
+    def prune(self, before: datetime):
+        """Forget punches older than before"""
+        for user_id in list(self._by_user):
+            timestamps = self._by_user[user_id]
+            position = bisect_left(timestamps, before)
+            if position:
+                del timestamps[:position]
+                self.size -= position
+            if not timestamps:
+                del self._by_user[user_id]
+
+
+class GapBackfill:
+    def __init__(self, debounce_seconds: float = 5.0, max_age: float = 3600,
+                 prune_margin: float = 300):
+        """
+        Initialize gap backfill
+
+        Args:
+            debounce_seconds: Missing punches within this window after another
+                              punch of the same user are treated as repeats
+            max_age: Punches older than this many seconds are never backfilled
+                     (a long bridge outage should not replay hours of punches)
+            prune_margin: Seconds of index kept before the reconciled point
+        """
+        self.debounce_seconds = debounce_seconds
+        self.max_age = max_age
+        self.prune_margin = prune_margin
+        self.index = ScanIndex()
+
+        # Device log reconciled up to here; older records are never diffed again
+        self.reconciled_until: Optional[datetime] = None
+        # Records the device should hold if nothing was missed (None until the first download)
+        self.expected_count: Optional[int] = None
+
+        self.runs = 0
+        self.downloads = 0
+        self.skipped = 0
+        self.backfilled = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_backfilled = 0
+        self.last_error: Optional[str] = None
+
+    def seed(self, events: Iterable[Dict]):
+        """
+        Index scan events from the journal (call once at startup)
+        so punches made while the bridge was down are backfilled
+        """
+        for event in events:
+            punched_at = event.get("punched_at")
+            if not punched_at:
+                continue
+            timestamp = datetime.fromisoformat(punched_at)
+            self.index.add(event["user_id"], timestamp)
+            if self.reconciled_until is None or timestamp > self.reconciled_until:
+                self.reconciled_until = timestamp
+        if self.reconciled_until:
+            logger.info(f"Backfill resumes from last journaled punch at {self.reconciled_until}")
+
+    def note_live(self, user_id: str, timestamp: datetime):
+        """Record a punch delivered by live capture (debounced ones included)"""
+        self.index.add(user_id, timestamp)
+        if self.expected_count is not None:
+            self.expected_count += 1
+
+    def needs_download(self, record_count: int) -> bool:
+        """
+        Decide from the device record count whether the log must be read
+        (a matching count means every record was seen live)
+        """
+        self.runs += 1
+        self.last_run_at = datetime.now()
+        if self.expected_count is None:
+            if self.reconciled_until is None:
+                # Nothing journaled: start reconciling from now on
+                self.reconciled_until = datetime.now()
+                self.expected_count = record_count
+                self.skipped += 1
+                return False
+            return True
+        if record_count == self.expected_count:
+            self.skipped += 1
+            self.last_backfilled = 0
+            latest = self.index.latest()
+            if latest and (self.reconciled_until is None or latest > self.reconciled_until):
+                self.reconciled_until = latest
+            self._prune()
+            return False
+        return True
+
+    def diff(self, records: list) -> list:
+        """
+        Find records missing from the index (call with the full device log)
+
+        Returns:
+            Missing attendance records, oldest first; they are indexed as
+            emitted, so the caller must emit them
+        """
+        self.downloads += 1
+        self.expected_count = len(records)
+
+        floor = self.reconciled_until or datetime.min
+        oldest = datetime.now() - timedelta(seconds=self.max_age)
+        if oldest > floor:
+            floor = oldest
+
+        candidates = sorted((record for record in records if record.timestamp >= floor),
+                            key=lambda record: record.timestamp)
+        missing = []
+        for record in candidates:
+            user_id = str(record.user_id)
+            if self.index.contains(user_id, record.timestamp):
+                continue
+            repeat = self.index.has_recent(user_id, record.timestamp, self.debounce_seconds)
+            self.index.add(user_id, record.timestamp)
+            if not repeat:
+                missing.append(record)
+
+        if candidates:
+            self.reconciled_until = max(self.reconciled_until or floor, candidates[-1].timestamp)
+        self._prune()
+        self.backfilled += len(missing)
+        self.last_backfilled = len(missing)
+        return missing
+
+    def _prune(self):
+        if self.reconciled_until:
+            self.index.prune(self.reconciled_until - timedelta(seconds=self.prune_margin))
+
+    def get_stats(self) -> Dict:
+        """Run counts and the reconciled position"""
+        return {
+            "runs": self.runs,
+            "downloads": self.downloads,
+            "skipped": self.skipped,
+            "backfilled": self.backfilled,
+            "last_backfilled": self.last_backfilled,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_error": self.last_error,
+            "reconciled_until": self.reconciled_until.isoformat() if self.reconciled_until else None,
+            "expected_count": self.expected_count,
+            "indexed_punches": self.index.size
+        }
+
+
+SCAN_EVENT_TYPES = ("finger_scanned", "attendance_backfilled")
+
+
+def journaled_scans(lines: Iterable[str], device_id: str) -> Iterable[Dict]:
+    """Live and backfilled scan events of one reader from journal lines"""
+    for line in lines:
+        if not any(f'"{event_type}"' in line for event_type in SCAN_EVENT_TYPES):
+            continue
+        event = json.loads(line)
+        if event.get("type") in SCAN_EVENT_TYPES and event.get("device_id") == device_id:
+            yield event
@@ -0,0 +1,104 @@
+"""
+Attendance Sync - Incremental attendance pulls
+Keeps a persisted (timestamp, uid) high-water mark so periodic syncs
+only return records that are newer than the last one handed out
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SEPARATOR = "_"
+
+
+def record_key(record) -> Tuple[datetime, int]:
+    """Sort key of an attendance record: (timestamp, uid)"""
+    try:
+        uid = int(record.uid)
+    except (TypeError, ValueError):
+        uid = 0
+    return record.timestamp, uid
+
+
+def encode_cursor(key: Tuple[datetime, int]) -> str:
+    """Encode a (timestamp, uid) key as an opaque cursor string"""
+    timestamp, uid = key
+    return f"{timestamp.isoformat()}{CURSOR_SEPARATOR}{uid}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor string back into a (timestamp, uid) key
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    timestamp, separator, uid = cursor.rpartition(CURSOR_SEPARATOR)
+    if not separator:
+        raise ValueError(f"Invalid attendance cursor: {cursor}")
+    return datetime.fromisoformat(timestamp), int(uid)
+
+
+class AttendanceCursorStore:
+    def __init__(self, path: str = "data/attendance_cursor.json"):
+        """
+        Initialize cursor store
+
+        Args:
+            path: JSON file holding the last synced cursor
+        """
+        self.path = Path(path)
+        self.cursor: Optional[str] = None
+        self.record_count: Optional[int] = None
+        self.load()
+
+    def load(self):
+        """Load the persisted cursor (if any)"""
+        if not self.path.exists():
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            self.cursor = state.get("cursor")
+            self.record_count = state.get("record_count")
+            logger.info(f"Loaded attendance cursor: {self.cursor}")
+        except Exception as e:
+            logger.error(f"Error loading attendance cursor from {self.path}: {e}")
+
+    def save(self, cursor: Optional[str], record_count: Optional[int]):
+        """Persist a new cursor (written atomically)"""
+        self.cursor = cursor
+        self.record_count = record_count
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "cursor": cursor,
+                "record_count": record_count,
+                "updated_at": datetime.now().isoformat()
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def invalidate_record_count(self):
+        """
+        Forget the stored record count (call when the device log is cleared)
+        so a log that refills to the same count is not mistaken for unchanged
+        """
+        if self.record_count is not None:
+            self.save(self.cursor, None)
+
+    def get_state(self) -> Dict:
+        """Get the persisted sync state"""
+        return {
+            "cursor": self.cursor,
+            "record_count": self.record_count
+        }
@@ -0,0 +1,360 @@
+"""
+End-to-end latency benchmark - touch to relay
+Drives the bridge in-process against the ZK simulator and a loop:// serial
+stand-in, with 1, 10 and 100 WebSocket clients connected, and reports
+p50/p95/p99 for each stage:
+
+    capture_to_emit        live_capture yields a punch -> emit_event runs
+    emit_to_client         emit_event runs -> a WebSocket client receives it
+    door_command_to_serial open_door command sent -> 'o' written to serial
+
+Results are JSON (stdout, or --output) so runs can be compared across
+releases. Timings come from one process clock (time.perf_counter).
+
+Usage:
+    python benchmarks/e2e_latency.py
+    python benchmarks/e2e_latency.py --clients 1 10 100 --scans 300 --output e2e.json
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BRIDGE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BRIDGE_DIR))
+
+import uvicorn
+import websockets
+
+from zk_simulator import ZKSimulator, SimulatedDevice
+
+STAGES = ("capture_to_emit", "emit_to_client", "door_command_to_serial")
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Latency summary in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(sample * 1000 for sample in samples)
+    return {
+        "count": len(ordered),
+        "min": round(ordered[0], 3),
+        "p50": round(percentile(ordered, 50), 3),
+        "p95": round(percentile(ordered, 95), 3),
+        "p99": round(percentile(ordered, 99), 3),
+        "max": round(ordered[-1], 3),
+        "mean": round(sum(ordered) / len(ordered), 3)
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BRIDGE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Probes:
+    """Timestamps recorded by the instrumented bridge, keyed by scan user_id"""
+
+    def __init__(self):
+        self.yielded: Dict[str, float] = {}
+        self.emitted: Dict[str, float] = {}
+        self.serial_writes: List[float] = []
+
+    def reset(self):
+        self.yielded.clear()
+        self.emitted.clear()
+        self.serial_writes.clear()
+
+    def install(self, main):
+        """Wrap the stage boundaries of the bridge"""
+        service_class = main.FingerprintService
+        handle_attendance = service_class._handle_attendance
+        emit_event = service_class.emit_event
+        probes = self
+
+        def timed_handle_attendance(service, attendance):
+            probes.yielded[str(attendance.user_id)] = time.perf_counter()
+            return handle_attendance(service, attendance)
+
+        async def timed_emit_event(service, event):
+            if event.get("type") == "finger_scanned":
+                probes.emitted[str(event["user_id"])] = time.perf_counter()
+            return await emit_event(service, event)
+
+        service_class._handle_attendance = timed_handle_attendance
+        service_class.emit_event = timed_emit_event
+
+    def install_serial(self, ser):
+        write = ser.write
+
+        def timed_write(data):
+            written = write(data)
+            if data == b'o':
+                self.serial_writes.append(time.perf_counter())
+            return written
+
+        ser.write = timed_write
+
+
+class Bridge:
+    """The FastAPI app served by uvicorn on a background thread"""
+
+    def __init__(self, main, port: int):
+        self.main = main
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port,
+                                                    log_level="warning", lifespan="on"))
+        self._thread = threading.Thread(target=self.server.run, name="bridge", daemon=True)
+
+    def start(self, timeout: float = 30):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Bridge did not start")
+            time.sleep(0.05)
+
+        # Live capture starts in the background once the reader is connected
+        while not any(service.is_capturing for service in self.main.device_registry.services.values()):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Live capture did not start on the simulated reader")
+            time.sleep(0.05)
+        if not self.main.doorlock_service:
+            raise RuntimeError("Door lock stand-in did not open")
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+class Client:
+    """One WebSocket client on /ws/events recording finger_scanned receipt times"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.received: List[tuple] = []  # (user_id, perf_counter)
+        self.responses: Dict[str, asyncio.Event] = {}
+        self.ws = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_queue=None)
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async for raw in self.ws:
+            received_at = time.perf_counter()
+            message = json.loads(raw)
+            if message.get("type") == "finger_scanned":
+                self.received.append((str(message["user_id"]), received_at))
+            elif message.get("type") == "response" and message.get("request_id") in self.responses:
+                self.responses[message["request_id"]].set()
+
+    async def command(self, action: str, payload: Dict, request_id: str, timeout: float = 5):
+        done = self.responses[request_id] = asyncio.Event()
+        await self.ws.send(json.dumps({"action": action, "payload": payload, "request_id": request_id}))
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        finally:
+            self.responses.pop(request_id, None)
+
+    async def close(self):
+        await self.ws.close()
+        if self._reader:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+async def run_stage_set(args, simulator: ZKSimulator, bridge: Bridge, probes: Probes,
+                        client_count: int, run_index: int) -> Dict:
+    """Connect client_count clients, drive scans and door commands, collect samples"""
+    url = f"ws://127.0.0.1:{bridge.port}/ws/events"
+    clients = [Client(url) for _ in range(client_count)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    probes.reset()
+
+    total = args.warmup + args.scans
+    base = run_index * total  # fresh user_ids per run so samples never collide
+    user_ids = [str(base + index + 1) for index in range(total)]
+    door_sent: List[float] = []
+
+    async def drive_scans():
+        for user_id in user_ids:
+            simulator.scan(user_id)
+            await asyncio.sleep(1 / args.scan_rate)
+
+    async def drive_door():
+        # Commands share the load of the scan stream; only the first client sends them
+        for index in range(args.warmup + args.door_commands):
+            writes_before = len(probes.serial_writes)
+            sent_at = time.perf_counter()
+            await clients[0].command("open_door", {"duration": args.door_duration},
+                                     f"bench-{run_index}-{index}")
+            if index >= args.warmup and len(probes.serial_writes) > writes_before:
+                door_sent.append(probes.serial_writes[writes_before] - sent_at)
+            await asyncio.sleep(1 / args.door_rate)
+
+    await asyncio.gather(drive_scans(), drive_door())
+
+    # Let the tail of the scan stream arrive
+    measured = set(user_ids[args.warmup:])
+    deadline = time.monotonic() + args.drain
+    while time.monotonic() < deadline:
+        if all(len(client.received) >= total for client in clients):
+            break
+        await asyncio.sleep(0.05)
+    await asyncio.gather(*(client.close() for client in clients))
+
+    capture_to_emit = [probes.emitted[user_id] - probes.yielded[user_id]
+                       for user_id in measured if user_id in probes.yielded and user_id in probes.emitted]
+    emit_to_client = []
+    missed = 0
+    for client in clients:
+        seen = 0
+        for user_id, received_at in client.received:
+            if user_id in measured and user_id in probes.emitted:
+                emit_to_client.append(received_at - probes.emitted[user_id])
+                seen += 1
+        missed += len(measured) - seen
+
+    return {
+        "clients": client_count,
+        "scans": args.scans,
+        "door_commands": args.door_commands,
+        "scans_captured": len(capture_to_emit),
+        "missed_deliveries": missed,
+        "stages": {
+            "capture_to_emit": summarize(capture_to_emit),
+            "emit_to_client": summarize(emit_to_client),
+            "door_command_to_serial": summarize(door_sent)
+        }
+    }
+
+
+def print_table(results: Dict):
+    lines = [f"{'clients':>7}  {'stage':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for run in results["runs"]:
+        for stage in STAGES:
+            summary = run["stages"][stage]
+            if not summary["count"]:
+                lines.append(f"{run['clients']:>7}  {stage:<24}{0:>7}")
+                continue
+            lines.append(f"{run['clients']:>7}  {stage:<24}{summary['count']:>7}{summary['p50']:>10.3f}"
+                         f"{summary['p95']:>10.3f}{summary['p99']:>10.3f}{summary['max']:>10.3f}")
+    print("\n".join(lines), file=sys.stderr)
+
+
+async def run_benchmark(args, simulator: ZKSimulator, bridge: Bridge, probes: Probes) -> List[Dict]:
+    runs = []
+    for run_index, client_count in enumerate(args.clients):
+        print(f"Running with {client_count} client(s)...", file=sys.stderr)
+        runs.append(await run_stage_set(args, simulator, bridge, probes, client_count, run_index))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Touch-to-relay latency benchmark (in-process)")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100],
+                        help="connected WebSocket client counts, one run each")
+    parser.add_argument("--scans", type=int, default=200, help="measured scans per run")
+    parser.add_argument("--scan-rate", type=float, default=20, help="scans per second")
+    parser.add_argument("--door-commands", type=int, default=50, help="measured open_door commands per run")
+    parser.add_argument("--door-rate", type=float, default=5, help="open_door commands per second")
+    parser.add_argument("--door-duration", type=int, default=1, help="open_door duration payload")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured scans/commands at the start of each run")
+    parser.add_argument("--drain", type=float, default=5, help="seconds to wait for late deliveries")
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated reader response latency")
+    parser.add_argument("--log-level", default="WARNING", help="bridge log level during the run")
+    parser.add_argument("--workdir", help="bridge working directory (logs, journal); a temp dir by default")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve() if args.output else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bridge-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # main creates logs/ and data/ relative to the working directory
+
+    import main as bridge_main
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    users = len(args.clients) * (args.warmup + args.scans)
+    simulator = ZKSimulator(port=0, device=SimulatedDevice(users=users),
+                            latency=args.latency_ms / 1000).start()
+    bridge_main.load_config = lambda: {
+        "hardware": {
+            "fingerprint": {"ip": "127.0.0.1", "port": simulator.port, "ommit_ping": True,
+                            "debounce_seconds": 0},
+            "doorlock": {"port": "loop://", "baudrate": 9600}
+        }
+    }
+
+    probes = Probes()
+    probes.install(bridge_main)
+    bridge = Bridge(bridge_main, free_port())
+    started_at = datetime.now()
+    try:
+        bridge.start()
+        probes.install_serial(bridge_main.doorlock_service.ser)
+        runs = asyncio.run(run_benchmark(args, simulator, bridge, probes))
+    finally:
+        bridge.stop()
+        simulator.stop()
+
+    results = {
+        "benchmark": "e2e_latency",
+        "schema_version": 1,
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "unit": "ms",
+        "parameters": {
+            "clients": args.clients,
+            "scans": args.scans,
+            "scan_rate": args.scan_rate,
+            "door_commands": args.door_commands,
+            "door_rate": args.door_rate,
+            "warmup": args.warmup,
+            "reader_latency_ms": args.latency_ms,
+            "log_level": args.log_level.upper()
+        },
+        "runs": runs
+    }
+
+    print_table(results)
+    text = json.dumps(results, indent=2)
+    if output:
+        output.write_text(text + "\n")
+        print(f"Results written to {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
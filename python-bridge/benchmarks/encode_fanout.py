@@ -0,0 +1,183 @@
+"""
+Broadcast encoding microbenchmark - CPU cost per event
+Measures the event-loop thread's CPU time (time.thread_time) to fan one
+finger_scanned event out to 1, 10 and 100 subscribers, for:
+
+    per_recipient   json.dumps for every recipient (send_json per client,
+                    as the mirror channel and send_to did)
+    encode_once     WebSocketManager.broadcast: one Frame per event, the
+                    same text queued for every client (json module)
+    encode_once_orjson
+                    the same with orjson (skipped when not installed)
+
+Subscribers are in-memory sockets whose send_text does the UTF-8 encode a
+real transport does, so the figures are serialization and fan-out only.
+
+Usage:
+    python benchmarks/encode_fanout.py
+    python benchmarks/encode_fanout.py --subscribers 1 10 100 --events 5000 --output encode.json
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import time
+
+BRIDGE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BRIDGE_DIR))
+
+import event_codec
+from websocket_manager import WebSocketManager
+from pubsub_hub import POLICY_DROP_OLDEST
+from e2e_latency import git_commit
+
+STRATEGIES = ("per_recipient", "encode_once", "encode_once_orjson")
+
+
+class NullSocket:
+    """Subscriber that only pays the transport's UTF-8 encode"""
+    client = None
+
+    def __init__(self):
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        text.encode("utf-8")
+        self.received += 1
+
+    async def send_json(self, message: Dict):
+        await self.send_text(json.dumps(message))
+
+
+def sample_event(index: int) -> Dict:
+    return {
+        "type": "finger_scanned",
+        "user_id": str(1000 + index % 500),
+        "uid": index % 500,
+        "punch_type": 0,
+        "punched_at": datetime.now().isoformat(),
+        "status": 1,
+        "device_id": "default",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+async def per_recipient(sockets: List[NullSocket], events: List[Dict]) -> float:
+    started = time.thread_time()
+    for event in events:
+        for socket in sockets:
+            await socket.send_json(event)
+    return time.thread_time() - started
+
+
+async def encode_once(sockets: List[NullSocket], events: List[Dict]) -> float:
+    manager = WebSocketManager()
+    manager.configure(len(events) + 1, POLICY_DROP_OLDEST, stall_timeout=60)
+    for socket in sockets:
+        await manager.connect(socket)
+
+    started = time.thread_time()
+    for event in events:
+        await manager.broadcast(event)
+    # Let the writer tasks drain every queue
+    while any(client.queue.qsize() for client in manager.clients.values()):
+        await asyncio.sleep(0)
+    cpu = time.thread_time() - started
+
+    for socket in sockets:
+        manager.disconnect(socket)
+    return cpu
+
+
+async def measure(strategy: str, subscribers: int, event_count: int) -> Dict:
+    sockets = [NullSocket() for _ in range(subscribers)]
+    events = [sample_event(index) for index in range(event_count)]
+    run = per_recipient if strategy == "per_recipient" else encode_once
+    cpu = await run(sockets, events)
+
+    delivered = sum(socket.received for socket in sockets)
+    assert delivered == subscribers * event_count, f"{strategy}: {delivered} deliveries"
+    return {
+        "strategy": strategy,
+        "subscribers": subscribers,
+        "events": event_count,
+        "cpu_us_per_event": round(cpu / event_count * 1e6, 2),
+        "cpu_us_per_delivery": round(cpu / delivered * 1e6, 3)
+    }
+
+
+def run_strategy(strategy: str, subscribers: int, event_count: int) -> Dict:
+    orjson = event_codec.orjson
+    if strategy == "encode_once":
+        event_codec.orjson = None  # force the json module
+    try:
+        return asyncio.run(measure(strategy, subscribers, event_count))
+    finally:
+        event_codec.orjson = orjson
+
+
+def print_table(results: Dict):
+    lines = [f"{'subscribers':>11}  {'strategy':<20}{'cpu us/event':>14}{'cpu us/delivery':>17}"]
+    for result in results["results"]:
+        lines.append(f"{result['subscribers']:>11}  {result['strategy']:<20}{result['cpu_us_per_event']:>14.2f}"
+                     f"{result['cpu_us_per_delivery']:>17.3f}")
+    print("\n".join(lines), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast encoding CPU cost per event")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100],
+                        help="subscriber counts, one run per strategy each")
+    parser.add_argument("--events", type=int, default=2000, help="events broadcast per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    strategies = [strategy for strategy in STRATEGIES
+                  if strategy != "encode_once_orjson" or event_codec.orjson]
+    if "encode_once_orjson" not in strategies:
+        print("orjson not installed, encode_once_orjson skipped", file=sys.stderr)
+
+    measured = []
+    for subscribers in args.subscribers:
+        for strategy in strategies:
+            runs = [run_strategy(strategy, subscribers, args.events) for _ in range(args.repeat)]
+            measured.append(min(runs, key=lambda run: run["cpu_us_per_event"]))
+
+    results = {
+        "benchmark": "encode_fanout",
+        "schema_version": 1,
+        "started_at": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": event_codec.BACKEND,
+        "parameters": {
+            "subscribers": args.subscribers,
+            "events": args.events,
+            "repeat": args.repeat
+        },
+        "results": measured
+    }
+
+    print_table(results)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
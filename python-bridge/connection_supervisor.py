@@ -0,0 +1,229 @@
+"""
+Connection Supervisor - Keeps one ZKTeco reader connected
+Watches the reader with cheap TCP probes, and after a lost connection
+reconnects with exponential backoff and jitter, then resumes live capture
+"""
+
+from device_actor import PRIORITY_DOOR, PRIORITY_ADMIN
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+async def tcp_probe(ip: str, port: int, timeout: float = 1.0) -> bool:
+    """
+    Check that the reader accepts TCP connections (no protocol handshake)
+
+    Returns:
+        True if the port answered within timeout
+    """
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+class Backoff:
+    def __init__(self, initial: float = 1.0, maximum: float = 30.0,
+                 multiplier: float = 2.0, jitter: float = 0.5):
+        """
+        Exponential backoff with jitter
+
+        Args:
+            initial: First delay in seconds
+            maximum: Upper bound for the delay
+            multiplier: Growth factor per attempt
+            jitter: Fraction of each delay that is randomized (0-1), so readers
+                    behind the same switch don't retry in lockstep
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        """Delay before the next attempt"""
+        delay = min(self.maximum, self.initial * self.multiplier ** self.attempt)
+        self.attempt += 1
+        return delay * (1 - self.jitter * random.random())
+
+    def reset(self):
+        self.attempt = 0
+
+
+class ConnectionSupervisor:
+    def __init__(self, service, probe_interval: float = 10, probe_timeout: float = 1.0,
+                 probe_failures: int = 2, initial_delay: float = 1.0, max_delay: float = 30.0):
+        """
+        Initialize connection supervisor
+
+        Args:
+            service: FingerprintService to supervise
+            probe_interval: Seconds between liveness probes while connected
+            probe_timeout: TCP probe timeout in seconds
+            probe_failures: Consecutive failed probes before the connection is
+                            treated as lost (a dead link does not break live
+                            capture, it only stops delivering events)
+            initial_delay: First reconnect delay in seconds
+            max_delay: Longest reconnect delay in seconds
+        """
+        self.service = service
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.probe_failures = probe_failures
+        self.backoff = Backoff(initial_delay, max_delay)
+
+        self._lost: Optional[asyncio.Event] = None
+        self.resume_capture = False
+        # Called on the event loop after every successful reconnect
+        self.on_reconnected: Optional[Callable[[], None]] = None
+
+        self.state = "connected"
+        self.reconnect_count = 0
+        self.attempts = 0
+        self.failed_probes = 0
+        self.failed_connects = 0
+        self.last_error: Optional[str] = None
+        self.disconnected_at: Optional[datetime] = None
+        self.recovered_at: Optional[datetime] = None
+        self.last_recovery_seconds: Optional[float] = None
+        self.max_recovery_seconds: Optional[float] = None
+        self._recovery_total = 0.0
+        self._lost_at: Optional[float] = None
+
+    def notify_lost(self, error: str, resume_capture: bool = False):
+        """
+        Report a lost connection (call on the event loop thread)
+
+        Args:
+            error: What went wrong
+            resume_capture: Restart live capture once reconnected
+        """
+        self.resume_capture = self.resume_capture or resume_capture
+        if self.state == "reconnecting":
+            return
+
+        logger.warning(f"Reader '{self.service.device_id}' connection lost: {error}")
+        self.state = "reconnecting"
+        self.last_error = error
+        self.disconnected_at = datetime.now()
+        self._lost_at = time.monotonic()
+        self._lost_event().set()
+
+    def _lost_event(self) -> asyncio.Event:
+        if self._lost is None:
+            self._lost = asyncio.Event()
+        return self._lost
+
+    async def run(self):
+        """Supervise the connection until cancelled"""
+        logger.info(f"Connection supervisor started for reader '{self.service.device_id}'")
+        lost = self._lost_event()
+        try:
+            while True:
+                if not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.probe_interval)
+                    except asyncio.TimeoutError:
+                        await self._check_liveness()
+                        continue
+                await self._recover()
+                lost.clear()
+        except asyncio.CancelledError:
+            logger.info(f"Connection supervisor stopped for reader '{self.service.device_id}'")
+
+    async def _check_liveness(self):
+        """Probe the reader; declare the connection lost after repeated failures"""
+        if not self.service.is_connected():
+            return
+
+        failures = 0
+        while not await tcp_probe(self.service.ip, self.service.port, self.probe_timeout):
+            failures += 1
+            if failures >= self.probe_failures:
+                was_capturing = self.service.is_capturing
+                await self.service.run(self.service.drop_connection, priority=PRIORITY_DOOR)
+                error = "Device stopped answering TCP probes"
+                self.notify_lost(error, resume_capture=was_capturing)
+                await self.service.emit_event({
+                    "type": "device_disconnected",
+                    "error": error
+                })
+                return
+            await asyncio.sleep(self.probe_timeout)
+
+    async def _recover(self):
+        """Reconnect with backoff until the reader is back, then resume capture"""
+        self.backoff.reset()
+        while True:
+            await asyncio.sleep(self.backoff.next_delay())
+            self.attempts += 1
+
+            # Only attempt the full handshake once the port answers
+            if not await tcp_probe(self.service.ip, self.service.port, self.probe_timeout):
+                self.failed_probes += 1
+                logger.info(f"Reader '{self.service.device_id}' still unreachable "
+                            f"(attempt {self.backoff.attempt})")
+                continue
+
+            try:
+                # A new session reloads the user directory (admin-sized work)
+                await self.service.run(self.service.recover_connection, priority=PRIORITY_ADMIN)
+                break
+            except Exception as e:
+                self.failed_connects += 1
+                self.last_error = str(e)
+                logger.warning(f"Reader '{self.service.device_id}' reconnect failed: {e}")
+
+        recovery_seconds = time.monotonic() - self._lost_at
+        self.state = "connected"
+        self.reconnect_count += 1
+        self.recovered_at = datetime.now()
+        self.last_recovery_seconds = round(recovery_seconds, 3)
+        self.max_recovery_seconds = max(self.max_recovery_seconds or 0, self.last_recovery_seconds)
+        self._recovery_total += recovery_seconds
+        logger.info(f"[OK] Reader '{self.service.device_id}' reconnected after {recovery_seconds:.1f}s "
+                    f"({self.backoff.attempt} attempt(s))")
+
+        if self.resume_capture:
+            self.resume_capture = False
+            await self.service.start_live_capture()
+
+        if self.on_reconnected:
+            self.on_reconnected()
+
+        await self.service.emit_event({
+            "type": "device_reconnected",
+            "attempts": self.backoff.attempt,
+            "recovery_seconds": self.last_recovery_seconds
+        })
+
+    def get_stats(self) -> Dict:
+        """Reconnect counts and time-to-recover"""
+        return {
+            "state": self.state,
+            "reconnect_count": self.reconnect_count,
+            "attempts": self.attempts,
+            "failed_probes": self.failed_probes,
+            "failed_connects": self.failed_connects,
+            "last_error": self.last_error,
+            "disconnected_at": self.disconnected_at.isoformat() if self.disconnected_at else None,
+            "recovered_at": self.recovered_at.isoformat() if self.recovered_at else None,
+            "last_recovery_seconds": self.last_recovery_seconds,
+            "max_recovery_seconds": self.max_recovery_seconds,
+            "avg_recovery_seconds": round(self._recovery_total / self.reconnect_count, 3)
+            if self.reconnect_count else None
+        }
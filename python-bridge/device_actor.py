@@ -0,0 +1,237 @@
+"""
+Device Actor - Single-owner thread for all I/O on one ZKTeco connection
+
+pyzk connections are not safe to share: live capture, admin reads and
+writes all talk over the same socket. Every device operation is therefore
+queued to one thread per reader, which runs them one at a time in priority
+order and runs live capture in between. Background commands (periodic
+refreshes) never interrupt live capture: they wait until capture is off or
+has been suspended for another command anyway.
+"""
+
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_DOOR = 0      # door-critical: keeping the reader connected and scanning
+PRIORITY_ENROLL = 1    # enrollment (staff waiting at the reader)
+PRIORITY_ADMIN = 2     # admin writes: sync, delete, clear
+PRIORITY_READ = 3      # admin reads: users, attendance, templates, snapshots
+
+PRIORITY_NAMES = {
+    PRIORITY_DOOR: "door",
+    PRIORITY_ENROLL: "enroll",
+    PRIORITY_ADMIN: "admin",
+    PRIORITY_READ: "read",
+}
+
+_STOP = object()
+
+
+class DeviceActor:
+    def __init__(self, name: str, idle: Optional[Callable[[], bool]] = None,
+                 before_command: Optional[Callable[[], None]] = None):
+        """
+        Initialize device actor
+
+        Args:
+            name: Reader id (used for the thread name and logs)
+            idle: Called whenever the queue is empty; runs one short unit of
+                  background work (a live capture poll) and returns False
+                  when there is nothing to do, so the actor can block
+            before_command: Called before a queued command runs while idle
+                            work is active (used to suspend live capture)
+        """
+        self.name = name
+        self.idle = idle
+        self.before_command = before_command
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._deferred: List = []  # heap of background commands held while idle work runs
+        self._idle_active = False  # the last idle call had work to do (capture is running)
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        self.current: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.idle_seconds = 0.0      # running idle work (live capture polls)
+        self.command_seconds = 0.0   # running queued commands
+        self._stats: Dict[int, Dict] = {
+            priority: {"submitted": 0, "completed": 0, "failed": 0,
+                       "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for priority in PRIORITY_NAMES
+        }
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """Start the actor thread (no-op if already running)"""
+        if self._running:
+            return
+        self._running = True
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"device-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info(f"Device actor '{self.name}' started")
+
+    def stop(self, timeout: float = 5):
+        """Stop the actor thread after the commands already queued"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put((PRIORITY_READ + 1, next(self._sequence), _STOP))
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        logger.info(f"Device actor '{self.name}' stopped")
+
+    def in_actor_thread(self) -> bool:
+        """Whether the caller is running on the actor thread"""
+        return self._thread is threading.current_thread()
+
+    # ---------- submitting work ----------
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_READ, background: bool = False,
+               **kwargs) -> Future:
+        """
+        Queue a blocking device call
+
+        Args:
+            fn: Blocking callable
+            priority: Queue priority
+            background: Do not interrupt idle work for this call; it runs once
+                        idle work stops or another command has interrupted it
+
+        Returns:
+            concurrent.futures.Future resolved with the call's result
+        """
+        future: Future = Future()
+        with self._lock:
+            self._stats[priority]["submitted"] += 1
+        self._queue.put((priority, next(self._sequence), (fn, args, kwargs, future, time.monotonic(), background)))
+        return future
+
+    async def call(self, fn: Callable, *args, priority: int = PRIORITY_READ, background: bool = False, **kwargs):
+        """Queue a blocking device call and await its result"""
+        if self.in_actor_thread():
+            return fn(*args, **kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args, priority=priority, background=background, **kwargs))
+
+    def call_blocking(self, fn: Callable, *args, priority: int = PRIORITY_READ, **kwargs):
+        """
+        Queue a blocking device call and wait for it from a worker thread
+        Runs inline when already on the actor thread.
+        """
+        if self.in_actor_thread():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+
+    def queue_depth(self) -> int:
+        """Commands waiting to run"""
+        return self._queue.qsize() + len(self._deferred)
+
+    # ---------- actor loop ----------
+
+    def _next_item(self):
+        """Get the next command, running idle work while the queue is empty"""
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                entry = None
+
+            if entry is not None:
+                if self._idle_active and entry[2] is not _STOP and entry[2][5]:
+                    heapq.heappush(self._deferred, entry)
+                    continue
+                return entry
+            if self._deferred and not self._idle_active:
+                return heapq.heappop(self._deferred)
+
+            busy = False
+            if self.idle:
+                started = time.monotonic()
+                try:
+                    busy = self.idle()
+                except Exception as e:
+                    logger.error(f"Device actor '{self.name}' idle work failed: {e}")
+                self.idle_seconds += time.monotonic() - started
+            self._idle_active = busy
+            if not busy and not self._deferred:
+                return self._queue.get()
+
+    def _run(self):
+        while True:
+            priority, _, item = self._next_item()
+            if item is _STOP:
+                break
+
+            fn, args, kwargs, future, queued_at, _ = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            # before_command suspends idle work, so held background commands can run next
+            self._idle_active = False
+
+            started = time.monotonic()
+            wait_ms = (started - queued_at) * 1000
+            self.current = getattr(fn, "__name__", repr(fn))
+            try:
+                if self.before_command:
+                    self.before_command()
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                self._record(priority, wait_ms, failed=True)
+                future.set_exception(e)
+            else:
+                self._record(priority, wait_ms, failed=False)
+                future.set_result(result)
+            finally:
+                self.current = None
+                self.command_seconds += time.monotonic() - started
+
+        for _, _, item in self._deferred:
+            item[3].cancel()
+        self._deferred = []
+
+    def _record(self, priority: int, wait_ms: float, failed: bool):
+        with self._lock:
+            stats = self._stats[priority]
+            stats["failed" if failed else "completed"] += 1
+            stats["wait_ms_total"] += wait_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+
+    def get_stats(self) -> Dict:
+        """Queue depth, current command and wait times per priority"""
+        with self._lock:
+            priorities = {}
+            for priority, stats in self._stats.items():
+                finished = stats["completed"] + stats["failed"]
+                priorities[PRIORITY_NAMES[priority]] = {
+                    "submitted": stats["submitted"],
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "wait_ms_avg": round(stats["wait_ms_total"] / finished, 2) if finished else None,
+                    "wait_ms_max": round(stats["wait_ms_max"], 2)
+                }
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            "running": self._running,
+            "queue_depth": self._queue.qsize(),
+            "deferred": len(self._deferred),
+            "current": self.current,
+            "priorities": priorities,
+            "capture_seconds": round(self.idle_seconds, 3),
+            "command_seconds": round(self.command_seconds, 3),
+            "capture_share": round(self.idle_seconds / elapsed, 4) if elapsed else 0,
+            "command_share": round(self.command_seconds / elapsed, 4) if elapsed else 0
+        }
@@ -0,0 +1,222 @@
+"""
+Device Registry - One FingerprintService per configured ZKTeco reader
+Connects all readers in parallel at startup and routes device-scoped
+requests to the right one
+"""
+
+from fingerprint_service import FingerprintService
+from attendance_sync import AttendanceCursorStore
+from attendance_archive import AttendanceArchive
+from device_actor import PRIORITY_ADMIN
+from connection_supervisor import ConnectionSupervisor
+from hardware_api import FingerprintAPI
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEVICE_ID = "default"
+
+
+class DeviceRegistry:
+    def __init__(self, ws_manager=None):
+        """
+        Initialize device registry
+
+        Args:
+            ws_manager: WebSocket manager shared by every reader's events
+        """
+        self.ws_manager = ws_manager
+        self.services: Dict[str, FingerprintService] = {}
+        self.apis: Dict[str, FingerprintAPI] = {}  # async facade per connected reader
+        self.pending: Dict[str, FingerprintService] = {}  # failed to connect, retried by their supervisor
+        self.errors: Dict[str, str] = {}
+        self.configs: Dict[str, Dict] = {}
+        self.default_id: Optional[str] = None
+        self.tasks: List[asyncio.Task] = []
+
+    @staticmethod
+    def reader_configs(config: Optional[Dict]) -> List[Dict]:
+        """
+        Get the reader list from config.json
+
+        Multiple readers are configured as hardware.fingerprints (a list of
+        {"id", "name", "ip", "port", ...}); a single hardware.fingerprint
+        entry is treated as one reader with id "default". Settings on
+        hardware.fingerprint act as defaults for every listed reader.
+        """
+        hardware = (config or {}).get("hardware", {})
+        defaults = {"ip": "192.168.1.201", "port": 4370, **hardware.get("fingerprint", {})}
+
+        readers = hardware.get("fingerprints")
+        if not readers:
+            return [{**defaults, "id": defaults.get("id", DEFAULT_DEVICE_ID)}]
+
+        merged = []
+        for position, reader in enumerate(readers):
+            reader = {**defaults, **reader}
+            reader.setdefault("id", f"reader{position + 1}")
+            merged.append(reader)
+        return merged
+
+    def _create_service(self, reader: Dict) -> FingerprintService:
+        """Create the service (and its per-device state) for one reader"""
+        device_id = str(reader["id"])
+        service = FingerprintService(
+            ip=reader["ip"],
+            port=reader.get("port", 4370),
+            ws_manager=self.ws_manager,
+            device_id=device_id,
+            name=reader.get("name"),
+            capture_poll_interval=reader.get("capture_poll_interval", 0.1),
+            debounce_seconds=reader.get("debounce_seconds", 5.0),
+            ommit_ping=reader.get("ommit_ping", False)
+        )
+        cursor_file = "attendance_cursor.json" if device_id == DEFAULT_DEVICE_ID \
+            else f"attendance_cursor-{device_id}.json"
+        service.attendance_cursor_store = AttendanceCursorStore(f"data/{cursor_file}")
+        archive_dir = "attendance_archive" if device_id == DEFAULT_DEVICE_ID \
+            else f"attendance_archive-{device_id}"
+        service.attendance_archive = AttendanceArchive(f"data/{archive_dir}")
+        return service
+
+    async def start(self, readers: List[Dict]):
+        """
+        Connect every reader in parallel, then start live capture and the
+        background refreshers on the ones that came up
+
+        Args:
+            readers: Reader configs (see reader_configs)
+        """
+        services = [self._create_service(reader) for reader in readers]
+        for reader in readers:
+            self.configs[str(reader["id"])] = reader
+
+        # Each reader connects on its own device actor thread
+        logger.info(f"Connecting {len(services)} fingerprint reader(s) in parallel...")
+        results = await asyncio.gather(
+            *[service.run(service.connect, priority=PRIORITY_ADMIN) for service in services],
+            return_exceptions=True
+        )
+
+        for service, reader, result in zip(services, readers, results):
+            if result is True:
+                self._register(service, reader)
+                logger.info(f"[OK] Reader '{service.device_id}' connected at {service.ip}:{service.port}")
+                self._start_background(service, reader)
+            else:
+                error = str(result) if isinstance(result, Exception) else "Not connected"
+                self.errors[service.device_id] = error
+                if reader.get("auto_reconnect", True):
+                    self._retry_in_background(service, reader, error)
+                    logger.warning(f"[WARN] Reader '{service.device_id}' not available, retrying in the background: "
+                                   f"{error}")
+                else:
+                    service.actor.stop()
+                    logger.warning(f"[WARN] Reader '{service.device_id}' not available: {error}")
+
+    def _register(self, service: FingerprintService, reader: Dict):
+        """Make a connected reader routable"""
+        self.services[service.device_id] = service
+        self.apis[service.device_id] = FingerprintAPI(
+            service,
+            timeouts=reader.get("command_timeouts"),
+            max_pending=reader.get("max_pending_commands", 64)
+        )
+        if self.default_id is None:
+            self.default_id = service.device_id
+
+    def _retry_in_background(self, service: FingerprintService, reader: Dict, error: str):
+        """
+        Keep connecting a reader that was down at startup, with the same
+        backoff as a lost connection; it is registered once it comes up
+        """
+        self.pending[service.device_id] = service
+        service.seed_backfill()
+        supervisor = self._start_supervisor(service, reader)
+
+        def connected():
+            supervisor.on_reconnected = None
+            self.pending.pop(service.device_id, None)
+            self.errors.pop(service.device_id, None)
+            self._register(service, reader)
+            self._start_refreshers(service, reader)
+            logger.info(f"[OK] Reader '{service.device_id}' connected at {service.ip}:{service.port}")
+
+        supervisor.on_reconnected = connected
+        # The supervisor starts live capture once it reconnects
+        supervisor.notify_lost(error, resume_capture=True)
+
+    def _start_supervisor(self, service: FingerprintService, reader: Dict) -> ConnectionSupervisor:
+        """Start the connection supervisor for one reader"""
+        service.supervisor = ConnectionSupervisor(
+            service,
+            probe_interval=reader.get("probe_interval", 10),
+            initial_delay=reader.get("reconnect_initial_delay", 1.0),
+            max_delay=reader.get("reconnect_max_delay", 30.0)
+        )
+        self.tasks.append(asyncio.create_task(service.supervisor.run()))
+        return service.supervisor
+
+    def _start_background(self, service: FingerprintService, reader: Dict):
+        """Start live capture, the periodic refreshers and the connection supervisor for one reader"""
+        service.seed_backfill()
+        self.tasks.append(asyncio.create_task(service.start_live_capture()))
+        if reader.get("auto_reconnect", True):
+            self._start_supervisor(service, reader)
+        self._start_refreshers(service, reader)
+
+    def _start_refreshers(self, service: FingerprintService, reader: Dict):
+        """Start the periodic background work of a connected reader"""
+        # Keep the /health device snapshot fresh in the background
+        self.tasks.append(asyncio.create_task(
+            service.run_snapshot_refresher(reader.get("snapshot_interval", 30))
+        ))
+        self.tasks.append(asyncio.create_task(
+            service.run_directory_reconciler(reader.get("directory_reconcile_interval", 300))
+        ))
+        # Catch punches that live capture missed (after restarts, and on this schedule)
+        self.tasks.append(asyncio.create_task(
+            service.run_gap_backfill(reader.get("backfill_interval", 60))
+        ))
+
+    async def stop(self):
+        """Stop background work and disconnect every reader"""
+        for task in self.tasks:
+            task.cancel()
+        self.tasks.clear()
+
+        await asyncio.gather(
+            *[service.close() for service in [*self.services.values(), *self.pending.values()]],
+            return_exceptions=True
+        )
+
+    def get(self, device_id: Optional[str] = None) -> Optional[FingerprintService]:
+        """Get a reader by id (the first connected reader when device_id is None)"""
+        if device_id is None:
+            device_id = self.default_id
+        return self.services.get(device_id) if device_id is not None else None
+
+    def get_api(self, device_id: Optional[str] = None) -> Optional[FingerprintAPI]:
+        """Get a reader's async facade (the default reader when device_id is None)"""
+        service = self.get(device_id)
+        return self.apis.get(service.device_id) if service else None
+
+    def list_devices(self) -> List[Dict]:
+        """Describe every configured reader"""
+        devices = []
+        for device_id, reader in self.configs.items():
+            service = self.services.get(device_id) or self.pending.get(device_id)
+            devices.append({
+                "device_id": device_id,
+                "name": reader.get("name"),
+                "ip": reader.get("ip"),
+                "port": reader.get("port", 4370),
+                "default": device_id == self.default_id,
+                "connected": service.is_connected() if service else False,
+                "is_capturing": service.is_capturing if service else False,
+                "connection": service.get_connection_stats() if service else None,
+                "error": self.errors.get(device_id)
+            })
+        return devices
@@ -6,7 +6,6 @@ Controls door lock via serial port (Arduino/relay)
 import serial
 import time
 import logging
-import asyncio
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -18,7 +17,8 @@ class DoorLockService:
         Initialize door lock service
         
         Args:
-            port: Serial port (COM7 on Windows, /dev/ttyUSB0 on Linux)
+            port: Serial port (COM7 on Windows, /dev/ttyUSB0 on Linux) or a
+                  pyserial URL such as loop:// for running without a relay
             baudrate: Baud rate (default 9600)
             timeout: Serial timeout in seconds
         """
@@ -38,8 +38,8 @@ class DoorLockService:
                 return True
             
             logger.info(f"Opening serial port {self.port} at {self.baudrate} baud...")
-            self.ser = serial.Serial(
-                port=self.port,
+            self.ser = serial.serial_for_url(
+                self.port,
                 baudrate=self.baudrate,
                 timeout=self.timeout,
                 bytesize=serial.EIGHTBITS,
@@ -47,8 +47,9 @@ class DoorLockService:
                 stopbits=serial.STOPBITS_ONE
             )
             
-            # Give device time to initialize
-            time.sleep(2)
+            # Give device time to initialize (opening the port resets the Arduino)
+            if "://" not in self.port:
+                time.sleep(2)
             
             logger.info(f"Serial port {self.port} opened successfully")
             return True
@@ -76,10 +77,11 @@ class DoorLockService:
     
     def open_door(self, duration: int = 5):
         """
-        Open door lock for specified duration
+        Open door lock (blocking serial write)
+        The automatic close after duration is scheduled by DoorLockAPI.
         
         Args:
-            duration: How long to keep door open (seconds)
+            duration: How long the door will be kept open (seconds)
         
         Returns:
             Dict with operation result
@@ -95,9 +97,6 @@ class DoorLockService:
             self.ser.flush()
             self.is_door_open = True
             
-            # Schedule automatic close after duration
-            asyncio.create_task(self._auto_close(duration))
-            
             return {
                 "success": True,
                 "message": f"Door opened for {duration} seconds"
@@ -110,12 +109,6 @@ class DoorLockService:
             logger.error(f"Error opening door: {e}")
             raise
     
-    async def _auto_close(self, duration: int):
-        """Auto-close door after specified duration"""
-        await asyncio.sleep(duration)
-        if self.is_door_open:
-            self.close_door()
-    
     def close_door(self):
         """Close door lock immediately"""
         if not self.is_connected():
@@ -0,0 +1,73 @@
+"""
+Event Codec - Serialize each outbound message once
+A Frame is one message encoded a single time; the same encoded text is
+journaled, kept in the replay ring and queued for every recipient, instead
+of being serialized again per channel or per client.
+
+orjson is used when installed (several times faster than the json module);
+otherwise the json module produces the same compact output.
+"""
+
+from typing import Any, Dict, Optional
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+def dumps(message: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson:
+        return orjson.dumps(message)
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Frame:
+    __slots__ = ("message", "_data", "_text")
+
+    def __init__(self, message: Dict, data: Optional[bytes] = None, text: Optional[str] = None):
+        """
+        One message and its encoding
+
+        Args:
+            message: The message dict (not modified)
+            data: Its JSON bytes, if already encoded
+            text: Its JSON text, if already encoded (e.g. as received)
+        """
+        self.message = message
+        self._text = text
+        self._data = data if data is not None or text is not None else dumps(message)
+
+    @property
+    def data(self) -> bytes:
+        """The JSON as UTF-8 bytes (journal lines)"""
+        if self._data is None:
+            self._data = self._text.encode("utf-8")
+        return self._data
+
+    @property
+    def text(self) -> str:
+        """The JSON as str (WebSocket text frames), decoded once"""
+        if self._text is None:
+            self._text = self._data.decode("utf-8")
+        return self._text
+
+
+def encode(message: Dict) -> Frame:
+    return Frame(message)
+
+
+def decode(text: str) -> Frame:
+    """Frame for received JSON text; forwarding it needs no re-encoding"""
+    return Frame(loads(text), text=text)
@@ -0,0 +1,295 @@
+"""
+Event Journal - Durable, append-only log of hardware events
+Every event gets a monotonic sequence number and is written to a local
+segment file before it is broadcast, so events emitted while no client is
+connected are not lost. A writer thread group-commits pending events:
+one write and one fsync per batch, however many events arrived.
+
+Segments are newline-delimited JSON named events-<first seq>.jsonl and
+rotated by size; the oldest segments are deleted past max_segments.
+"""
+
+from event_codec import Frame
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def segment_name(first_seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}"
+
+
+def line_seq(line: bytes) -> int:
+    """Sequence number of a journal line (lines always start with {"seq":N)"""
+    start = line.find(b":") + 1
+    end = line.find(b",", start)
+    if end < 0:
+        end = line.find(b"}", start)
+    return int(line[start:end])
+
+
+class EventJournal:
+    def __init__(self, directory: str = "data/journal", segment_max_bytes: int = 8 * 1024 * 1024,
+                 max_segments: int = 16, commit_interval: float = 0.005):
+        """
+        Initialize event journal (recovers the last sequence number from disk)
+
+        Args:
+            directory: Folder holding the segment files
+            segment_max_bytes: Rotate to a new segment past this size
+            max_segments: Segments kept on disk (oldest deleted first)
+            commit_interval: Seconds the writer waits after the first pending
+                             event so a burst lands in one commit
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.commit_interval = commit_interval
+
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        self._batch: List[bytes] = []
+        self._durable = threading.Condition(self._lock)
+        self._running = True
+
+        self.segments: List[int] = self._scan_segments()  # first seq of each segment, ascending
+        self.last_seq = self._recover()
+        self.durable_seq = self.last_seq
+        self._file = None
+        self._file_size = 0
+
+        self.appended = 0
+        self.committed = 0
+        self.commits = 0
+        self.fsync_ms_total = 0.0
+        self.fsync_ms_max = 0.0
+        self.largest_batch = 0
+
+        self._thread = threading.Thread(target=self._writer, name="event-journal", daemon=True)
+        self._thread.start()
+        logger.info(f"Event journal opened at {self.directory} (last seq {self.last_seq})")
+
+    # ---------- recovery ----------
+
+    def _scan_segments(self) -> List[int]:
+        segments = []
+        for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+            try:
+                segments.append(int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+            except ValueError:
+                logger.warning(f"Ignoring unexpected journal file {path.name}")
+        return sorted(segments)
+
+    def _segment_path(self, first_seq: int) -> Path:
+        return self.directory / segment_name(first_seq)
+
+    def _recover(self) -> int:
+        """Find the last committed sequence number, dropping a torn final line"""
+        while self.segments:
+            path = self._segment_path(self.segments[-1])
+            data = path.read_bytes()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                logger.warning(f"Truncating torn write at the end of {path.name}")
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+
+            lines = data[:end].splitlines()
+            if lines:
+                return line_seq(lines[-1])
+
+            # Empty segment: nothing was committed to it
+            path.unlink()
+            self.segments.pop()
+        return 0
+
+    # ---------- writing ----------
+
+    def append(self, event: Dict) -> Frame:
+        """
+        Assign the next sequence number and queue the event for commit
+
+        Returns immediately; the event is durable once the writer's next
+        commit finishes (use wait_durable to block on it).
+
+        Returns:
+            The encoded event with its "seq" field (the journal line, reused
+            for broadcasting)
+        """
+        with self._lock:
+            self.last_seq += 1
+            frame = Frame({"seq": self.last_seq, **event})
+            self._batch.append(frame.data + b"\n")
+            self.appended += 1
+            if len(self._batch) == 1:
+                self._pending.notify()
+        return frame
+
+    def wait_durable(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """Block until seq has been fsynced (returns False on timeout)"""
+        with self._lock:
+            return self._durable.wait_for(lambda: self.durable_seq >= seq, timeout)
+
+    def _writer(self):
+        while True:
+            with self._lock:
+                self._pending.wait_for(lambda: self._batch or not self._running)
+                if not self._batch and not self._running:
+                    break
+
+            # Let the rest of a burst arrive, then take everything queued
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            with self._lock:
+                batch, self._batch = self._batch, []
+                batch_last_seq = self.last_seq
+
+            try:
+                self._commit(batch, batch_last_seq)
+            except Exception as e:
+                # The batch is lost from disk (its events were still broadcast);
+                # reopen the segment on the next commit
+                logger.error(f"Event journal commit failed, {len(batch)} event(s) not persisted: {e}")
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                continue
+
+            with self._lock:
+                self.durable_seq = batch_last_seq
+                self._durable.notify_all()
+
+        if self._file:
+            self._file.close()
+
+    def _commit(self, batch: List[bytes], batch_last_seq: int):
+        """Write one batch and fsync it"""
+        if self._file is None or self._file_size >= self.segment_max_bytes:
+            self._rotate(batch_last_seq - len(batch) + 1)
+
+        data = b"".join(batch)
+        self._file.write(data)
+        self._file.flush()
+        started = time.perf_counter()
+        os.fsync(self._file.fileno())
+        fsync_ms = (time.perf_counter() - started) * 1000
+
+        self._file_size += len(data)
+        self.committed += len(batch)
+        self.commits += 1
+        self.fsync_ms_total += fsync_ms
+        self.fsync_ms_max = max(self.fsync_ms_max, fsync_ms)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def _rotate(self, first_seq: int):
+        """Start a new segment whose first event is first_seq"""
+        # First commit after a restart: keep appending to the last segment if it has room
+        if self._file is None and self.segments:
+            path = self._segment_path(self.segments[-1])
+            if path.stat().st_size < self.segment_max_bytes:
+                self._file = open(path, "ab")
+                self._file_size = path.stat().st_size
+                return
+
+        if self._file:
+            self._file.close()
+
+        self.segments.append(first_seq)
+        self._file = open(self._segment_path(first_seq), "ab")
+        self._file_size = 0
+
+        # The previous segment is closed above; a segment leaves the index only once
+        # its file is gone, so a failed delete (a replay still reading it) is retried
+        # at the next rotation
+        while len(self.segments) > self.max_segments:
+            oldest = self.segments[0]
+            try:
+                self._segment_path(oldest).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not delete journal segment {oldest}: {e}")
+                break
+            self.segments.pop(0)
+
+    # ---------- reading ----------
+
+    def read_range(self, after_seq: int, until_seq: int) -> Iterator[str]:
+        """
+        Read committed events with after_seq < seq <= until_seq
+        Blocking file I/O; call from a worker thread. Waits for until_seq to
+        be committed first.
+
+        Yields:
+            Event JSON lines (without the newline), in seq order
+        """
+        self.wait_durable(until_seq, timeout=5)
+        with self._lock:
+            segments = list(self.segments)
+
+        # Start from the segment that holds after_seq + 1
+        position = max(bisect_right(segments, after_seq + 1) - 1, 0)
+        for first_seq in segments[position:]:
+            if first_seq > until_seq:
+                return
+            try:
+                f = open(self._segment_path(first_seq), "rb")
+            except FileNotFoundError:
+                continue  # deleted by retention meanwhile
+            with f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        return  # not committed yet
+                    seq = line_seq(line)
+                    if seq <= after_seq:
+                        continue
+                    if seq > until_seq:
+                        return
+                    yield line[:-1].decode("utf-8")
+
+    def read_tail(self) -> Iterator[str]:
+        """Read committed events of the newest segment (blocking file I/O)"""
+        with self._lock:
+            if not self.segments:
+                return
+            first_seq, last_seq = self.segments[-1], self.durable_seq
+        yield from self.read_range(first_seq - 1, last_seq)
+
+    def first_seq(self) -> Optional[int]:
+        """Oldest sequence number still on disk"""
+        with self._lock:
+            return self.segments[0] if self.segments else None
+
+    def close(self):
+        """Commit everything still pending and stop the writer"""
+        with self._lock:
+            self._running = False
+            self._pending.notify()
+        self._thread.join()
+        logger.info(f"Event journal closed (last seq {self.durable_seq})")
+
+    def get_stats(self) -> Dict:
+        """Sequence numbers, group-commit and fsync figures"""
+        with self._lock:
+            return {
+                "last_seq": self.last_seq,
+                "durable_seq": self.durable_seq,
+                "pending": len(self._batch),
+                "appended": self.appended,
+                "committed": self.committed,
+                "commits": self.commits,
+                "avg_batch": round(self.committed / self.commits, 2) if self.commits else None,
+                "largest_batch": self.largest_batch,
+                "fsync_ms_avg": round(self.fsync_ms_total / self.commits, 3) if self.commits else None,
+                "fsync_ms_max": round(self.fsync_ms_max, 3),
+                "segments": len(self.segments),
+                "first_seq": self.segments[0] if self.segments else None
+            }
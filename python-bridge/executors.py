@@ -0,0 +1,188 @@
+"""
+Executors - Named, separately sized thread pools for blocking work
+Work that cannot run on the event loop goes to the pool for its kind, so a
+slow job of one kind cannot starve the others:
+
+    serial       door lock serial I/O (one owner for the port)
+    background   file work: journal replay reads, attendance archive reads
+
+Reader I/O (live capture and device commands) does not use these pools:
+each reader has its own device actor thread (see device_actor.py), whose
+utilization is reported next to the pools.
+
+Every pool reports utilization and queue wait (submit -> start).
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {
+    "serial": 1,
+    "background": 4
+}
+
+# recent_utilization covers the last one to two windows of this length
+RECENT_WINDOW_SECONDS = 60
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    def __init__(self, name: str, max_workers: int):
+        """
+        Thread pool that records queue wait, run time and utilization
+
+        Args:
+            name: Pool name (also the thread name prefix)
+            max_workers: Number of threads
+        """
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._running: Dict[int, float] = {}  # task id -> started at
+        self._task_ids = 0
+
+        self.created_at = time.monotonic()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_active = 0
+        self.busy_seconds = 0.0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.run_ms_max = 0.0
+        # (monotonic, busy seconds) at the start of the current and the previous recent window
+        self._window = (self.created_at, 0.0)
+        self._previous_window = self._window
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        queued_at = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+            self._task_ids += 1
+            task_id = self._task_ids
+        return super().submit(self._run, task_id, queued_at, fn, args, kwargs)
+
+    def _run(self, task_id: int, queued_at: float, fn: Callable, args, kwargs):
+        started_at = time.monotonic()
+        wait_ms = (started_at - queued_at) * 1000
+        with self._lock:
+            self.started += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            self._running[task_id] = started_at
+            self.peak_active = max(self.peak_active, len(self._running))
+            self._roll_window(started_at)
+
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            run_seconds = time.monotonic() - started_at
+            with self._lock:
+                del self._running[task_id]
+                self.busy_seconds += run_seconds
+                self.run_ms_max = max(self.run_ms_max, run_seconds * 1000)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self._roll_window(time.monotonic())
+
+    def _busy(self, now: float) -> float:
+        """Busy thread seconds so far, including tasks still running (caller holds the lock)"""
+        return self.busy_seconds + sum(now - started for started in self._running.values())
+
+    def _roll_window(self, now: float):
+        """Start a new recent window once the current one is full (caller holds the lock)"""
+        if now - self._window[0] >= RECENT_WINDOW_SECONDS:
+            self._previous_window = self._window
+            self._window = (now, self._busy(now))
+
+    def get_stats(self) -> Dict:
+        """
+        Pool size, queue depth, queue wait and utilization
+        utilization is busy thread time / available thread time since the
+        pool started; recent_utilization covers the previous and the current
+        recent window (rolled as tasks start and finish, so reading stats
+        changes nothing).
+        """
+        now = time.monotonic()
+        with self._lock:
+            busy = self._busy(now)
+            window_start, window_busy = self._previous_window
+            elapsed = now - self.created_at
+            return {
+                "workers": self.max_workers,
+                "active": len(self._running),
+                "peak_active": self.peak_active,
+                "queued": self.submitted - self.started,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "wait_ms_avg": round(self.wait_ms_total / self.started, 3) if self.started else None,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "run_ms_max": round(self.run_ms_max, 3),
+                "busy_seconds": round(busy, 3),
+                "utilization": round(busy / (self.max_workers * elapsed), 4) if elapsed else 0,
+                "recent_utilization": round((busy - window_busy) / (self.max_workers * (now - window_start)), 4)
+                if now > window_start else 0
+            }
+
+
+_sizes: Dict[str, int] = dict(DEFAULT_SIZES)
+_executors: Dict[str, InstrumentedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def configure(sizes: Optional[Dict[str, int]]):
+    """Set pool sizes (before first use; e.g. from config python_bridge.executors)"""
+    for name, size in (sizes or {}).items():
+        if name in _executors:
+            logger.warning(f"Executor '{name}' already running, size change ignored")
+            continue
+        _sizes[name] = int(size)
+
+
+def get_executor(name: str) -> InstrumentedExecutor:
+    """Get a named pool (created on first use)"""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            if name not in _sizes:
+                raise KeyError(f"Unknown executor '{name}'")
+            executor = _executors[name] = InstrumentedExecutor(name, _sizes[name])
+            logger.info(f"Executor '{name}' started with {_sizes[name]} worker(s)")
+        return executor
+
+
+async def run_in(name: str, fn: Callable, *args, **kwargs):
+    """Run a blocking call on a named pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), partial(fn, *args, **kwargs))
+
+
+def shutdown(wait: bool = False):
+    """Shut every pool down (queued work is cancelled)"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def get_stats() -> Dict[str, Dict]:
+    """Stats of every pool that has been used"""
+    with _executors_lock:
+        executors = dict(_executors)
+    return {name: executor.get_stats() for name, executor in executors.items()}
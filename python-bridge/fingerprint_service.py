@@ -8,16 +8,31 @@ from zk.user import User
 from zk.finger import Finger
 from zk.attendance import Attendance
 from zk.exception import ZKErrorResponse, ZKNetworkError
+from struct import pack
 import asyncio
 import logging
-from typing import List, Dict, Optional
+import time
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime
 
+from attendance_sync import AttendanceCursorStore, record_key
+from user_directory import UserDirectory
+from scan_pipeline import ScanDebouncer
+from attendance_backfill import GapBackfill, journaled_scans
+from attendance_archive import AttendanceArchive, AttendanceArchiveError
+from device_actor import DeviceActor, PRIORITY_DOOR, PRIORITY_ENROLL, PRIORITY_ADMIN, PRIORITY_READ
+
 logger = logging.getLogger(__name__)
 
+# pyzk's (undocumented) command that stores an uploaded user/template buffer
+CMD_SAVE_USERTEMPS = 110
+
 
 class FingerprintService:
-    def __init__(self, ip: str, port: int = 4370, timeout: int = 60, ws_manager=None):
+    def __init__(self, ip: str, port: int = 4370, timeout: int = 60, ws_manager=None,
+                 device_id: str = "default", name: Optional[str] = None,
+                 capture_poll_interval: float = 0.1, debounce_seconds: float = 5.0,
+                 ommit_ping: bool = False):
         """
         Initialize fingerprint service
         
@@ -26,18 +41,53 @@ class FingerprintService:
             port: Port number (default 4370)
             timeout: Connection timeout in seconds (60s for enrollment operations)
             ws_manager: WebSocket manager for broadcasting events
+            device_id: Reader id, added to every emitted event
+            name: Human-readable reader name (e.g. "Front door")
+            capture_poll_interval: Live capture socket timeout in seconds; the
+                longest a queued command waits for the capture poll to return
+            debounce_seconds: Repeat scans from the same user within this
+                window are not forwarded as finger_scanned events
+            ommit_ping: Skip pyzk's ICMP ping before connecting (for hosts
+                without ping, e.g. the local zk_simulator)
         """
         self.ip = ip
         self.port = port
         self.timeout = timeout
         self.ws_manager = ws_manager
+        self.device_id = device_id
+        self.name = name or device_id
         self.event_loop = None  # Store reference to event loop
         
-        self.zk = ZK(ip, port=port, timeout=timeout, password=0, force_udp=False, ommit_ping=False)
+        self.zk = ZK(ip, port=port, timeout=timeout, password=0, force_udp=False, ommit_ping=ommit_ping)
         self.conn = None
         self.is_capturing = False
+        self.capture_poll_interval = capture_poll_interval
+        self._capture_records = None  # open live_capture generator
+        self.scan_debouncer = ScanDebouncer(debounce_seconds)
+        self.backfill = GapBackfill(debounce_seconds)
+        self._backfill_pending = False  # capture was interrupted, reconcile before resuming
+        
+        # All device I/O runs on this reader's actor thread, live capture in between commands
+        self.actor = DeviceActor(device_id, idle=self._capture_step, before_command=self._suspend_capture)
+        self.actor.start()
+        
+        # Device state snapshot served by /health (refreshed in the background)
+        self.device_details: Dict = {}
+        self.device_counts: Dict = {}
+        self.counts_read_at: Optional[float] = None
+        self.snapshot: Optional[Dict] = None
+        self.snapshot_refreshed_at: Optional[float] = None
+        
+        # Bridge-side index of the device user table
+        self.user_directory = UserDirectory()
         
-        logger.info(f"Fingerprint service initialized for {ip}:{port} with timeout {timeout}s")
+        # Per-device sync state (assigned by the device registry)
+        self.attendance_cursor_store: Optional[AttendanceCursorStore] = None
+        self.attendance_archive: Optional[AttendanceArchive] = None
+        self.supervisor = None  # ConnectionSupervisor, when auto_reconnect is on
+        self.template_export_stats: Dict = {}
+        
+        logger.info(f"Fingerprint service '{device_id}' initialized for {ip}:{port} with timeout {timeout}s")
     
     def connect(self):
         """Connect to fingerprint device"""
@@ -49,17 +99,28 @@ class FingerprintService:
             logger.info(f"Connecting to fingerprint device at {self.ip}:{self.port}...")
             self.conn = self.zk.connect()
             
-            # Disable device during setup
-            self.conn.disable_device()
-            
-            # Get device info
-            firmware = self.conn.get_firmware_version()
-            serialno = self.conn.get_serialnumber()
-            
-            # Re-enable device
-            self.conn.enable_device()
+            try:
+                # Disable device during setup
+                self.conn.disable_device()
+                try:
+                    # Get device info (static, read once per connection)
+                    self.device_details = self._read_device_details()
+                    self.read_device_counts()
+                finally:
+                    # Re-enable device even when setup fails, or the reader stays locked
+                    self.conn.enable_device()
+                
+                # Load the user directory once per connection; reading the user
+                # table needs no disable window, so the scanner stays usable
+                self.get_users()
+            except Exception:
+                # Forget the half-open connection so a retry is not "Already connected"
+                self.drop_connection()
+                raise
             
-            logger.info(f"Connected successfully. Firmware: {firmware}, Serial: {serialno}")
+            logger.info(f"Connected successfully. Firmware: {self.device_details['firmware']}, "
+                        f"Serial: {self.device_details['serial_number']}")
+            self.refresh_snapshot()
             return True
             
         except ZKNetworkError as e:
@@ -80,37 +141,182 @@ class FingerprintService:
         except Exception as e:
             logger.error(f"Error disconnecting: {e}")
     
-    def reconnect(self):
-        """Reconnect to device"""
+    def reconnect(self, settle_delay: float = 2):
+        """
+        Reconnect to device (runs on the device actor)
+        Live capture resumes afterwards if it was running.
+        """
         logger.info("Attempting to reconnect to device...")
+        was_capturing = self.is_capturing
         self.disconnect()
-        asyncio.sleep(2)
+        time.sleep(settle_delay)
+        self.connect()
+        self.is_capturing = was_capturing
+    
+    def drop_connection(self):
+        """
+        Forget a connection that is known to be dead
+        Unlike disconnect() nothing is sent to the device, which would block
+        until the socket timeout.
+        """
+        self._capture_records = None
+        self.is_capturing = False
+        self.conn = None
+    
+    def recover_connection(self):
+        """Open a new session after the connection was lost (used by the supervisor)"""
+        self.drop_connection()
         self.connect()
     
     def is_connected(self) -> bool:
         """Check if connected to device"""
         return self.conn is not None
     
+    async def run(self, fn: Callable, *args, priority: int = PRIORITY_READ, background: bool = False,
+                  **kwargs):
+        """
+        Run a blocking device call on this reader's actor thread
+        
+        Args:
+            fn: Blocking callable (usually a method of this service)
+            priority: Queue priority (see device_actor)
+            background: Wait for a break in live capture instead of suspending it
+        
+        Returns:
+            The call's result
+        """
+        if self.event_loop is None:
+            self.event_loop = asyncio.get_event_loop()
+        return await self.actor.call(fn, *args, priority=priority, background=background, **kwargs)
+    
+    def run_blocking(self, fn: Callable, *args, priority: int = PRIORITY_READ, **kwargs):
+        """Run a blocking device call on the actor thread and wait for it (from a worker thread)"""
+        return self.actor.call_blocking(fn, *args, priority=priority, **kwargs)
+    
+    async def close(self):
+        """Disconnect and stop the actor thread"""
+        await self.run(self.disconnect, priority=PRIORITY_DOOR)
+        self.actor.stop()
+    
+    def _read_device_details(self) -> Dict:
+        """Read static device details (firmware, serial, platform...)"""
+        return {
+            "firmware": self.conn.get_firmware_version(),
+            "serial_number": self.conn.get_serialnumber(),
+            "platform": self.conn.get_platform(),
+            "device_name": self.conn.get_device_name(),
+            "face_version": self.conn.get_face_version() if hasattr(self.conn, 'get_face_version') else None,
+            "fp_version": self.conn.get_fp_version() if hasattr(self.conn, 'get_fp_version') else None
+        }
+    
+    def read_device_counts(self) -> Dict:
+        """
+        Read record counts and capacities from the device
+        
+        Uses the single CMD_GET_FREE_SIZES query instead of downloading
+        the user table and attendance log.
+        """
+        if not self.conn:
+            raise Exception("Not connected to device")
+        
+        self.conn.read_sizes()
+        self.device_counts = {
+            "user_count": self.conn.users,
+            "fingerprint_count": self.conn.fingers,
+            "attendance_count": self.conn.records,
+            "user_capacity": self.conn.users_cap,
+            "fingerprint_capacity": self.conn.fingers_cap,
+            "attendance_capacity": self.conn.rec_cap
+        }
+        self.counts_read_at = time.time()
+        return self.device_counts
+    
     def get_device_info(self) -> Dict:
         """Get device information"""
         if not self.conn:
             return {"error": "Not connected"}
         
         try:
-            return {
-                "firmware": self.conn.get_firmware_version(),
-                "serial_number": self.conn.get_serialnumber(),
-                "platform": self.conn.get_platform(),
-                "device_name": self.conn.get_device_name(),
-                "face_version": self.conn.get_face_version() if hasattr(self.conn, 'get_face_version') else None,
-                "fp_version": self.conn.get_fp_version() if hasattr(self.conn, 'get_fp_version') else None,
-                "user_count": len(self.get_users()),
-                "attendance_count": len(self.get_attendance())
-            }
+            if not self.device_details:
+                self.device_details = self._read_device_details()
+            return {**self.device_details, **self.read_device_counts()}
         except Exception as e:
             logger.error(f"Error getting device info: {e}")
             return {"error": str(e)}
     
+    def refresh_snapshot(self, read_counts: bool = True) -> Dict:
+        """
+        Rebuild the device state snapshot (runs on the actor thread)
+        Between reads the attendance count is advanced from the scan stream
+        (see _handle_attendance).
+        
+        Args:
+            read_counts: Re-read the counts from the device; without it the
+                         snapshot is rebuilt from state already held and
+                         needs no device I/O
+        """
+        snapshot = {
+            "connected": self.is_connected(),
+            "is_capturing": self.is_capturing
+        }
+        
+        if self.conn:
+            try:
+                if read_counts:
+                    self.read_device_counts()
+            except Exception as e:
+                logger.error(f"Error refreshing device snapshot: {e}")
+                snapshot["error"] = str(e)
+            snapshot.update(self.device_details)
+            snapshot.update(self.device_counts)
+            snapshot["counts_read_at"] = (
+                datetime.fromtimestamp(self.counts_read_at).isoformat() if self.counts_read_at else None
+            )
+        
+        self.snapshot = snapshot
+        self.snapshot_refreshed_at = time.time()
+        return self.get_snapshot()
+    
+    def get_snapshot(self) -> Dict:
+        """Get the last device state snapshot along with its age"""
+        if self.snapshot is None:
+            return {
+                "connected": self.is_connected(),
+                "is_capturing": self.is_capturing,
+                "refreshed_at": None,
+                "age_seconds": None
+            }
+        
+        return {
+            **self.snapshot,
+            "refreshed_at": datetime.fromtimestamp(self.snapshot_refreshed_at).isoformat(),
+            "age_seconds": round(time.time() - self.snapshot_refreshed_at, 3)
+        }
+    
+    async def run_snapshot_refresher(self, interval: float = 30):
+        """
+        Refresh the device state snapshot every `interval` seconds
+        While live capture runs the counts are kept current from the scan
+        stream, so the snapshot is rebuilt without stopping capture.
+        
+        Args:
+            interval: Seconds between refreshes
+        """
+        logger.info(f"Device snapshot refresher started (every {interval}s)")
+        try:
+            while True:
+                try:
+                    if self.is_capturing:
+                        self.refresh_snapshot(read_counts=False)
+                    else:
+                        await self.run(self.refresh_snapshot)
+                except Exception as e:
+                    logger.error(f"Error refreshing device snapshot: {e}")
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            logger.info("Device snapshot refresher stopped")
+            raise
+    
     def get_users(self) -> List[User]:
         """Get all users from device"""
         if not self.conn:
@@ -119,11 +325,54 @@ class FingerprintService:
         try:
             users = self.conn.get_users()
             logger.info(f"Retrieved {len(users)} users from device")
+            # Every full read doubles as a directory reconciliation
+            self.user_directory.reconcile(users)
             return users
         except Exception as e:
             logger.error(f"Error getting users: {e}")
             raise
     
+    def get_templates(self) -> List[Finger]:
+        """Get all fingerprint templates from device"""
+        if not self.conn:
+            raise Exception("Not connected to device")
+        
+        try:
+            templates = self.conn.get_templates()
+            logger.info(f"Retrieved {len(templates)} fingerprint templates")
+            return templates
+        except Exception as e:
+            logger.error(f"Error getting templates: {e}")
+            raise
+    
+    def reconcile_user_directory(self) -> Optional[Dict]:
+        """Reconcile the user directory against the device user table"""
+        if not self.conn:
+            return None
+        
+        self.get_users()
+        return {"users": len(self.user_directory)}
+    
+    async def run_directory_reconciler(self, interval: float = 300):
+        """
+        Reconcile the user directory every `interval` seconds
+        Runs in a break of live capture rather than suspending it.
+        
+        Args:
+            interval: Seconds between reconciliations
+        """
+        logger.info(f"User directory reconciler started (every {interval}s)")
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.run(self.reconcile_user_directory, background=True)
+                except Exception as e:
+                    logger.error(f"Error reconciling user directory: {e}")
+        except asyncio.CancelledError:
+            logger.info("User directory reconciler stopped")
+            raise
+    
     def get_attendance(self) -> List[Attendance]:
         """Get all attendance records from device"""
         if not self.conn:
@@ -137,6 +386,148 @@ class FingerprintService:
             logger.error(f"Error getting attendance: {e}")
             raise
     
+    def get_attendance_since(self, since: Optional[Tuple[datetime, int]] = None,
+                             known_record_count: Optional[int] = None) -> Dict:
+        """
+        Get attendance records newer than a (timestamp, uid) high-water mark
+        
+        The device has no "records since" query, so the log is still read in
+        full when it has changed; when its record count matches the count seen
+        at the last sync the download is skipped entirely.
+        
+        Args:
+            since: Only return records with a (timestamp, uid) key above this
+            known_record_count: Device record count at the previous sync
+        
+        Returns:
+            Dict with the new records (oldest first), the newest key and the
+            current device record count
+        """
+        if not self.conn:
+            raise Exception("Not connected to device")
+        
+        record_count = self.read_device_counts()["attendance_count"]
+        # An equal count alone is not proof: a cleared log may have refilled
+        # to it. A punch seen live after the cursor means new records too.
+        latest_seen = self.backfill.index.latest()
+        if (since is not None and known_record_count == record_count
+                and (latest_seen is None or latest_seen <= since[0])):
+            logger.info(f"Attendance log unchanged ({record_count} records), skipping download")
+            return {"records": [], "last_key": since, "record_count": record_count}
+        
+        records = self.get_attendance()
+        if since is not None:
+            records = [record for record in records if record_key(record) > since]
+        records.sort(key=record_key)
+        
+        last_key = record_key(records[-1]) if records else since
+        logger.info(f"{len(records)} attendance records newer than {since}")
+        return {"records": records, "last_key": last_key, "record_count": record_count}
+    
+    def archive_and_clear_attendance(self) -> Dict:
+        """
+        Archive the device attendance log locally, then clear it
+        The device is disabled for the whole operation so no punch lands
+        between the download and the clear. The log is only cleared once the
+        archive file has been read back with the same record count and
+        checksum, and the download matched the device record count.
+        
+        Returns:
+            Dict with the archive manifest entry
+        
+        Raises:
+            AttendanceArchiveError: If the download or the archive did not verify
+                                    (the device log is left untouched)
+        """
+        if not self.conn:
+            raise Exception("Not connected to device")
+        if self.attendance_archive is None:
+            raise Exception("Attendance archive not configured")
+        
+        self.conn.disable_device()
+        try:
+            record_count = self.read_device_counts()["attendance_count"]
+            records = self.conn.get_attendance()
+            if len(records) != record_count:
+                raise AttendanceArchiveError(
+                    f"Downloaded {len(records)} records but the device reports {record_count}")
+            if not records:
+                return {"archived": 0, "entry": None}
+            
+            entry = self.attendance_archive.write(records)
+            
+            # Punches live capture missed must go out before the log is gone
+            if self.backfill.needs_download(len(records)):
+                for attendance in self.backfill.diff(records):
+                    self._emit_threadsafe(self._scan_event(attendance, backfilled=True))
+            
+            try:
+                self.conn.clear_attendance()
+            except Exception:
+                self._clear_failed(entry)
+                raise
+            self._attendance_cleared()
+            self.device_counts["attendance_count"] = 0
+            logger.info(f"Attendance log cleared after archiving {len(records)} records")
+            return {"archived": len(records), "entry": entry}
+        finally:
+            self.conn.enable_device()
+    
+    def seed_backfill(self):
+        """Index this reader's journaled scans so backfill resumes after a restart"""
+        journal = self.ws_manager.journal if self.ws_manager else None
+        if not journal:
+            return
+        try:
+            self.backfill.seed(journaled_scans(journal.read_tail(), self.device_id))
+        except Exception as e:
+            logger.warning(f"Could not seed backfill from the event journal: {e}")
+    
+    def backfill_gaps(self) -> Optional[Dict]:
+        """
+        Emit punches the device logged but live capture never delivered
+        Runs on the actor thread with live capture suspended. The device
+        record count is checked first; the log is only downloaded and diffed
+        when it holds records that were not seen live.
+        
+        Returns:
+            Backfill stats (None when not connected)
+        """
+        if not self.conn:
+            return None
+        
+        self._backfill_pending = False
+        record_count = self.read_device_counts()["attendance_count"]
+        if self.backfill.needs_download(record_count):
+            missing = self.backfill.diff(self.conn.get_attendance())
+            if missing:
+                logger.info(f"Backfilling {len(missing)} missed punch(es)")
+            for attendance in missing:
+                self._emit_threadsafe(self._scan_event(attendance, backfilled=True))
+        return self.backfill.get_stats()
+    
+    async def run_gap_backfill(self, interval: float = 60):
+        """
+        Reconcile the attendance log against emitted scans every `interval` seconds
+        Runs in a break of live capture rather than suspending it (capture
+        backfills by itself whenever it resumes after a command).
+        
+        Args:
+            interval: Seconds between reconciliations
+        """
+        logger.info(f"Attendance gap backfill started (every {interval}s)")
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.run(self.backfill_gaps, background=True)
+                except Exception as e:
+                    self.backfill.last_error = str(e)
+                    logger.error(f"Error backfilling attendance: {e}")
+        except asyncio.CancelledError:
+            logger.info("Attendance gap backfill stopped")
+            raise
+    
     def clear_attendance(self):
         """Clear all attendance records from device"""
         if not self.conn:
@@ -144,76 +535,52 @@ class FingerprintService:
         
         try:
             self.conn.clear_attendance()
+            self._attendance_cleared()
             logger.info("Attendance records cleared")
         except Exception as e:
             logger.error(f"Error clearing attendance: {e}")
             raise
     
-    async def enroll_user(self, user_id: int, finger_id: int = 0) -> Dict:
+    def _clear_failed(self, entry: Dict):
+        """Drop the archive run of a clear that left the records on the device"""
+        try:
+            still_held = self.read_device_counts()["attendance_count"]
+        except Exception as e:
+            # Maybe cleared after all; keep the archive, reads skip duplicates
+            logger.warning(f"Attendance clear failed and the device count is unreadable, "
+                           f"keeping archive {entry['file']}: {e}")
+            return
+        if still_held:
+            self.attendance_archive.discard(entry)
+    
+    def _attendance_cleared(self):
+        """Reset the record counts kept for the device log after a clear"""
+        self.backfill.expected_count = 0
+        if self.attendance_cursor_store:
+            self.attendance_cursor_store.invalidate_record_count()
+    
+    async def enroll_user(self, user_id: int, finger_id: int = 0, run: Optional[Callable] = None) -> Dict:
         """
-        Enroll a new fingerprint - Simplified to match old working code
-        Old code stops live capture BEFORE enrollment, then restarts after
+        Enroll a new fingerprint
+        Runs on the device actor at enrollment priority; the actor suspends
+        live capture before the enrollment and resumes it afterwards.
         
         Args:
             user_id: Unique user ID
             finger_id: Finger slot number (default 0 like old code)
+            run: Runs the device work (default self.run; the hardware API
+                 passes its call() to add the timeout and busy rejection)
         
         Returns:
             Dict with enrollment result
         """
-        was_capturing = False
+        run = run or self.run
         try:
             logger.info(f"Starting enrollment for user {user_id}, finger {finger_id}")
             
-            # CRITICAL: Stop attendance capture before enrollment (like old code does)
-            if self.is_capturing:
-                logger.info("Stopping attendance capture for enrollment...")
-                was_capturing = True
-                await self.stop_capture()
-                logger.info("✓ Attendance capture stopped")
-            
-            # Emit enrollment started event (emit = websocket broadcast to UI)
-            await self.emit_event({
-                "type": "enrollment_started",
-                "user_id": user_id,
-                "finger_id": finger_id,
-                "instructions": "Place finger on scanner - enrollment starting..."
-            })
-            
-            # Match old working code EXACTLY:
-            # Line 1331: self.stop_live_capture_thread()  <-- STOP CAPTURE FIRST
-            # Line 1357: self.conn = self.zk.connect()    <-- CREATE FRESH CONNECTION
-            # Line 1380: self.conn.enroll_user(uid, 0)    <-- ENROLL WITH FRESH CONNECTION
-            # Line 1414: self.start_live_capture_thread() <-- RESTART AFTER
-            
-            logger.info("Creating fresh connection for enrollment (like old code line 1357)...")
-            
-            # Import time for timing
-            import time
-            start_time = time.time()
-            
-            # Create FRESH connection after stopping capture (matches old code exactly)
-            loop = asyncio.get_event_loop()
-            self.conn = await loop.run_in_executor(None, self.zk.connect)
-            logger.info("✓ Fresh connection established for enrollment")
-            
-            # Give device time to settle after new connection (important!)
-            await asyncio.sleep(0.5)
-            logger.info("Device ready for enrollment")
-            
-            # Now call enroll_user on this fresh connection
-            logger.info(f"Calling conn.enroll_user({user_id}, {finger_id})...")
-            await loop.run_in_executor(None, self.conn.enroll_user, user_id, finger_id)
-            
-            elapsed_time = time.time() - start_time
-            logger.info(f"✓ Enrollment completed after {elapsed_time:.2f} seconds")
-            
-            # Play success sound on device (if supported)
-            try:
-                self.conn.test_voice(0)
-                logger.info("Played success sound on device")
-            except Exception as e:
-                logger.warning(f"Could not play voice: {e}")
+            # enrollment_started is emitted by the worker once the scanner prompts
+            await run(self._enroll_worker, user_id, finger_id, time.monotonic(),
+                      priority=PRIORITY_ENROLL)
             
             # Emit success event
             await self.emit_event({
@@ -223,12 +590,6 @@ class FingerprintService:
                 "success": True
             })
             
-            # Restart attendance capture if it was running (like old code does)
-            if was_capturing:
-                logger.info("Restarting attendance capture after enrollment...")
-                await self.start_capture()
-                logger.info("✓ Attendance capture restarted")
-            
             return {
                 "success": True,
                 "user_id": user_id,
@@ -239,17 +600,12 @@ class FingerprintService:
         except Exception as e:
             logger.error(f"Error during enrollment: {e}")
             
-            # Restart capture if it was running before error
-            if was_capturing:
-                logger.info("Restarting attendance capture after enrollment error...")
-                try:
-                    await self.start_capture()
-                except:
-                    pass
-            
             # Re-enable device on error
             if self.conn:
-                self.conn.enable_device()
+                try:
+                    await run(self.conn.enable_device, priority=PRIORITY_ENROLL)
+                except Exception as enable_error:
+                    logger.warning(f"Could not re-enable device: {enable_error}")
             
             await self.emit_event({
                 "type": "enrollment_error",
@@ -262,6 +618,246 @@ class FingerprintService:
                 "error": str(e)
             }
     
+    def _enroll_worker(self, user_id: int, finger_id: int, requested_at: float):
+        """
+        Run the enrollment on the actor thread (live capture is already suspended)
+        Reuses the live connection, which the capture loop keeps authenticated
+        and polled, so the scanner prompts as soon as capture is suspended.
+        
+        Args:
+            user_id: Device uid to enroll
+            finger_id: Finger slot number
+            requested_at: time.monotonic() when the enrollment was requested
+        """
+        if not self.conn:
+            raise Exception("Not connected to device")
+        
+        # pyzk downloads the whole user table to resolve user_id; use the directory
+        user = self.user_directory.get_by_uid(user_id)
+        if not user:
+            # Created on the device since the last read; refresh from the device
+            self.get_users()
+            user = self.user_directory.get_by_uid(user_id)
+        if not user:
+            raise Exception(f"User {user_id} does not exist on the device")
+        
+        prompt_latency_ms = round((time.monotonic() - requested_at) * 1000, 1)
+        logger.info(f"Enrollment prompt ready after {prompt_latency_ms} ms")
+        
+        # Emit enrollment started event (emit = websocket broadcast to UI)
+        self._emit_threadsafe({
+            "type": "enrollment_started",
+            "user_id": user_id,
+            "finger_id": finger_id,
+            "prompt_latency_ms": prompt_latency_ms,
+            "instructions": "Place finger on scanner - enrollment starting..."
+        })
+        
+        logger.info(f"Calling conn.enroll_user({user_id}, {finger_id})...")
+        start_time = time.time()
+        enrolled = self.conn.enroll_user(user_id, finger_id, user_id=user.user_id)
+        
+        elapsed_time = time.time() - start_time
+        if not enrolled:
+            # pyzk reports a timeout, a cancelled scan or a rejected template as False
+            raise Exception(f"Enrollment failed after {elapsed_time:.2f} seconds")
+        logger.info(f"✓ Enrollment completed after {elapsed_time:.2f} seconds")
+        
+        # Play success sound on device (if supported)
+        try:
+            self.conn.test_voice(0)
+            logger.info("Played success sound on device")
+        except Exception as e:
+            logger.warning(f"Could not play voice: {e}")
+    
+    def _emit_threadsafe(self, event: Dict):
+        """Schedule emit_event on the main event loop from a worker thread"""
+        if self.ws_manager and self.event_loop:
+            asyncio.run_coroutine_threadsafe(self.emit_event(event), self.event_loop)
+    
+    @staticmethod
+    def parse_sync_entry(entry: Dict) -> Tuple[User, List[Finger]]:
+        """
+        Build a pyzk user and its fingerprint templates from a sync entry
+        
+        Entry format:
+            {"user_id": "42", "uid": 42, "name": "...", "privilege": 0,
+             "password": "", "card": 0, "group_id": "",
+             "templates": [{"fid": 0, "template": "<hex>", "valid": 1}]}
+        uid defaults to the numeric user_id (as enrollment does).
+        
+        Raises:
+            ValueError: If the entry is incomplete or malformed
+        """
+        if not isinstance(entry, dict):
+            raise ValueError("entry must be an object")
+        
+        user_id = entry.get("user_id")
+        if user_id in (None, ""):
+            raise ValueError("user_id is required")
+        
+        uid = int(entry.get("uid", user_id))
+        if not 0 < uid <= 0xFFFF:
+            raise ValueError(f"uid {uid} out of range")
+        
+        user = User(
+            uid,
+            entry.get("name") or f"NN-{user_id}",
+            int(entry.get("privilege", const.USER_DEFAULT)),
+            password=str(entry.get("password", "")),
+            group_id=str(entry.get("group_id", "")),
+            user_id=str(user_id),
+            card=int(entry.get("card", 0))
+        )
+        
+        fingers = []
+        for template in entry.get("templates", []):
+            if not isinstance(template, dict):
+                raise ValueError("template must be an object")
+            fid = int(template.get("fid", 0))
+            if not 0 <= fid <= 9:
+                raise ValueError(f"finger id {fid} out of range")
+            fingers.append(Finger.json_unpack({
+                "uid": uid,
+                "fid": fid,
+                "valid": template.get("valid", 1),
+                "template": template["template"]
+            }))
+        return user, fingers
+    
+    async def sync_users(self, entries: List[Dict], batch_size: int = 50,
+                         run: Optional[Callable] = None) -> Dict:
+        """
+        Upload many users and their templates in one device session
+        
+        Runs on the device actor; the device is disabled once for the whole run. Each batch of users is
+        written with one buffered upload (falling back to one
+        save_user_template per user if that fails), the device data is
+        refreshed once at the end, and sync_progress events are emitted
+        after each batch.
+        
+        Args:
+            entries: Users to sync (see parse_sync_entry)
+            batch_size: Users per batch upload
+            run: Runs the device work (default self.run, see enroll_user)
+        
+        Returns:
+            Dict with per-user results and totals
+        """
+        if not self.conn:
+            raise Exception("Not connected to device")
+        
+        start_time = time.time()
+        results = []
+        pending = []
+        for entry in entries:
+            try:
+                user, fingers = self.parse_sync_entry(entry)
+                pending.append((user, fingers))
+            except (ValueError, KeyError, TypeError) as e:
+                user_id = entry.get("user_id") if isinstance(entry, dict) else None
+                results.append({"user_id": user_id, "success": False, "error": str(e)})
+        
+        total = len(entries)
+        logger.info(f"Starting bulk sync of {len(pending)} users ({total - len(pending)} rejected)")
+        
+        results.extend(await (run or self.run)(
+            self._sync_users_worker, pending, batch_size, total, len(results), priority=PRIORITY_ADMIN
+        ))
+        
+        synced = sum(1 for result in results if result["success"])
+        summary = {
+            "total": total,
+            "synced": synced,
+            "failed": total - synced,
+            "duration_ms": round((time.time() - start_time) * 1000, 1)
+        }
+        logger.info(f"Bulk sync finished: {summary}")
+        await self.emit_event({"type": "sync_complete", **summary})
+        
+        return {"success": synced == total, **summary, "results": results}
+    
+    def _sync_users_worker(self, pending: List[Tuple[User, List[Finger]]], batch_size: int,
+                           total: int, done: int) -> List[Dict]:
+        """Write users to the device inside a single disable/enable window"""
+        results = []
+        # Emitted here so a sync rejected before it ran does not announce itself
+        self._emit_threadsafe({"type": "sync_started", "total": total})
+        
+        self.conn.disable_device()
+        try:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                
+                try:
+                    self._save_users_batch(batch)
+                    batch_saved = True
+                except Exception as e:
+                    logger.warning(f"Batch upload failed, retrying users one by one: {e}")
+                    batch_saved = False
+                
+                for user, fingers in batch:
+                    result = {"user_id": user.user_id, "uid": user.uid, "templates": len(fingers)}
+                    try:
+                        if not batch_saved:
+                            self._save_user(user, fingers)
+                        self.user_directory.upsert(user)
+                        result["success"] = True
+                    except Exception as e:
+                        logger.error(f"Error syncing user {user.user_id}: {e}")
+                        result.update(success=False, error=str(e))
+                    results.append(result)
+                
+                done += len(batch)
+                self._emit_threadsafe({
+                    "type": "sync_progress",
+                    "done": done,
+                    "total": total,
+                    "failed": sum(1 for result in results if not result["success"])
+                })
+        finally:
+            try:
+                # One refresh for the whole sync instead of one per user
+                self.conn.refresh_data()
+            finally:
+                self.conn.enable_device()
+        
+        return results
+    
+    def _save_users_batch(self, batch: List[Tuple[User, List[Finger]]]):
+        """
+        Write several users and their templates in one buffered upload
+        
+        Builds the packet pyzk's save_user_template sends for a single user
+        (user records, template table, templates) for the whole batch; pyzk
+        0.9 has no batch equivalent. Does not refresh the device data, the
+        caller does that once after the last batch.
+        """
+        users = b""
+        table = b""
+        templates = b""
+        for user, fingers in batch:
+            for finger in fingers:
+                template = finger.repack_only()
+                table += pack("<bHbI", 2, user.uid, 0x10 + finger.fid, len(templates))
+                templates += template
+            users += user.repack29() if self.conn.user_packet_size == 28 else user.repack73()
+        
+        self.conn._send_with_buffer(pack("III", len(users), len(table), len(templates)) + users + table + templates)
+        # pyzk keeps its command sender private (name-mangled)
+        response = self.conn._ZK__send_command(CMD_SAVE_USERTEMPS, pack("<IHH", 12, 0, 8))
+        if not response.get("status"):
+            raise ZKErrorResponse("Can't save user templates")
+    
+    def _save_user(self, user: User, fingers: List[Finger]):
+        """Write one user (and templates, if any) to the device"""
+        if fingers:
+            self.conn.save_user_template(user, fingers)
+        else:
+            self.conn.set_user(uid=user.uid, name=user.name, privilege=user.privilege,
+                               password=user.password, group_id=user.group_id,
+                               user_id=user.user_id, card=user.card)
+    
     def delete_user(self, user_id: int):
         """Delete user from device"""
         if not self.conn:
@@ -271,6 +867,7 @@ class FingerprintService:
             self.conn.disable_device()
             self.conn.delete_user(uid=user_id)
             self.conn.enable_device()
+            self.user_directory.remove(uid=user_id)
             logger.info(f"User {user_id} deleted from device")
         except Exception as e:
             if self.conn:
@@ -278,10 +875,70 @@ class FingerprintService:
             logger.error(f"Error deleting user: {e}")
             raise
     
+    async def delete_users(self, user_ids: List[int], run: Optional[Callable] = None) -> Dict:
+        """
+        Delete many users inside a single disable/enable window
+        
+        Args:
+            user_ids: Device uids to delete
+            run: Runs the device work (default self.run, see enroll_user)
+        
+        Returns:
+            Dict with per-user results, totals and duration
+        """
+        if not self.conn:
+            raise Exception("Not connected to device")
+        
+        start_time = time.time()
+        logger.info(f"Starting batch delete of {len(user_ids)} users")
+        
+        results = await (run or self.run)(self._delete_users_worker, user_ids, priority=PRIORITY_ADMIN)
+        
+        deleted = sum(1 for result in results if result["success"])
+        duration_ms = round((time.time() - start_time) * 1000, 1)
+        logger.info(f"Batch delete finished: {deleted}/{len(user_ids)} deleted in {duration_ms} ms")
+        
+        return {
+            "success": deleted == len(user_ids),
+            "total": len(user_ids),
+            "deleted": deleted,
+            "failed": len(user_ids) - deleted,
+            "duration_ms": duration_ms,
+            "results": results
+        }
+    
+    def _delete_users_worker(self, user_ids: List[int]) -> List[Dict]:
+        """Delete users from the device inside a single disable/enable window"""
+        results = []
+        
+        self.conn.disable_device()
+        try:
+            # pyzk's delete_user succeeds for unknown uids, so check against the device's own list
+            device_users = self.conn.get_users()
+            self.user_directory.reconcile(device_users)
+            known = {user.uid for user in device_users}
+            for user_id in user_ids:
+                try:
+                    if int(user_id) not in known:
+                        results.append({"user_id": user_id, "success": False, "error": "not found"})
+                        continue
+                    self.conn.delete_user(uid=int(user_id))
+                    known.discard(int(user_id))
+                    self.user_directory.remove(uid=int(user_id))
+                    results.append({"user_id": user_id, "success": True})
+                except Exception as e:
+                    logger.error(f"Error deleting user {user_id}: {e}")
+                    results.append({"user_id": user_id, "success": False, "error": str(e)})
+        finally:
+            self.conn.enable_device()
+        
+        return results
+    
     async def start_live_capture(self):
         """
         Start live capture mode to detect finger scans in real-time
-        This runs in the background and emits events when fingers are scanned
+        Capture runs on the device actor thread whenever no command is queued
+        and emits events when fingers are scanned
         """
         if not self.conn:
             logger.error("Cannot start live capture: not connected")
@@ -291,74 +948,159 @@ class FingerprintService:
             logger.warning("Live capture already running")
             return
         
+        # Save event loop reference for the actor thread
+        self.event_loop = asyncio.get_event_loop()
+        await self.run(self._begin_capture, priority=PRIORITY_DOOR)
+    
+    def _begin_capture(self):
+        """Turn live capture on (the actor starts polling once its queue is empty)"""
         self.is_capturing = True
+        self._backfill_pending = True
         logger.info("Starting live capture mode...")
+    
+    def _live_records(self):
+        """
+        pyzk live_capture() generator, made cheap to re-enter
+        live_capture() starts by downloading the whole user table only to map
+        user_id -> uid; that mapping is served from the user directory instead,
+        since capture is re-entered after every queued command.
+        """
+        if self.user_directory.is_loaded:
+            users = self.user_directory.users()
+            self.conn.get_users = lambda: users
+        try:
+            records = self.conn.live_capture(new_timeout=self.capture_poll_interval)
+            first = next(records)  # runs live_capture's setup
+        finally:
+            self.conn.__dict__.pop("get_users", None)
         
-        # Save event loop reference for thread worker
-        self.event_loop = asyncio.get_event_loop()
-        
-        # Run the blocking live_capture in a thread executor
-        await self.event_loop.run_in_executor(None, self._live_capture_worker)
+        yield first
+        yield from records
     
-    def _live_capture_worker(self):
-        """Worker function that runs in a thread to handle blocking live_capture"""
+    def _capture_step(self) -> bool:
+        """
+        Actor idle work: wait up to capture_poll_interval for one scan
+        
+        Returns:
+            False when capture is off (the actor then blocks on its queue)
+        """
+        if not self.is_capturing or not self.conn:
+            self._suspend_capture()
+            return False
+        
         try:
-            logger.info("Live capture worker started")
+            if self._capture_records is None:
+                if self._backfill_pending:
+                    self._resume_backfill()
+                logger.info("Live capture worker started")
+                self._capture_records = self._live_records()
             
-            # This is a blocking generator that yields attendance records
-            for attendance in self.conn.live_capture():
-                if not self.is_capturing:
-                    break
-                
-                if attendance:
-                    logger.info(f"Finger detected: user_id={attendance.user_id}, time={attendance.timestamp}")
-                    
-                    # Emit event to WebSocket clients
-                    if self.ws_manager:
-                        # Create event data
-                        event_data = {
-                            "type": "finger_scanned",
-                            "user_id": attendance.user_id,
-                            "timestamp": attendance.timestamp.isoformat(),
-                            "punch_type": attendance.punch,
-                            "punch_name": self.get_punch_name(attendance.punch)
-                        }
-                        
-                        # Schedule emit_event in the main event loop
-                        asyncio.run_coroutine_threadsafe(
-                            self.emit_event(event_data),
-                            self.event_loop
-                        )
-                    
-                    # Small delay to prevent overwhelming the system
-                    import time
-                    time.sleep(0.1)
+            attendance = next(self._capture_records)
+            if attendance:
+                self._handle_attendance(attendance)
+            return True
         
-        except ZKNetworkError as e:
+        except StopIteration:
+            self._capture_records = None
+            return True
+        
+        except (ZKNetworkError, OSError) as e:
             logger.error(f"Network error during live capture: {e}")
-            if self.ws_manager and self.event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.emit_event({
-                        "type": "device_disconnected",
-                        "error": str(e)
-                    }),
-                    self.event_loop
-                )
+            self._capture_failed()
+            self._emit_threadsafe({
+                "type": "device_disconnected",
+                "error": str(e)
+            })
+            self._connection_lost(str(e))
         
         except Exception as e:
             logger.error(f"Error in live capture: {e}")
-            if self.ws_manager and self.event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.emit_event({
-                        "type": "capture_error",
-                        "error": str(e)
-                    }),
-                    self.event_loop
-                )
+            self._capture_failed()
+            self._emit_threadsafe({
+                "type": "capture_error",
+                "error": str(e)
+            })
+            # The session state is unknown after a protocol error; start a new one
+            self._connection_lost(str(e))
         
-        finally:
-            self.is_capturing = False
-            logger.info("Live capture stopped")
+        return False
+    
+    def _resume_backfill(self):
+        """Catch up on punches made while capture was interrupted"""
+        try:
+            self.backfill_gaps()
+        except (ZKNetworkError, OSError):
+            raise
+        except Exception as e:
+            self._backfill_pending = False
+            self.backfill.last_error = str(e)
+            logger.error(f"Error backfilling attendance: {e}")
+    
+    def _capture_failed(self):
+        """Drop the capture generator after an error"""
+        self._capture_records = None
+        self.is_capturing = False
+        logger.info("Live capture stopped")
+    
+    def _connection_lost(self, error: str):
+        """Hand a failed capture session to the supervisor (from the actor thread)"""
+        if self.supervisor and self.event_loop:
+            self.drop_connection()
+            self.event_loop.call_soon_threadsafe(self.supervisor.notify_lost, error, True)
+    
+    def _suspend_capture(self):
+        """
+        End the live_capture generator cleanly before a queued command
+        Setting end_live_capture and resuming lets pyzk hand over any records
+        it already received and unregister from events, without another recv.
+        """
+        if self._capture_records is None:
+            return
+        
+        records, self._capture_records = self._capture_records, None
+        self._backfill_pending = True
+        self.conn.end_live_capture = True
+        try:
+            for attendance in records:
+                if attendance:
+                    self._handle_attendance(attendance)
+        except Exception as e:
+            logger.warning(f"Error while suspending live capture: {e}")
+    
+    def _handle_attendance(self, attendance: Attendance):
+        """Turn a live-captured punch into a finger_scanned event"""
+        logger.info(f"Finger detected: user_id={attendance.user_id}, time={attendance.timestamp}")
+        
+        # Every punch lands in the device log, keep the snapshot count current
+        if "attendance_count" in self.device_counts:
+            self.device_counts["attendance_count"] += 1
+        self.backfill.note_live(attendance.user_id, attendance.timestamp)
+        
+        # Double taps are still logged by the device, just not forwarded
+        if not self.scan_debouncer.accept(attendance.user_id):
+            logger.info(f"Suppressed repeat scan from user_id={attendance.user_id}")
+            return
+        
+        # Emit event to WebSocket clients
+        self._emit_threadsafe(self._scan_event(attendance))
+    
+    def _scan_event(self, attendance: Attendance, backfilled: bool = False) -> Dict:
+        """
+        Event for a punch (punched_at is the device clock)
+        Live punches are finger_scanned; punches recovered from the device log
+        are attendance_backfilled, which the door path never acts on.
+        """
+        event = {
+            "type": "attendance_backfilled" if backfilled else "finger_scanned",
+            "user_id": attendance.user_id,
+            "timestamp": attendance.timestamp.isoformat(),
+            "punched_at": attendance.timestamp.isoformat(),
+            "punch_type": attendance.punch,
+            "punch_name": self.get_punch_name(attendance.punch)
+        }
+        if backfilled:
+            event["backfilled"] = True
+        return event
     
     def stop_live_capture(self):
         """Stop live capture mode"""
@@ -374,8 +1116,14 @@ class FingerprintService:
         """Stop attendance capture (alias for stop_live_capture)"""
         logger.info("Stopping attendance capture...")
         self.stop_live_capture()
-        # Give it a moment to stop
-        await asyncio.sleep(0.5)
+    
+    def get_queue_stats(self) -> Dict:
+        """Device command queue depth and wait times"""
+        return self.actor.get_stats()
+    
+    def get_connection_stats(self) -> Optional[Dict]:
+        """Reconnect counts and time-to-recover (None without a supervisor)"""
+        return self.supervisor.get_stats() if self.supervisor else None
     
     @staticmethod
     def get_punch_name(punch_code: int) -> str:
@@ -390,11 +1138,32 @@ class FingerprintService:
         }
         return punch_types.get(punch_code, "unknown")
     
+    @staticmethod
+    def user_to_dict(user: User) -> Dict:
+        """Convert a device user to a JSON-serializable dict"""
+        return {
+            "uid": user.uid,
+            "user_id": user.user_id,
+            "name": user.name,
+            "privilege": user.privilege
+        }
+    
+    @staticmethod
+    def attendance_to_dict(record: Attendance) -> Dict:
+        """Convert an attendance record to a JSON-serializable dict"""
+        return {
+            "uid": record.uid,
+            "user_id": record.user_id,
+            "timestamp": record.timestamp.isoformat(),
+            "punch_type": record.punch
+        }
+    
     async def emit_event(self, event: Dict):
         """Emit event to all connected WebSocket clients"""
         if self.ws_manager:
             await self.ws_manager.broadcast({
                 **event,
+                "device_id": self.device_id,
                 "timestamp": datetime.now().isoformat()
             })
         else:
@@ -0,0 +1,256 @@
+"""
+Hardware API - Async facade over the fingerprint readers and the door lock
+Endpoints await these methods instead of calling services directly, so the
+event loop never blocks on hardware:
+
+- Fingerprint calls are queued to the reader's device actor (one thread per
+  reader, see device_actor.py) with a per-priority timeout, and rejected
+  up front when the actor queue is already full.
+- Door lock serial I/O runs on the single-thread "serial" executor (the
+  port has one owner, see executors.py) with a timeout.
+
+A timed-out call that is still queued is cancelled; one that is already
+running on the device cannot be interrupted and finishes in the background.
+"""
+
+from device_actor import PRIORITY_DOOR, PRIORITY_ENROLL, PRIORITY_ADMIN, PRIORITY_READ, PRIORITY_NAMES
+import executors
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a device call may take, per actor priority
+DEFAULT_TIMEOUTS = {
+    PRIORITY_DOOR: 15,
+    PRIORITY_ENROLL: 90,   # waits for three finger presses
+    PRIORITY_ADMIN: 120,
+    PRIORITY_READ: 60
+}
+
+
+class HardwareError(Exception):
+    """Base class for facade errors (the device call itself did not fail)"""
+
+
+class HardwareTimeout(HardwareError):
+    """A hardware call did not finish within its timeout"""
+
+
+class HardwareBusy(HardwareError):
+    """Too many commands are already queued for the device"""
+
+
+class FingerprintAPI:
+    def __init__(self, service, timeouts: Optional[Dict[str, float]] = None, max_pending: int = 64):
+        """
+        Initialize fingerprint facade
+
+        Args:
+            service: FingerprintService of one reader
+            timeouts: Overrides of DEFAULT_TIMEOUTS keyed by priority name
+                      ("door", "enroll", "admin", "read")
+            max_pending: Commands allowed in the actor queue before new ones
+                         are rejected with HardwareBusy
+        """
+        self.service = service
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        for priority, name in PRIORITY_NAMES.items():
+            if timeouts and name in timeouts:
+                self.timeouts[priority] = timeouts[name]
+        self.max_pending = max_pending
+
+        self.calls = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.last_timeout: Optional[Dict] = None
+
+    async def call(self, fn: Callable, *args, priority: int = PRIORITY_READ,
+                   timeout: Optional[float] = None, **kwargs):
+        """
+        Run a blocking service method on the reader's actor and await it
+
+        Raises:
+            HardwareBusy: If the actor queue is full
+            HardwareTimeout: If the call did not finish in time
+        """
+        timeout = self._admit(priority, timeout)
+        try:
+            return await asyncio.wait_for(self.service.run(fn, *args, priority=priority, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(fn, timeout)
+
+    def call_blocking(self, fn: Callable, *args, priority: int = PRIORITY_READ,
+                      timeout: Optional[float] = None, **kwargs):
+        """
+        call() for worker threads (e.g. the generator of a streaming response)
+
+        Raises:
+            HardwareBusy: If the actor queue is full
+            HardwareTimeout: If the call did not finish in time
+        """
+        timeout = self._admit(priority, timeout)
+        future = self.service.actor.submit(fn, *args, priority=priority, **kwargs)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise self._timed_out(fn, timeout)
+
+    def _admit(self, priority: int, timeout: Optional[float]) -> float:
+        """Reject the call if the actor queue is full; returns its timeout"""
+        if self.service.actor.queue_depth() >= self.max_pending:
+            self.rejected += 1
+            raise HardwareBusy(f"Reader '{self.service.device_id}' has {self.max_pending} commands queued")
+        self.calls += 1
+        return timeout if timeout is not None else self.timeouts[priority]
+
+    def _timed_out(self, fn: Callable, timeout: float) -> HardwareTimeout:
+        name = getattr(fn, "__name__", repr(fn))
+        self.timed_out += 1
+        self.last_timeout = {"call": name, "timeout": timeout, "at": datetime.now().isoformat()}
+        logger.warning(f"Reader '{self.service.device_id}' call {name} timed out after {timeout}s")
+        return HardwareTimeout(f"{name} timed out after {timeout}s")
+
+    # ---------- connection ----------
+
+    # A connect loads the whole user directory, too slow for the door timeout
+    async def connect(self) -> bool:
+        return await self.call(self.service.connect, priority=PRIORITY_ADMIN)
+
+    async def disconnect(self):
+        return await self.call(self.service.disconnect, priority=PRIORITY_ADMIN)
+
+    async def reconnect(self):
+        return await self.call(self.service.reconnect, priority=PRIORITY_ADMIN)
+
+    async def get_device_info(self) -> Dict:
+        return await self.call(self.service.get_device_info)
+
+    async def refresh_snapshot(self) -> Dict:
+        return await self.call(self.service.refresh_snapshot)
+
+    # ---------- users ----------
+
+    async def get_users(self) -> List:
+        return await self.call(self.service.get_users)
+
+    async def delete_user(self, user_id: int):
+        return await self.call(self.service.delete_user, user_id, priority=PRIORITY_ADMIN)
+
+    # These service methods emit their own events around the device work,
+    # which they run through call()
+
+    async def delete_users(self, user_ids: List[int]) -> Dict:
+        return await self.service.delete_users(user_ids, run=self.call)
+
+    async def sync_users(self, entries: List[Dict]) -> Dict:
+        return await self.service.sync_users(entries, run=self.call)
+
+    async def enroll_user(self, user_id: int, finger_id: int = 0) -> Dict:
+        return await self.service.enroll_user(user_id, finger_id, run=self.call)
+
+    # ---------- attendance ----------
+
+    async def get_attendance(self) -> List:
+        return await self.call(self.service.get_attendance)
+
+    async def get_attendance_since(self, since: Optional[Tuple[datetime, int]] = None,
+                                   known_record_count: Optional[int] = None) -> Dict:
+        return await self.call(self.service.get_attendance_since, since, known_record_count)
+
+    async def clear_attendance(self):
+        return await self.call(self.service.clear_attendance, priority=PRIORITY_ADMIN)
+
+    async def archive_and_clear_attendance(self) -> Dict:
+        return await self.call(self.service.archive_and_clear_attendance, priority=PRIORITY_ADMIN)
+
+    async def backfill_gaps(self) -> Optional[Dict]:
+        return await self.call(self.service.backfill_gaps)
+
+    def get_stats(self) -> Dict:
+        """Call, timeout and rejection counts"""
+        return {
+            "calls": self.calls,
+            "timed_out": self.timed_out,
+            "rejected": self.rejected,
+            "max_pending": self.max_pending,
+            "timeouts": {PRIORITY_NAMES[priority]: timeout for priority, timeout in self.timeouts.items()},
+            "last_timeout": self.last_timeout
+        }
+
+
+class DoorLockAPI:
+    def __init__(self, service, timeout: float = 5.0):
+        """
+        Initialize door lock facade
+
+        Args:
+            service: DoorLockService
+            timeout: Seconds a serial call may take
+        """
+        self.service = service
+        self.timeout = timeout
+        self._close_task: Optional[asyncio.Task] = None
+
+        self.calls = 0
+        self.timed_out = 0
+
+    async def _call(self, fn: Callable, *args, timeout: Optional[float] = None):
+        timeout = timeout if timeout is not None else self.timeout
+        self.calls += 1
+        try:
+            return await asyncio.wait_for(executors.run_in("serial", fn, *args), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            name = getattr(fn, "__name__", repr(fn))
+            logger.warning(f"Door lock call {name} timed out after {timeout}s")
+            raise HardwareTimeout(f"{name} timed out after {timeout}s")
+
+    async def connect(self) -> bool:
+        # Opening the port waits for the Arduino to reset
+        return await self._call(self.service.connect, timeout=self.timeout + 5)
+
+    async def disconnect(self):
+        if self._close_task:
+            self._close_task.cancel()
+        await self._call(self.service.disconnect)
+
+    def is_connected(self) -> bool:
+        return self.service.is_connected()
+
+    async def open_door(self, duration: int = 5) -> Dict:
+        """
+        Open the door and close it again after duration seconds
+        A new open restarts the countdown instead of closing early.
+        """
+        result = await self._call(self.service.open_door, duration)
+        if self._close_task:
+            self._close_task.cancel()
+        self._close_task = asyncio.create_task(self._auto_close(duration))
+        return result
+
+    async def _auto_close(self, duration: int):
+        """Auto-close door after specified duration"""
+        await asyncio.sleep(duration)
+        if self.service.is_door_open:
+            try:
+                await self._call(self.service.close_door)
+            except Exception as e:
+                logger.error(f"Error auto-closing door: {e}")
+
+    async def close_door(self) -> Dict:
+        if self._close_task:
+            self._close_task.cancel()
+            self._close_task = None
+        return await self._call(self.service.close_door)
+
+    def get_status(self) -> Dict:
+        return {
+            **self.service.get_status(),
+            "calls": self.calls,
+            "timed_out": self.timed_out
+        }
@@ -3,8 +3,9 @@ BBK Gym Hardware Bridge - Python Service
 FastAPI-based service for hardware communication
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Body, UploadFile, File, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import asyncio
 import logging
@@ -12,15 +13,27 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import json
 import sys
+import time
 from pathlib import Path
 
 from fingerprint_service import FingerprintService
 from doorlock_service import DoorLockService
 from websocket_manager import WebSocketManager
+from pubsub_hub import PubSubHub, Channel, RoomChannel, ALL_TOPICS
+from device_registry import DeviceRegistry
+from event_journal import EventJournal
+from hardware_api import FingerprintAPI, DoorLockAPI, HardwareBusy, HardwareTimeout
+from attendance_sync import encode_cursor, decode_cursor, record_key
+from attendance_archive import AttendanceArchiveError
+from streaming import NDJSON_MEDIA_TYPE, ndjson_stream, json_records_stream, gzip_stream
+import template_archive
+import executors
+import event_codec
 
 # Create logs directory if it doesn't exist
 import os
 os.makedirs('logs', exist_ok=True)
+os.makedirs('data', exist_ok=True)
 
 # Configure logging
 logging.basicConfig(
@@ -34,13 +47,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Global services
-fingerprint_service: Optional[FingerprintService] = None
 doorlock_service: Optional[DoorLockService] = None
-ws_manager: WebSocketManager = WebSocketManager()
+door_api: Optional[DoorLockAPI] = None
 
-# WebSocket connection tracking
-mirror_connections = set()
-attendance_connections = set()
+# WebSocket channels: /ws/events, /ws/attendance (scans only) and /ws/mirror
+hub = PubSubHub()
+ws_manager: WebSocketManager = hub.add(WebSocketManager())
+attendance_channel: Channel = hub.add(Channel("attendance"))
+mirror_channel: RoomChannel = hub.add(RoomChannel("mirror"))
+hub.forward("events", "attendance", event_types=["finger_scanned"])
+
+device_registry: DeviceRegistry = DeviceRegistry(ws_manager=ws_manager)
 
 
 # Load configuration
@@ -68,7 +85,7 @@ def load_config():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifecycle manager"""
-    global fingerprint_service, doorlock_service
+    global doorlock_service, door_api
     
     # Startup
     logger.info("Starting Python Hardware Bridge...")
@@ -76,47 +93,60 @@ async def lifespan(app: FastAPI):
     # Load config
     config = load_config()
     
+    # Thread pools for blocking work (serial I/O, file reads)
+    executors.configure(((config or {}).get("python_bridge") or {}).get("executors"))
+    
+    # Send queues and heartbeats of every WebSocket channel
+    hub.configure(((config or {}).get("python_bridge") or {}).get("websocket"))
+    heartbeat_task = asyncio.create_task(hub.run_heartbeats())
+    logger.info(f"Event encoding: {event_codec.BACKEND}")
+    
+    # Journal every hardware event before it is broadcast
+    journal_config = ((config or {}).get("python_bridge") or {}).get("event_journal", {})
+    if journal_config.get("enabled", True):
+        ws_manager.journal = EventJournal(
+            directory=journal_config.get("directory", "data/journal"),
+            segment_max_bytes=journal_config.get("segment_max_bytes", 8 * 1024 * 1024),
+            max_segments=journal_config.get("max_segments", 16),
+            commit_interval=journal_config.get("commit_interval_ms", 5) / 1000
+        )
+        ws_manager.configure_replay(
+            ring_size=journal_config.get("ring_size", 1000),
+            batch_size=journal_config.get("replay_batch_size", 500)
+        )
+    
     try:
         # Initialize door lock service (optional)
         try:
             doorlock_port = "COM7"  # default
             doorlock_baudrate = 9600  # default
+            doorlock_timeout = 5.0  # default
             if config and "hardware" in config and "doorlock" in config["hardware"]:
                 doorlock_port = config["hardware"]["doorlock"].get("port", "COM7")
                 doorlock_baudrate = config["hardware"]["doorlock"].get("baudrate", 9600)
+                doorlock_timeout = config["hardware"]["doorlock"].get("command_timeout", 5.0)
             
             logger.info(f"Initializing door lock on {doorlock_port} @ {doorlock_baudrate} baud")
             doorlock_service = DoorLockService(port=doorlock_port, baudrate=doorlock_baudrate)
-            if doorlock_service.connect():
+            door_api = DoorLockAPI(doorlock_service, timeout=doorlock_timeout)
+            if await door_api.connect():
                 logger.info("[OK] Door lock service initialized")
             else:
                 logger.warning("[WARN] Door lock not available - continuing without it")
                 doorlock_service = None
+                door_api = None
         except Exception as e:
             logger.warning(f"[WARN] Door lock not available: {e}")
             doorlock_service = None
+            door_api = None
         
-        # Initialize fingerprint service (optional)
+        # Initialize fingerprint readers (optional) - all readers connect in parallel
         try:
-            fingerprint_ip = "192.168.1.201"  # default
-            fingerprint_port = 4370  # default
-            if config and "hardware" in config and "fingerprint" in config["hardware"]:
-                fingerprint_ip = config["hardware"]["fingerprint"].get("ip", "192.168.1.201")
-                fingerprint_port = config["hardware"]["fingerprint"].get("port", 4370)
-            
-            logger.info(f"Initializing fingerprint device at {fingerprint_ip}:{fingerprint_port}")
-            fingerprint_service = FingerprintService(ip=fingerprint_ip, port=fingerprint_port, ws_manager=ws_manager)
-            if fingerprint_service.connect():
-                logger.info("[OK] Fingerprint service initialized")
-                # Start live capture automatically
-                asyncio.create_task(fingerprint_service.start_live_capture())
-                logger.info("[OK] Live capture started automatically")
-            else:
-                logger.warning("[WARN] Fingerprint device not connected")
-                fingerprint_service = None
+            await device_registry.start(DeviceRegistry.reader_configs(config))
+            if not device_registry.services:
+                logger.warning("[WARN] No fingerprint device connected")
         except Exception as e:
             logger.warning(f"[WARN] Fingerprint service not available: {e}")
-            fingerprint_service = None
         
         logger.info("[STARTED] Python Bridge started (hardware optional mode)")
         
@@ -129,10 +159,13 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down services...")
-        if fingerprint_service:
-            fingerprint_service.disconnect()
-        if doorlock_service:
-            doorlock_service.disconnect()
+        heartbeat_task.cancel()
+        await device_registry.stop()
+        if door_api:
+            await door_api.disconnect()
+        if ws_manager.journal:
+            ws_manager.journal.close()
+        executors.shutdown()
         logger.info("Services stopped")
 
 
@@ -163,8 +196,20 @@ async def options_handler(full_path: str):
 # ==================== Health Check ====================
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+async def health_check(refresh: bool = False):
+    """
+    Health check endpoint
+    Device info comes from the background-refreshed snapshot;
+    refresh=true rebuilds it before answering
+    """
+    if refresh:
+        await asyncio.gather(*[
+            api.refresh_snapshot()
+            for api in device_registry.apis.values()
+            if api.service.is_connected()
+        ], return_exceptions=True)
+    
+    fingerprint_service = device_registry.get()
     return {
         "status": "healthy",
         "version": "1.0.0",
@@ -172,7 +217,11 @@ async def health_check():
         "services": {
             "fingerprint": {
                 "connected": fingerprint_service.is_connected() if fingerprint_service else False,
-                "device_info": fingerprint_service.get_device_info() if fingerprint_service else None
+                "device_info": fingerprint_service.get_snapshot() if fingerprint_service else None,
+                "devices": {
+                    device_id: service.get_snapshot()
+                    for device_id, service in device_registry.services.items()
+                }
             },
             "doorlock": {
                 "connected": doorlock_service.is_connected() if doorlock_service else False,
@@ -182,18 +231,69 @@ async def health_check():
     }
 
 
+@app.get("/executors")
+async def get_executors():
+    """Get utilization and queue wait of the thread pools and the device actor threads"""
+    return {
+        "success": True,
+        "executors": executors.get_stats(),
+        "device_actors": {
+            device_id: service.get_queue_stats()
+            for device_id, service in device_registry.services.items()
+        }
+    }
+
+
+@app.get("/events/journal")
+async def get_event_journal():
+    """Get event journal sequence numbers and group-commit stats"""
+    if not ws_manager.journal:
+        raise HTTPException(status_code=503, detail="Event journal disabled")
+    return {"success": True, **ws_manager.journal.get_stats(), "replay": ws_manager.get_replay_stats()}
+
+
+@app.get("/events/clients")
+async def get_event_clients():
+    """Get send queue depth and dropped messages of the /ws/events clients"""
+    return {"success": True, **ws_manager.get_client_stats()}
+
+
+@app.get("/pubsub")
+async def get_pubsub():
+    """Get hub settings and per-channel fan-out metrics (events, attendance, mirror)"""
+    return {"success": True, **hub.get_stats()}
+
+
 # ==================== WebSocket Endpoint ====================
 
 @app.websocket("/ws/events")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, resume_from: Optional[int] = None,
+                             topics: Optional[str] = None, device_id: Optional[str] = None,
+                             user_id: Optional[str] = None):
     """
     WebSocket endpoint for real-time hardware events
     Electron connects here to receive finger scans, device status, etc.
+    resume_from: Last event seq the client saw; missed events are replayed
+    before live events resume
+    topics: Comma-separated topics to receive (e.g. "scans"); every event
+    if omitted. device_id / user_id narrow them to one reader or user.
+    Subscriptions can be changed later with the subscribe action.
     """
-    await ws_manager.connect(websocket)
+    await ws_manager.connect(websocket, resuming=resume_from is not None)
     logger.info(f"WebSocket client connected: {websocket.client}")
     
     try:
+        if topics:
+            try:
+                ws_manager.subscribe(websocket, topics.split(","), device_id, user_id)
+            except ValueError as e:
+                ws_manager.disconnect(websocket)
+                await websocket.close(code=1008, reason=str(e)[:120])
+                return
+        
+        if resume_from is not None:
+            await ws_manager.replay(websocket, resume_from)
+        
         while True:
             # Keep connection alive and listen for commands from Electron
             data = await websocket.receive_text()
@@ -220,82 +320,128 @@ async def handle_electron_command(message: Dict, websocket: WebSocket):
         if command == "enroll_fingerprint":
             result = await enroll_fingerprint_command(payload)
         elif command == "get_users":
-            result = await get_users_command()
+            result = await get_users_command(payload)
         elif command == "delete_user":
             result = await delete_user_command(payload)
+        elif command == "delete_users":
+            result = await delete_users_command(payload)
         elif command == "sync_user":
             result = await sync_user_command(payload)
         elif command == "reconnect_device":
-            result = await reconnect_device_command()
+            result = await reconnect_device_command(payload)
         elif command == "open_door":
             result = await open_door_command(payload)
+        elif command == "subscribe":
+            result = ws_manager.subscribe(websocket, payload.get("topics"),
+                                          payload.get("device_id"), payload.get("user_id"))
+        elif command == "unsubscribe":
+            result = ws_manager.unsubscribe(websocket, payload.get("topics"))
         else:
             result = {"success": False, "error": "Unknown command"}
         
-        # Send response back to Electron
-        await websocket.send_json({
-            "type": "response",
-            "request_id": request_id,
-            "data": result
-        })
-        
     except Exception as e:
-        await websocket.send_json({
-            "type": "response",
-            "request_id": request_id,
-            "data": {"success": False, "error": str(e)}
-        })
+        result = {"success": False, "error": str(e)}
+    
+    # Send response back to Electron (under the client's send lock, see Channel.send_to)
+    await ws_manager.send_to(websocket, {
+        "type": "response",
+        "request_id": request_id,
+        "data": result
+    })
 
 
 # ==================== Fingerprint Endpoints ====================
+# Routes live on a router that is mounted twice: as /fingerprint/... (the
+# default reader, or ?device_id=) and as /devices/{device_id}/fingerprint/...
+
+fingerprint_router = APIRouter()
+
+
+def get_fingerprint_service(device_id: Optional[str] = None, required: bool = True) -> Optional[FingerprintService]:
+    """
+    Resolve the reader a request is for
+    Raises 404 for an unknown device_id and 503 when no reader is available
+    (unless required=False, which returns None instead)
+    """
+    if device_id is not None and device_id not in device_registry.configs:
+        raise HTTPException(status_code=404, detail=f"Unknown fingerprint device '{device_id}'")
+    
+    service = device_registry.get(device_id)
+    if not service and required:
+        raise HTTPException(status_code=503, detail="Fingerprint service not available")
+    return service
+
+
+def get_fingerprint_api(device_id: Optional[str] = None) -> FingerprintAPI:
+    """Resolve the async facade of the reader a request is for (see get_fingerprint_service)"""
+    return device_registry.apis[get_fingerprint_service(device_id).device_id]
+
 
-@app.post("/fingerprint/connect")
-async def connect_fingerprint(ip: str = "192.168.1.201", port: int = 4370):
+def http_error(e: Exception) -> HTTPException:
+    """Map a hardware call failure to an HTTP error"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, HardwareTimeout):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, HardwareBusy):
+        return HTTPException(status_code=503, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/devices")
+async def list_devices():
+    """List configured fingerprint readers"""
+    return {"success": True, "devices": device_registry.list_devices()}
+
+
+@fingerprint_router.post("/fingerprint/connect")
+async def connect_fingerprint(ip: str = "192.168.1.201", port: int = 4370, device_id: Optional[str] = None):
     """Connect to fingerprint device"""
+    api = get_fingerprint_api(device_id)
     try:
-        fingerprint_service.ip = ip
-        fingerprint_service.port = port
-        fingerprint_service.connect()
+        api.service.ip = ip
+        api.service.port = port
+        await api.connect()
         return {
             "success": True,
             "message": "Connected to fingerprint device",
-            "device_info": fingerprint_service.get_device_info()
+            "device_info": await api.get_device_info()
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
-@app.post("/fingerprint/disconnect")
-async def disconnect_fingerprint():
+@fingerprint_router.post("/fingerprint/disconnect")
+async def disconnect_fingerprint(device_id: Optional[str] = None):
     """Disconnect from fingerprint device"""
+    api = get_fingerprint_api(device_id)
     try:
-        fingerprint_service.disconnect()
+        await api.disconnect()
         return {"success": True, "message": "Disconnected from fingerprint device"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
-@app.post("/fingerprint/enroll")
-async def enroll_fingerprint(user_id: int, finger_id: int = 1):
+@fingerprint_router.post("/fingerprint/enroll")
+async def enroll_fingerprint(user_id: int, finger_id: int = 1, device_id: Optional[str] = None):
     """
     Enroll a new fingerprint
     user_id: Unique member ID
     finger_id: Finger slot (1-10)
     """
+    api = get_fingerprint_api(device_id)
     try:
-        result = await fingerprint_service.enroll_user(user_id, finger_id)
+        result = await api.enroll_user(user_id, finger_id)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
-@app.post("/fingerprint/capture/start")
-async def start_fingerprint_capture():
+@fingerprint_router.post("/fingerprint/capture/start")
+async def start_fingerprint_capture(device_id: Optional[str] = None):
     """Start live capture mode for real-time attendance"""
+    fingerprint_service = get_fingerprint_service(device_id)
     try:
-        if not fingerprint_service:
-            raise HTTPException(status_code=503, detail="Fingerprint service not available")
-        
         if fingerprint_service.is_capturing:
             return {"success": True, "message": "Live capture already running"}
         
@@ -310,13 +456,11 @@ async def start_fingerprint_capture():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/fingerprint/capture/stop")
-async def stop_fingerprint_capture():
+@fingerprint_router.post("/fingerprint/capture/stop")
+async def stop_fingerprint_capture(device_id: Optional[str] = None):
     """Stop live capture mode"""
+    fingerprint_service = get_fingerprint_service(device_id)
     try:
-        if not fingerprint_service:
-            raise HTTPException(status_code=503, detail="Fingerprint service not available")
-        
         fingerprint_service.stop_live_capture()
         
         return {
@@ -327,9 +471,10 @@ async def stop_fingerprint_capture():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/fingerprint/capture/status")
-async def get_capture_status():
+@fingerprint_router.get("/fingerprint/capture/status")
+async def get_capture_status(device_id: Optional[str] = None):
     """Get live capture status"""
+    fingerprint_service = get_fingerprint_service(device_id, required=False)
     try:
         if not fingerprint_service:
             return {
@@ -341,73 +486,443 @@ async def get_capture_status():
         return {
             "success": True,
             "is_capturing": fingerprint_service.is_capturing,
-            "is_connected": fingerprint_service.is_connected()
+            "is_connected": fingerprint_service.is_connected(),
+            "scan_pipeline": fingerprint_service.scan_debouncer.get_stats(),
+            "backfill": fingerprint_service.backfill.get_stats()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/fingerprint/users")
-async def get_users():
-    """Get all users from fingerprint device"""
+@fingerprint_router.post("/fingerprint/capture/backfill")
+async def backfill_capture_gaps(device_id: Optional[str] = None):
+    """Emit punches from the device log that live capture missed (as attendance_backfilled)"""
+    api = get_fingerprint_api(device_id)
     try:
-        users = fingerprint_service.get_users()
+        stats = await api.backfill_gaps()
+        return {"success": True, "backfill": stats}
+    except Exception as e:
+        raise http_error(e)
+
+
+@fingerprint_router.get("/fingerprint/queue")
+async def get_device_queue(device_id: Optional[str] = None):
+    """Get the device command queue depth and wait times"""
+    api = get_fingerprint_api(device_id)
+    return {"success": True, **api.service.get_queue_stats(), "api": api.get_stats()}
+
+
+@fingerprint_router.get("/fingerprint/connection")
+async def get_device_connection(device_id: Optional[str] = None):
+    """Get the connection supervisor state: reconnect counts and time-to-recover"""
+    fingerprint_service = get_fingerprint_service(device_id)
+    return {
+        "success": True,
+        "connected": fingerprint_service.is_connected(),
+        "supervisor": fingerprint_service.get_connection_stats()
+    }
+
+
+@fingerprint_router.get("/fingerprint/users")
+async def get_users(q: Optional[str] = None, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1),
+                    refresh: bool = False, device_id: Optional[str] = None):
+    """
+    Get users from the bridge-side user directory
+    q: Case-insensitive name prefix search
+    offset/limit: Pagination
+    refresh: Re-read the user table from the device first
+    """
+    api = get_fingerprint_api(device_id)
+    try:
+        if refresh or not api.service.user_directory.is_loaded:
+            await api.get_users()
+        
+        total, users = list_directory_users(api.service, q, offset, limit)
         return {
             "success": True,
             "count": len(users),
-            "users": [
-                {
-                    "uid": user.uid,
-                    "user_id": user.user_id,
-                    "name": user.name,
-                    "privilege": user.privilege
-                }
-                for user in users
-            ]
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "users": [FingerprintService.user_to_dict(user) for user in users]
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+
+@fingerprint_router.get("/fingerprint/user/{user_id}")
+async def get_user(user_id: str, by_uid: bool = False, device_id: Optional[str] = None):
+    """
+    Look up a single user in the user directory
+    by_uid: Treat the path value as the device uid instead of user_id
+    """
+    fingerprint_service = get_fingerprint_service(device_id)
+    
+    directory = fingerprint_service.user_directory
+    try:
+        user = directory.get_by_uid(int(user_id)) if by_uid else directory.get(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="uid must be an integer")
+    
+    if not user:
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    return {"success": True, "user": FingerprintService.user_to_dict(user)}
 
 
-@app.delete("/fingerprint/user/{user_id}")
-async def delete_user(user_id: int):
+def list_directory_users(fingerprint_service: FingerprintService, q: Optional[str] = None,
+                         offset: int = 0, limit: Optional[int] = None):
+    """
+    Page through (or prefix-search) a reader's user directory
+    
+    Raises:
+        ValueError: If offset is negative or limit is below 1
+    """
+    if offset < 0:
+        raise ValueError("offset must be 0 or more")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be 1 or more")
+    directory = fingerprint_service.user_directory
+    if q:
+        return directory.search(q, offset, limit)
+    return directory.page(offset, limit)
+
+
+@fingerprint_router.get("/fingerprint/users/stream")
+async def stream_users(gzip: bool = False, device_id: Optional[str] = None):
+    """
+    Stream all users from fingerprint device as newline-delimited JSON
+    gzip: Compress the stream (Content-Encoding: gzip)
+    """
+    api = get_fingerprint_api(device_id)
+    return ndjson_response(api, api.service.get_users, FingerprintService.user_to_dict, gzip)
+
+
+@fingerprint_router.post("/fingerprint/users/sync")
+async def sync_users(payload: Dict = Body(...), device_id: Optional[str] = None):
+    """
+    Bulk upload users and fingerprint templates in one device session
+    Body: {"users": [{"user_id": "42", "name": "...", "templates": [{"fid": 0, "template": "<hex>"}]}]}
+    Progress is reported as sync_progress events on /ws/events
+    """
+    api = get_fingerprint_api(device_id)
+    
+    entries = payload.get("users")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(status_code=400, detail="users must be a non-empty list")
+    
+    try:
+        return await api.sync_users(entries)
+    except Exception as e:
+        raise http_error(e)
+
+
+@fingerprint_router.delete("/fingerprint/user/{user_id}")
+async def delete_user(user_id: int, device_id: Optional[str] = None):
     """Delete user from fingerprint device"""
+    api = get_fingerprint_api(device_id)
     try:
-        result = fingerprint_service.delete_user(user_id)
+        await api.delete_user(user_id)
         return {"success": True, "message": f"User {user_id} deleted"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
-@app.get("/fingerprint/attendance")
-async def get_attendance():
-    """Get attendance records from device"""
+@fingerprint_router.post("/fingerprint/users/delete")
+async def delete_users(payload: Dict = Body(...), device_id: Optional[str] = None):
+    """
+    Delete many users in a single device lock window
+    Body: {"user_ids": [101, 102, ...]}
+    """
+    api = get_fingerprint_api(device_id)
+    
+    user_ids = payload.get("user_ids")
+    if not isinstance(user_ids, list) or not user_ids:
+        raise HTTPException(status_code=400, detail="user_ids must be a non-empty list")
+    
     try:
-        records = fingerprint_service.get_attendance()
+        return await api.delete_users(user_ids)
+    except Exception as e:
+        raise http_error(e)
+
+
+@fingerprint_router.get("/fingerprint/attendance")
+async def get_attendance(since: Optional[str] = None, device_id: Optional[str] = None):
+    """
+    Get attendance records from device
+    Without since, records archived from the device are streamed from disk
+    ahead of the device log (the totals follow the record list).
+    since: Incremental mode - only records after this cursor are returned.
+           Pass since=last to continue from the persisted cursor
+           (since=start syncs from the beginning of the log); only these
+           two move the persisted cursor, an explicit cursor is the
+           caller's own and leaves it alone
+    """
+    api = get_fingerprint_api(device_id)
+    fingerprint_service = api.service
+    if since is None:
+        try:
+            device_records = await api.get_attendance()
+        except Exception as e:
+            raise http_error(e)
+        
+        archive = fingerprint_service.attendance_archive
+        if not archive or not archive.entries:
+            return {
+                "success": True,
+                "count": len(device_records),
+                "records": [FingerprintService.attendance_to_dict(record) for record in device_records]
+            }
+        
+        # The archive grows with every clear; read it lazily (Starlette drives
+        # the synchronous generator from its threadpool)
+        def records():
+            yield from archive.records()
+            yield from archive.drop_archived(device_records)
+        
+        return StreamingResponse(json_records_stream(records(), FingerprintService.attendance_to_dict),
+                                 media_type="application/json")
+    
+    # Incremental mode
+    known_record_count = None
+    if since == "last":
+        cursor = fingerprint_service.attendance_cursor_store.cursor
+        known_record_count = fingerprint_service.attendance_cursor_store.record_count
+    elif since == "start":
+        cursor = None
+    else:
+        cursor = since
+    
+    try:
+        since_key = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        # Records cleared from the device after the cursor come from the archive
+        archived = await archived_attendance(fingerprint_service, since_key)
+        result = await api.get_attendance_since(since_key, known_record_count)
+        records = archived + without_archived(fingerprint_service, result["records"])
+        last_key = result["last_key"]
+        if archived and (last_key is None or record_key(archived[-1]) > last_key):
+            last_key = record_key(archived[-1])
+        new_cursor = encode_cursor(last_key) if last_key else None
+        if since in ("last", "start"):
+            fingerprint_service.attendance_cursor_store.save(new_cursor, result["record_count"])
         return {
             "success": True,
             "count": len(records),
-            "records": [
-                {
-                    "user_id": record.user_id,
-                    "timestamp": record.timestamp.isoformat(),
-                    "punch_type": record.punch
-                }
-                for record in records
-            ]
+            "since": cursor,
+            "cursor": new_cursor,
+            "records": [FingerprintService.attendance_to_dict(record) for record in records]
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+
+@fingerprint_router.get("/fingerprint/attendance/stream")
+async def stream_attendance(gzip: bool = False, device_id: Optional[str] = None):
+    """
+    Stream all attendance records as newline-delimited JSON
+    gzip: Compress the stream (Content-Encoding: gzip)
+    """
+    api = get_fingerprint_api(device_id)
+    archive = api.service.attendance_archive
+    return ndjson_response(api, api.service.get_attendance,
+                           FingerprintService.attendance_to_dict, gzip,
+                           archived=archive.records() if archive else None)
+
+
+async def archived_attendance(fingerprint_service: FingerprintService, since=None) -> List:
+    """Archived attendance records newer than a (timestamp, uid) key, oldest first"""
+    archive = fingerprint_service.attendance_archive
+    if not archive or not archive.entries:
+        return []
+    return await executors.run_in("background", lambda: list(archive.records(since)))
 
 
-@app.post("/fingerprint/clear-attendance")
-async def clear_attendance():
+def without_archived(fingerprint_service: FingerprintService, records: List) -> List:
+    """Device records not already served from the archive (see AttendanceArchive.drop_archived)"""
+    archive = fingerprint_service.attendance_archive
+    if not archive or not archive.entries:
+        return records
+    return list(archive.drop_archived(records))
+
+
+def ndjson_response(api: FingerprintAPI, fetch, serialize,
+                    compress: bool = False, archived=None) -> StreamingResponse:
+    """
+    Build a streaming NDJSON response for a blocking device fetch
+    The generator is synchronous, so Starlette drives it from its threadpool;
+    the device read itself goes through the reader's hardware API (actor
+    queue, timeout and busy rejection).
+    Errors after the stream has started are reported as a final
+    {"error": ...} line.
+    archived: Records read from the local archive, streamed before the device ones
+    (device records already in the archive are skipped)
+    """
+    fingerprint_service = api.service
+    if not fingerprint_service.is_connected():
+        raise HTTPException(status_code=503, detail="Fingerprint service not available")
+    
+    def records():
+        try:
+            if archived is not None:
+                yield from archived
+                yield from fingerprint_service.attendance_archive.drop_archived(api.call_blocking(fetch))
+            else:
+                yield from api.call_blocking(fetch)
+        except Exception as e:
+            logger.error(f"Error while streaming records: {e}")
+            yield {"error": str(e)}
+    
+    def encode(item):
+        return item if isinstance(item, dict) else serialize(item)
+    
+    body = ndjson_stream(records(), encode)
+    headers = {}
+    if compress:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+@fingerprint_router.post("/fingerprint/clear-attendance")
+async def clear_attendance(device_id: Optional[str] = None):
     """Clear all attendance records from device"""
+    api = get_fingerprint_api(device_id)
     try:
-        fingerprint_service.clear_attendance()
+        await api.clear_attendance()
         return {"success": True, "message": "Attendance cleared"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+
+@fingerprint_router.post("/fingerprint/attendance/archive")
+async def archive_attendance(device_id: Optional[str] = None):
+    """
+    Archive the device attendance log locally, verify it, then clear the device
+    Archived records keep being served by /fingerprint/attendance and
+    /fingerprint/attendance/stream. If verification fails the device log
+    is left untouched (409).
+    """
+    api = get_fingerprint_api(device_id)
+    try:
+        result = await api.archive_and_clear_attendance()
+        return {"success": True, **result}
+    except AttendanceArchiveError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise http_error(e)
+
+
+@fingerprint_router.get("/fingerprint/attendance/archive")
+async def get_attendance_archive(device_id: Optional[str] = None):
+    """Get attendance archive totals and the most recent archive runs"""
+    fingerprint_service = get_fingerprint_service(device_id)
+    if not fingerprint_service.attendance_archive:
+        raise HTTPException(status_code=503, detail="Attendance archive not configured")
+    return {"success": True, **fingerprint_service.attendance_archive.get_stats()}
+
+
+@fingerprint_router.get("/fingerprint/attendance/archive/verify")
+async def verify_attendance_archive(device_id: Optional[str] = None):
+    """Re-read every archive file and check its record count and checksum"""
+    fingerprint_service = get_fingerprint_service(device_id)
+    if not fingerprint_service.attendance_archive:
+        raise HTTPException(status_code=503, detail="Attendance archive not configured")
+    results = await executors.run_in("background", fingerprint_service.attendance_archive.verify)
+    return {"success": all(result["ok"] for result in results), "archives": results}
+
+
+@fingerprint_router.get("/fingerprint/templates/export")
+async def export_templates(device_id: Optional[str] = None):
+    """
+    Stream every fingerprint template on the device as a template archive
+    (see template_archive.py for the format). Throughput of the last export
+    is available from /fingerprint/templates/export/status.
+    """
+    api = get_fingerprint_api(device_id)
+    fingerprint_service = api.service
+    if not fingerprint_service.is_connected():
+        raise HTTPException(status_code=503, detail="Fingerprint service not available")
+    
+    template_export_stats = fingerprint_service.template_export_stats
+    serial = fingerprint_service.device_details.get("serial_number") or "device"
+    filename = f"templates-{serial}-{datetime.now():%Y%m%d-%H%M%S}{template_archive.FILE_EXTENSION}"
+    
+    def body():
+        # Synchronous generator: Starlette runs it (and the device read) in its threadpool
+        template_export_stats.clear()
+        template_export_stats.update(status="running", started_at=datetime.now().isoformat())
+        start_time = time.time()
+        templates = api.call_blocking(fingerprint_service.get_templates)
+        total_bytes = 0
+        for chunk in template_archive.archive_chunks(templates):
+            total_bytes += len(chunk)
+            yield chunk
+        
+        elapsed = time.time() - start_time
+        template_export_stats.update(
+            status="complete",
+            templates=len(templates),
+            bytes=total_bytes,
+            seconds=round(elapsed, 3),
+            bytes_per_second=round(total_bytes / elapsed) if elapsed else None
+        )
+        logger.info(f"Template export: {len(templates)} templates, {total_bytes} bytes in {elapsed:.2f}s")
+    
+    return StreamingResponse(
+        body(),
+        media_type=template_archive.MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@fingerprint_router.get("/fingerprint/templates/export/status")
+async def export_templates_status(device_id: Optional[str] = None):
+    """Get size and throughput of the last template export"""
+    fingerprint_service = get_fingerprint_service(device_id)
+    return {"success": True, **fingerprint_service.template_export_stats}
+
+
+@fingerprint_router.post("/fingerprint/templates/restore")
+async def restore_templates(uid: int, archive: UploadFile = File(...), device_id: Optional[str] = None):
+    """
+    Restore one user's templates from a template archive
+    Only the archive index and that user's templates are read.
+    The user must exist in the user directory.
+    """
+    fingerprint_service = get_fingerprint_service(device_id)
+    
+    user = fingerprint_service.user_directory.get_by_uid(uid)
+    if not user:
+        raise HTTPException(status_code=404, detail=f"User uid={uid} not found")
+    
+    try:
+        reader = template_archive.TemplateArchiveReader(archive.file)
+        fingers = reader.templates_for(uid)
+    except template_archive.TemplateArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not fingers:
+        raise HTTPException(status_code=404, detail=f"No templates for uid={uid} in archive")
+    
+    try:
+        entry = {
+            **FingerprintService.user_to_dict(user),
+            "password": user.password,
+            "group_id": user.group_id,
+            "card": user.card,
+            "templates": [finger.json_pack() for finger in fingers]
+        }
+        return await get_fingerprint_api(device_id).sync_users([entry])
+    except Exception as e:
+        raise http_error(e)
+
+
+app.include_router(fingerprint_router)
+app.include_router(fingerprint_router, prefix="/devices/{device_id}")
 
 
 # ==================== Door Lock Endpoints ====================
@@ -417,37 +932,36 @@ async def open_door(duration: int = 5):
     """
     Open door lock for specified duration (seconds)
     """
+    if not door_api:
+        raise HTTPException(status_code=503, detail="Door lock service not available")
     try:
-        result = doorlock_service.open_door(duration)
+        await door_api.open_door(duration)
         return {
             "success": True,
             "message": f"Door opened for {duration} seconds",
             "duration": duration
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @app.post("/doorlock/close")
 async def close_door():
     """Close door lock immediately"""
+    if not door_api:
+        raise HTTPException(status_code=503, detail="Door lock service not available")
     try:
-        doorlock_service.close_door()
+        await door_api.close_door()
         return {"success": True, "message": "Door closed"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @app.get("/doorlock/status")
 async def door_status():
     """Get door lock status"""
     try:
-        return {
-            "success": True,
-            "connected": doorlock_service.is_connected(),
-            "port": doorlock_service.port,
-            "baudrate": doorlock_service.baudrate
-        }
+        return {"success": True, **door_api.get_status()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -462,15 +976,21 @@ async def enroll_fingerprint_command(payload: Dict):
     if not user_id:
         return {"success": False, "error": "user_id is required"}
     
-    result = await fingerprint_service.enroll_user(user_id, finger_id)
+    result = await get_fingerprint_api(payload.get("device_id")).enroll_user(user_id, finger_id)
     return result
 
 
-async def get_users_command():
-    """Handle get users command"""
-    users = fingerprint_service.get_users()
+async def get_users_command(payload: Dict):
+    """Handle get users command (served from the user directory)"""
+    api = get_fingerprint_api(payload.get("device_id"))
+    if not api.service.user_directory.is_loaded:
+        await api.get_users()
+    
+    total, users = list_directory_users(api.service, payload.get("q"),
+                                        payload.get("offset", 0), payload.get("limit"))
     return {
         "success": True,
+        "total": total,
         "users": [{"uid": u.uid, "user_id": u.user_id, "name": u.name} for u in users]
     }
 
@@ -481,21 +1001,35 @@ async def delete_user_command(payload: Dict):
     if not user_id:
         return {"success": False, "error": "user_id is required"}
     
-    fingerprint_service.delete_user(user_id)
+    await get_fingerprint_api(payload.get("device_id")).delete_user(user_id)
     return {"success": True, "message": f"User {user_id} deleted"}
 
 
+async def delete_users_command(payload: Dict):
+    """Handle batch delete users command"""
+    user_ids = payload.get("user_ids")
+    if not user_ids:
+        return {"success": False, "error": "user_ids is required"}
+    
+    return await get_fingerprint_api(payload.get("device_id")).delete_users(user_ids)
+
+
 async def sync_user_command(payload: Dict):
-    """Handle sync user command (add user with template)"""
-    # This would require template data from cloud
-    # Implementation depends on your cloud API structure
-    return {"success": True, "message": "Sync not yet implemented"}
+    """
+    Handle sync user command (add users with templates)
+    Payload is either a single user entry or {"users": [...]}
+    """
+    entries = payload.get("users", [payload])
+    if not entries:
+        return {"success": False, "error": "users is required"}
+    
+    return await get_fingerprint_api(payload.get("device_id")).sync_users(entries)
 
 
-async def reconnect_device_command():
+async def reconnect_device_command(payload: Dict):
     """Handle device reconnection"""
     try:
-        fingerprint_service.reconnect()
+        await get_fingerprint_api(payload.get("device_id")).reconnect()
         return {"success": True, "message": "Device reconnected"}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -503,14 +1037,12 @@ async def reconnect_device_command():
 
 async def open_door_command(payload: Dict):
     """Handle door open command"""
-    global doorlock_service
-    
-    if not doorlock_service:
+    if not door_api:
         return {"success": False, "error": "Door lock service not available"}
     
     try:
         duration = payload.get("duration", 10)  # Default 10 seconds
-        result = doorlock_service.open_door(duration)
+        await door_api.open_door(duration)
         return {"success": True, "message": f"Door opened for {duration} seconds"}
     except Exception as e:
         logger.error(f"Door open error: {e}")
@@ -520,48 +1052,38 @@ async def open_door_command(payload: Dict):
 # ==================== Screen Mirror WebSocket ====================
 
 @app.websocket("/ws/mirror")
-async def mirror_websocket(websocket: WebSocket):
-    """Screen mirroring WebSocket for employee dashboard → member screen"""
-    global mirror_connections
-    await websocket.accept()
-    mirror_connections.add(websocket)
-    logger.info(f"[Mirror] New connection. Total: {len(mirror_connections)}")
+async def mirror_websocket(websocket: WebSocket, room: Optional[str] = None):
+    """
+    Screen mirroring WebSocket for employee dashboard → member screen
+    room: Pairing id shared by the screens that mirror each other; screens
+    without one share the default room
+    """
+    await mirror_channel.connect(websocket, room=room)
+    room = mirror_channel.room_of(websocket)
     
     try:
         while True:
-            data = await websocket.receive_json()
-            logger.info(f"[Mirror] Broadcasting: {data.get('action')} - {data.get('type')}")
-            
-            # Broadcast to all OTHER connected screens (don't send back to sender)
-            disconnected = set()
-            for conn in mirror_connections:
-                if conn != websocket:
-                    try:
-                        await conn.send_json(data)
-                        logger.info(f"[Mirror] Sent to connection successfully")
-                    except Exception as e:
-                        logger.warning(f"[Mirror] Failed to send to connection: {e}")
-                        disconnected.add(conn)
-            
-            # Remove disconnected clients
-            for conn in disconnected:
-                mirror_connections.discard(conn)
+            # Forwarded as received (no re-encoding) to the OTHER screens of the room
+            frame = event_codec.decode(await websocket.receive_text())
+            logger.info(f"[Mirror:{room}] Broadcasting: {frame.message.get('action')} - {frame.message.get('type')}")
+            mirror_channel.publish_to_room(frame, room, exclude=websocket)
     
     except WebSocketDisconnect:
-        mirror_connections.discard(websocket)
-        logger.info(f"[Mirror] Client disconnected. Remaining: {len(mirror_connections)}")
+        mirror_channel.disconnect(websocket)
     except Exception as e:
         logger.error(f"[Mirror] Error: {e}")
-        mirror_connections.discard(websocket)
+        mirror_channel.disconnect(websocket)
 
 
 @app.websocket("/ws/attendance")
-async def attendance_websocket(websocket: WebSocket):
-    """Attendance WebSocket for fingerprint events"""
-    global attendance_connections
-    await websocket.accept()
-    attendance_connections.add(websocket)
-    logger.info(f"[Attendance] New connection. Total: {len(attendance_connections)}")
+async def attendance_websocket(websocket: WebSocket, device_id: Optional[str] = None):
+    """
+    Attendance WebSocket for fingerprint events
+    Receives every finger_scanned event (of one reader with device_id)
+    """
+    await attendance_channel.connect(websocket)
+    if device_id:
+        attendance_channel.subscribe(websocket, ALL_TOPICS, device_id)
     
     try:
         # Keep connection alive, just receive data but don't process
@@ -569,11 +1091,10 @@ async def attendance_websocket(websocket: WebSocket):
             await websocket.receive_text()
     
     except WebSocketDisconnect:
-        attendance_connections.discard(websocket)
-        logger.info(f"[Attendance] Client disconnected. Remaining: {len(attendance_connections)}")
+        attendance_channel.disconnect(websocket)
     except Exception as e:
         logger.error(f"[Attendance] Error: {e}")
-        attendance_connections.discard(websocket)
+        attendance_channel.disconnect(websocket)
 
 
 # ==================== Root Endpoint ====================
@@ -0,0 +1,558 @@
+"""
+Pub/Sub Hub - One fan-out implementation for every WebSocket channel
+The hub holds named channels (/ws/events, /ws/attendance, /ws/mirror) that
+share the same delivery machinery:
+
+- Every connection has its own bounded send queue drained by a writer
+  task, so publishing never waits on a client. When a queue is full the
+  slow-consumer policy drops the oldest message or disconnects the client.
+- Clients receive everything on their channel unless they subscribe to
+  topics, optionally filtered by device id or user id. Subscriptions live
+  in a topic index keyed by (topic, device_id, user_id), so a message is
+  only routed to the clients whose keys it matches.
+- Messages are encoded once (event_codec.Frame) and the same text is
+  queued for every recipient, including channels a message is forwarded to.
+- A heartbeat goes to every client periodically; a client whose current
+  send has been stuck longer than the stall timeout is disconnected.
+- Room channels (/ws/mirror) route by room instead of topic: a message
+  only reaches the other clients of its sender's room.
+
+Queue size, policy and heartbeat timing are configured once for the hub
+(config python_bridge.websocket).
+"""
+
+from fastapi import WebSocket
+from event_codec import Frame
+import event_codec
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# What to do when a client's send queue is full
+POLICY_DROP_OLDEST = "drop_oldest"   # discard the oldest queued message (the client sees a seq gap)
+POLICY_DISCONNECT = "disconnect"     # close the connection; the client reconnects (and resumes)
+SLOW_CONSUMER_POLICIES = (POLICY_DROP_OLDEST, POLICY_DISCONNECT)
+
+# Close code sent to clients disconnected as slow or stalled (try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Event type -> topic; clients can subscribe to a topic or to single event types
+EVENT_TOPICS = {
+    "finger_scanned": "scans",
+    "attendance_backfilled": "scans",
+    "enrollment_started": "enrollment",
+    "enrollment_complete": "enrollment",
+    "enrollment_error": "enrollment",
+    "sync_started": "sync",
+    "sync_progress": "sync",
+    "sync_complete": "sync",
+    "device_disconnected": "device",
+    "device_reconnected": "device",
+    "capture_error": "errors"
+}
+ALL_TOPICS = "*"
+TOPICS = sorted(set(EVENT_TOPICS.values()))
+
+# Room of clients that connect without one (they all see each other)
+DEFAULT_ROOM = "default"
+
+# (topic, device_id, user_id); None matches any device or user
+RouteKey = Tuple[str, Optional[str], Optional[str]]
+
+
+def route_keys(message: Dict) -> List[RouteKey]:
+    """Subscription keys a message is delivered to"""
+    event_type = message.get("type")
+    topics = [ALL_TOPICS, event_type]
+    if event_type in EVENT_TOPICS:
+        topics.append(EVENT_TOPICS[event_type])
+    device_ids = [None]
+    if message.get("device_id") is not None:
+        device_ids.append(str(message["device_id"]))
+    user_ids = [None]
+    if message.get("user_id") is not None:
+        user_ids.append(str(message["user_id"]))
+    return [(topic, device_id, user_id) for topic in topics for device_id in device_ids for user_id in user_ids]
+
+
+def _as_list(value) -> List:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+class ClientQueue:
+    def __init__(self, websocket: WebSocket, max_size: int):
+        """
+        Outbound queue of one connection and the counters reported for it
+
+        Args:
+            websocket: Connected client
+            max_size: Messages queued before the slow-consumer policy applies
+        """
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.writer: Optional[asyncio.Task] = None
+        # Held for every send; a replay holds it to send outside the queue
+        self.send_lock = asyncio.Lock()
+        self.in_flight: Optional[str] = None  # dequeued by the writer, not sent yet
+        # Every message until the client subscribes to something narrower
+        self.subscriptions: Set[RouteKey] = {(ALL_TOPICS, None, None)}
+        self.explicit = False  # subscribed or unsubscribed at least once
+        self.room: Optional[str] = None  # room channels only
+        self.connected_at = datetime.now()
+        self.sending_since: Optional[float] = None  # monotonic start of the send in progress
+        self.sent = 0
+        self.dropped = 0
+        self.peak_depth = 0
+        self.send_ms_max = 0.0
+
+    def get_stats(self) -> Dict:
+        client = self.websocket.client
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "connected_at": self.connected_at.isoformat(),
+            "room": self.room,
+            "subscriptions": [{"topic": topic, "device_id": device_id, "user_id": user_id}
+                              for topic, device_id, user_id in sorted(self.subscriptions, key=str)],
+            "depth": self.queue.qsize(),
+            "peak_depth": self.peak_depth,
+            "max_size": self.queue.maxsize,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "send_ms_max": round(self.send_ms_max, 3)
+        }
+
+
+class Channel:
+    def __init__(self, name: str, send_queue_size: int = 256,
+                 slow_consumer_policy: str = POLICY_DROP_OLDEST, stall_timeout: float = 60):
+        """
+        Initialize a channel
+
+        Args:
+            name: Channel name (used in logs, heartbeats and stats)
+            send_queue_size: Messages queued per client before the
+                             slow-consumer policy applies
+            slow_consumer_policy: "drop_oldest" or "disconnect"
+            stall_timeout: Seconds a single send may hang before the client
+                           is treated as dead (checked on each heartbeat)
+        """
+        self.name = name
+        self.clients: Dict[WebSocket, ClientQueue] = {}
+        # Topic index: route key -> subscribed clients
+        self.routes: Dict[RouteKey, Set[WebSocket]] = {}
+        # Channels that also get some of this channel's messages
+        self.forwards: List[Tuple["Channel", Optional[Set[str]]]] = []
+        self.send_queue_size = send_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.stall_timeout = stall_timeout
+
+        self.published = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.stalled_disconnects = 0
+        self.heartbeats = 0
+
+    def configure(self, send_queue_size: int, slow_consumer_policy: str, stall_timeout: float):
+        """Set queue size and policies (the queue size applies to new connections)"""
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            logger.warning(f"Unknown slow consumer policy '{slow_consumer_policy}', using {POLICY_DROP_OLDEST}")
+            slow_consumer_policy = POLICY_DROP_OLDEST
+        self.send_queue_size = send_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.stall_timeout = stall_timeout
+
+    # ---------- connections ----------
+
+    async def connect(self, websocket: WebSocket):
+        """Accept new WebSocket connection and start its writer task"""
+        await websocket.accept()
+        client = ClientQueue(websocket, self.send_queue_size)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.clients[websocket] = client
+        self._index(client)
+        logger.info(f"[{self.name}] New WebSocket connection. Total active: {len(self.clients)}")
+
+    def disconnect(self, websocket: WebSocket):
+        """Remove WebSocket connection and stop its writer task"""
+        client = self.clients.pop(websocket, None)
+        if not client:
+            return
+        self._unindex(client)
+        if client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        logger.info(f"[{self.name}] WebSocket disconnected. Total active: {len(self.clients)}")
+
+    def get_connection_count(self) -> int:
+        """Get number of active connections"""
+        return len(self.clients)
+
+    # ---------- subscriptions ----------
+
+    def subscribe(self, websocket: WebSocket, topics, device_id=None, user_id=None) -> Dict:
+        """
+        Subscribe a client to topics (replaces the default of every message)
+
+        Args:
+            websocket: Connected client
+            topics: Topic names (see TOPICS), event types, or "*"
+            device_id: Only messages of this reader (or a list of readers)
+            user_id: Only messages of this user (or a list of users)
+
+        Returns:
+            The client's subscriptions
+
+        Raises:
+            ValueError: If a topic is unknown
+        """
+        client = self.clients.get(websocket)
+        if not client:
+            raise ValueError("Client is not connected")
+        topics = _as_list(topics)
+        if not topics:
+            raise ValueError("No topics given")
+        unknown = [topic for topic in topics
+                   if topic != ALL_TOPICS and topic not in TOPICS and topic not in EVENT_TOPICS]
+        if unknown:
+            raise ValueError(f"Unknown topic(s) {', '.join(map(str, unknown))}; "
+                             f"topics are {', '.join(TOPICS)} or an event type")
+
+        device_ids = [str(value) for value in _as_list(device_id)] or [None]
+        user_ids = [str(value) for value in _as_list(user_id)] or [None]
+        self._unindex(client)
+        if not client.explicit:
+            client.subscriptions.clear()
+            client.explicit = True
+        client.subscriptions.update((topic, device, user) for topic in topics
+                                    for device in device_ids for user in user_ids)
+        self._index(client)
+        return {"success": True, "subscriptions": client.get_stats()["subscriptions"]}
+
+    def unsubscribe(self, websocket: WebSocket, topics=None) -> Dict:
+        """
+        Drop a client's subscriptions to topics (all of them if topics is None)
+
+        Returns:
+            The client's remaining subscriptions
+        """
+        client = self.clients.get(websocket)
+        if not client:
+            raise ValueError("Client is not connected")
+        topics = set(_as_list(topics))
+        self._unindex(client)
+        client.explicit = True
+        if topics:
+            client.subscriptions = {key for key in client.subscriptions if key[0] not in topics}
+        else:
+            client.subscriptions.clear()
+        self._index(client)
+        return {"success": True, "subscriptions": client.get_stats()["subscriptions"]}
+
+    def _index(self, client: ClientQueue):
+        for key in client.subscriptions:
+            self.routes.setdefault(key, set()).add(client.websocket)
+
+    def _unindex(self, client: ClientQueue):
+        for key in client.subscriptions:
+            subscribers = self.routes.get(key)
+            if subscribers is None:
+                continue
+            subscribers.discard(client.websocket)
+            if not subscribers:
+                del self.routes[key]
+
+    def _recipients(self, keys: Iterable[RouteKey]) -> Set[WebSocket]:
+        recipients = set()
+        for key in keys:
+            subscribers = self.routes.get(key)
+            if subscribers:
+                recipients |= subscribers
+        return recipients
+
+    # ---------- publishing ----------
+
+    def forward(self, channel: "Channel", event_types: Optional[Iterable[str]] = None):
+        """Also publish this channel's messages (of event_types, or all) on channel"""
+        self.forwards.append((channel, set(event_types) if event_types else None))
+
+    def publish(self, message: Dict, exclude: Optional[WebSocket] = None) -> Frame:
+        """
+        Encode a message once and queue it for every subscribed client
+
+        Args:
+            message: Dictionary to send as JSON
+            exclude: Client not to send it to (e.g. the sender)
+        """
+        frame = event_codec.encode(message)
+        self.publish_frame(frame, exclude=exclude)
+        return frame
+
+    def publish_frame(self, frame: Frame, keys: Optional[List[RouteKey]] = None,
+                      exclude: Optional[WebSocket] = None) -> int:
+        """
+        Queue an encoded message for every subscribed client (never waits)
+
+        Returns:
+            Number of clients it was queued for on this channel
+        """
+        message = frame.message
+        if keys is None:
+            keys = route_keys(message)
+        self.published += 1
+
+        recipients = 0
+        for websocket in self._recipients(keys):
+            client = self.clients.get(websocket)
+            if client and websocket is not exclude:
+                self._deliver(client, frame)
+                recipients += 1
+
+        for channel, event_types in self.forwards:
+            if event_types is None or message.get("type") in event_types:
+                channel.publish_frame(frame, keys)
+        return recipients
+
+    async def send_to(self, websocket: WebSocket, message: Dict):
+        """
+        Send a message to one connection right away (command replies)
+
+        Holds the client's send lock like the writer task does, so it never
+        interleaves with a queued send or a replay; unlike queued messages it
+        is not subject to the slow-consumer policy.
+        """
+        text = event_codec.encode(message).text
+        client = self.clients.get(websocket)
+        try:
+            if client:
+                async with client.send_lock:
+                    await websocket.send_text(text)
+            else:
+                await websocket.send_text(text)
+        except Exception as e:
+            logger.error(f"[{self.name}] Error sending to WebSocket: {e}")
+            self.disconnect(websocket)
+
+    def _deliver(self, client: ClientQueue, frame: Frame):
+        self._enqueue(client, frame.text)
+
+    def _enqueue(self, client: ClientQueue, text: str):
+        """Queue a message for one client, applying the slow-consumer policy"""
+        queue = client.queue
+        if queue.full():
+            if self.slow_consumer_policy == POLICY_DISCONNECT:
+                self.slow_disconnects += 1
+                logger.warning(f"[{self.name}] WebSocket client {client.websocket.client} fell "
+                               f"{queue.maxsize} messages behind, disconnecting")
+                self._drop_client(client)
+                return
+            queue.get_nowait()
+            client.dropped += 1
+            self.dropped += 1
+            if client.dropped == 1 or client.dropped % 100 == 0:
+                logger.warning(f"[{self.name}] WebSocket client {client.websocket.client} is slow, "
+                               f"{client.dropped} message(s) dropped")
+        queue.put_nowait(text)
+        client.peak_depth = max(client.peak_depth, queue.qsize())
+
+    async def _writer(self, client: ClientQueue):
+        """Send one client's queued messages in order"""
+        websocket = client.websocket
+        try:
+            while True:
+                client.in_flight = await client.queue.get()
+                async with client.send_lock:
+                    text, client.in_flight = client.in_flight, None
+                    if text is None:
+                        continue  # taken over by a replay while waiting for the lock
+                    client.sending_since = started = time.monotonic()
+                    await websocket.send_text(text)
+                    client.sending_since = None
+                client.send_ms_max = max(client.send_ms_max, (time.monotonic() - started) * 1000)
+                client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[{self.name}] Error sending to WebSocket: {e}")
+            self.disconnect(websocket)
+
+    def _drop_client(self, client: ClientQueue):
+        """Disconnect a client the hub gave up on and close its socket"""
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass  # already gone
+
+    # ---------- heartbeats ----------
+
+    def _holding(self, client: ClientQueue) -> bool:
+        """True while the client's messages are sent outside its queue"""
+        return False
+
+    def heartbeat(self):
+        """Disconnect stalled clients and queue a heartbeat for the rest"""
+        now = time.monotonic()
+        frame = event_codec.encode({"type": "heartbeat", "channel": self.name,
+                                    "timestamp": datetime.now().isoformat()})
+        for client in list(self.clients.values()):
+            if client.sending_since is not None and now - client.sending_since > self.stall_timeout:
+                self.stalled_disconnects += 1
+                logger.warning(f"[{self.name}] WebSocket client {client.websocket.client} stalled for "
+                               f"{now - client.sending_since:.0f}s, disconnecting")
+                self._drop_client(client)
+            elif not self._holding(client):
+                self._enqueue(client, frame.text)
+        self.heartbeats += 1
+
+    # ---------- metrics ----------
+
+    def _topic_counts(self) -> Dict[str, int]:
+        """Subscribed clients per topic (any device/user filter)"""
+        counts: Dict[str, Set[WebSocket]] = {}
+        for (topic, _, _), subscribers in self.routes.items():
+            counts.setdefault(topic, set()).update(subscribers)
+        return {topic: len(subscribers) for topic, subscribers in sorted(counts.items())}
+
+    def get_client_stats(self) -> Dict:
+        """Send queue depth and drop counters, overall and per client"""
+        clients = [client.get_stats() for client in self.clients.values()]
+        return {
+            "connections": len(clients),
+            "send_queue_size": self.send_queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "published": self.published,
+            "sent": sum(client["sent"] for client in clients),
+            "queued": sum(client["depth"] for client in clients),
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "stalled_disconnects": self.stalled_disconnects,
+            "heartbeats": self.heartbeats,
+            "forwards_to": [channel.name for channel, _ in self.forwards],
+            "topics": self._topic_counts(),
+            "clients": clients
+        }
+
+
+class RoomChannel(Channel):
+    def __init__(self, name: str, **kwargs):
+        """
+        Channel whose clients are grouped in rooms (e.g. one employee/member
+        screen pair); a room index makes delivery O(room size)
+        """
+        super().__init__(name, **kwargs)
+        self.rooms: Dict[str, Set[WebSocket]] = {}
+
+    async def connect(self, websocket: WebSocket, room: Optional[str] = None):
+        """Accept new WebSocket connection into a room (DEFAULT_ROOM if none)"""
+        await super().connect(websocket)
+        client = self.clients[websocket]
+        client.room = room or DEFAULT_ROOM
+        self.rooms.setdefault(client.room, set()).add(websocket)
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.get(websocket)
+        if client:
+            members = self.rooms.get(client.room)
+            if members is not None:
+                members.discard(websocket)
+                if not members:
+                    del self.rooms[client.room]
+        super().disconnect(websocket)
+
+    def room_of(self, websocket: WebSocket) -> Optional[str]:
+        client = self.clients.get(websocket)
+        return client.room if client else None
+
+    def publish_to_room(self, frame: Frame, room: str, exclude: Optional[WebSocket] = None) -> int:
+        """
+        Queue an encoded message for the clients of one room (never waits)
+
+        Returns:
+            Number of clients it was queued for
+        """
+        self.published += 1
+        recipients = 0
+        # Copied: the disconnect policy may remove members while delivering
+        for websocket in tuple(self.rooms.get(room, ())):
+            client = self.clients.get(websocket)
+            if client and websocket is not exclude:
+                self._deliver(client, frame)
+                recipients += 1
+        return recipients
+
+    def get_client_stats(self) -> Dict:
+        return {
+            **super().get_client_stats(),
+            "rooms": {room: len(members) for room, members in sorted(self.rooms.items())}
+        }
+
+
+class PubSubHub:
+    def __init__(self):
+        """Initialize pub/sub hub (channels are added with add)"""
+        self.channels: Dict[str, Channel] = {}
+        self.send_queue_size = 256
+        self.slow_consumer_policy = POLICY_DROP_OLDEST
+        self.heartbeat_interval = 30.0
+        self.stall_timeout = 60.0
+
+    def add(self, channel: Channel) -> Channel:
+        """Register a channel (configured with the hub settings)"""
+        channel.configure(self.send_queue_size, self.slow_consumer_policy, self.stall_timeout)
+        self.channels[channel.name] = channel
+        return channel
+
+    def channel(self, name: str) -> Channel:
+        return self.channels[name]
+
+    def forward(self, source: str, target: str, event_types: Optional[Iterable[str]] = None):
+        """Publish messages of the source channel on the target channel too"""
+        self.channels[source].forward(self.channels[target], event_types)
+
+    def configure(self, config: Optional[Dict]):
+        """
+        Apply python_bridge.websocket settings to every channel
+
+        Keys: send_queue_size, slow_consumer_policy, heartbeat_interval
+        (seconds, 0 disables heartbeats), stall_timeout (seconds)
+        """
+        config = config or {}
+        self.send_queue_size = config.get("send_queue_size", self.send_queue_size)
+        self.slow_consumer_policy = config.get("slow_consumer_policy", self.slow_consumer_policy)
+        self.heartbeat_interval = config.get("heartbeat_interval", self.heartbeat_interval)
+        self.stall_timeout = config.get("stall_timeout", self.stall_timeout)
+        for channel in self.channels.values():
+            channel.configure(self.send_queue_size, self.slow_consumer_policy, self.stall_timeout)
+
+    async def run_heartbeats(self):
+        """Send heartbeats on every channel until cancelled"""
+        if not self.heartbeat_interval:
+            return
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            for channel in self.channels.values():
+                try:
+                    channel.heartbeat()
+                except Exception as e:
+                    logger.error(f"[{channel.name}] Heartbeat error: {e}")
+
+    def get_stats(self) -> Dict:
+        """Hub settings and the metrics of every channel"""
+        return {
+            "send_queue_size": self.send_queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "heartbeat_interval": self.heartbeat_interval,
+            "stall_timeout": self.stall_timeout,
+            "channels": {name: channel.get_client_stats() for name, channel in self.channels.items()}
+        }
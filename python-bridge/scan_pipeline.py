@@ -0,0 +1,79 @@
+"""
+Scan Pipeline - Processing stage between live capture and event emission
+Suppresses repeat scans from the same user (double taps, a member scanning
+again because the door was slow) without sleeping the capture thread
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional
+import threading
+import time
+
+
+class ScanDebouncer:
+    def __init__(self, window: float = 5.0):
+        """
+        Initialize scan debouncer
+
+        Args:
+            window: Seconds after an accepted scan during which further scans
+                    from the same user are suppressed (0 disables debouncing)
+        """
+        self.window = window
+        self._last_seen: "OrderedDict[str, float]" = OrderedDict()  # user_id -> accepted at, oldest first
+        self._lock = threading.Lock()
+
+        self.accepted = 0
+        self.suppressed = 0
+        self.suppressed_by_user: Dict[str, int] = {}
+
+    def accept(self, user_id: str, now: Optional[float] = None) -> bool:
+        """
+        Decide whether a scan should be forwarded
+
+        Args:
+            user_id: Device user_id of the scan
+            now: time.monotonic() of the scan (defaults to now)
+
+        Returns:
+            True to forward the scan, False if it repeats an accepted scan
+            within the window
+        """
+        if now is None:
+            now = time.monotonic()
+        user_id = str(user_id)
+
+        with self._lock:
+            self._expire(now)
+
+            last = self._last_seen.get(user_id)
+            if last is not None and now - last < self.window:
+                self.suppressed += 1
+                self.suppressed_by_user[user_id] = self.suppressed_by_user.get(user_id, 0) + 1
+                return False
+
+            # Re-insert so the dict stays ordered by accept time
+            self._last_seen.pop(user_id, None)
+            self._last_seen[user_id] = now
+            self.accepted += 1
+            return True
+
+    def _expire(self, now: float):
+        """Forget users whose window has passed (oldest entries sit at the front)"""
+        while self._last_seen:
+            user_id, accepted_at = next(iter(self._last_seen.items()))
+            if now - accepted_at < self.window:
+                break
+            del self._last_seen[user_id]
+
+    def get_stats(self) -> Dict:
+        """Accepted and suppressed scan counts"""
+        with self._lock:
+            return {
+                "window_seconds": self.window,
+                "accepted": self.accepted,
+                "suppressed": self.suppressed,
+                "tracked_users": len(self._last_seen),
+                "top_suppressed": sorted(self.suppressed_by_user.items(),
+                                         key=lambda item: item[1], reverse=True)[:10]
+            }
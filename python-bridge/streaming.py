@@ -0,0 +1,98 @@
+"""
+Streaming helpers - NDJSON encoding and gzip compression for large dumps
+Records are encoded one at a time so memory stays flat regardless of
+how many rows the device returns
+"""
+
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Flush encoded lines to the client in chunks of about this many bytes
+CHUNK_SIZE = 64 * 1024
+
+
+def ndjson_stream(items: Iterable[Any], serialize: Callable[[Any], Dict],
+                  chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encode items as newline-delimited JSON
+
+    Args:
+        items: Records to encode (consumed lazily)
+        serialize: Converts one record to a JSON-serializable dict
+        chunk_size: Approximate size of each yielded chunk
+
+    Yields:
+        Byte chunks holding whole lines
+    """
+    buffer = bytearray()
+    for item in items:
+        buffer += json.dumps(serialize(item)).encode("utf-8")
+        buffer += b"\n"
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def json_records_stream(items: Iterable[Any], serialize: Callable[[Any], Dict],
+                        chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encode items as one JSON object: {"records": [...], "count": n, "success": true}
+
+    The totals follow the list, so the records never have to be held in
+    memory. An error while reading items ends the list early and is reported
+    as "success": false with an "error" message.
+
+    Args:
+        items: Records to encode (consumed lazily)
+        serialize: Converts one record to a JSON-serializable dict
+        chunk_size: Approximate size of each yielded chunk
+
+    Yields:
+        Byte chunks of the JSON document
+    """
+    buffer = bytearray(b'{"records": [')
+    count = 0
+    error = None
+    try:
+        for item in items:
+            if count:
+                buffer += b", "
+            buffer += json.dumps(serialize(item)).encode("utf-8")
+            count += 1
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+    except Exception as e:
+        error = str(e)
+
+    totals = {"count": count, "success": error is None}
+    if error is not None:
+        totals["error"] = error
+    buffer += b"], " + json.dumps(totals).encode("utf-8")[1:]
+    yield bytes(buffer)
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip-compress a stream of byte chunks on the fly
+
+    Args:
+        chunks: Uncompressed byte chunks
+        level: zlib compression level (1-9)
+
+    Yields:
+        Compressed byte chunks forming a single gzip member
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
@@ -0,0 +1,121 @@
+"""
+Template Archive - Compact binary backup of fingerprint templates
+
+Layout (little-endian):
+    header   "<4sHHII"  magic b"BBKT", version, reserved, entry count, created (unix time)
+    index    "<HBBIII"  uid, fid, valid, data offset, size, crc32   (one per template, sorted by uid/fid)
+    data     raw template bytes, in index order
+
+The index sits in front of the data, so restoring one user only reads the
+header, the index and that user's templates.
+"""
+
+from zk.finger import Finger
+from bisect import bisect_left
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+import struct
+import time
+import zlib
+
+MAGIC = b"BBKT"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+INDEX_ENTRY = struct.Struct("<HBBIII")
+
+MEDIA_TYPE = "application/octet-stream"
+FILE_EXTENSION = ".bbkt"
+
+# Template bytes are flushed to the client in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+
+
+class TemplateArchiveError(Exception):
+    """Raised when an archive is malformed or fails verification"""
+
+
+def archive_chunks(templates: Iterable[Finger], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encode templates as a template archive
+
+    Args:
+        templates: Templates as returned by conn.get_templates()
+        chunk_size: Approximate size of each yielded data chunk
+
+    Yields:
+        Byte chunks: the header and index first, then the template data
+    """
+    templates = sorted(templates, key=lambda finger: (finger.uid, finger.fid))
+
+    index = bytearray(HEADER.pack(MAGIC, VERSION, 0, len(templates), int(time.time())))
+    offset = 0
+    for finger in templates:
+        index += INDEX_ENTRY.pack(finger.uid, finger.fid, finger.valid, offset,
+                                  len(finger.template), zlib.crc32(finger.template))
+        offset += len(finger.template)
+    yield bytes(index)
+
+    buffer = bytearray()
+    for finger in templates:
+        buffer += finger.template
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+class TemplateArchiveReader:
+    def __init__(self, f: BinaryIO):
+        """
+        Open a template archive (reads the header and index only)
+
+        Args:
+            f: Seekable binary file positioned at the start of the archive
+
+        Raises:
+            TemplateArchiveError: If the header or index is malformed
+        """
+        self.f = f
+        self.base = f.tell()
+
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise TemplateArchiveError("Truncated archive header")
+        magic, version, _, count, self.created = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise TemplateArchiveError("Not a template archive")
+        if version != VERSION:
+            raise TemplateArchiveError(f"Unsupported archive version {version}")
+
+        index = f.read(INDEX_ENTRY.size * count)
+        if len(index) != INDEX_ENTRY.size * count:
+            raise TemplateArchiveError("Truncated archive index")
+        self.entries: List[Tuple] = [entry for entry in INDEX_ENTRY.iter_unpack(index)]
+        self.data_start = self.base + HEADER.size + len(index)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def uids(self) -> List[int]:
+        """Device uids with at least one template in the archive"""
+        return sorted({entry[0] for entry in self.entries})
+
+    def templates_for(self, uid: int) -> List[Finger]:
+        """
+        Read the templates of a single user
+
+        Raises:
+            TemplateArchiveError: If a template fails its checksum
+        """
+        fingers = []
+        position = bisect_left(self.entries, (uid,))
+        while position < len(self.entries) and self.entries[position][0] == uid:
+            _, fid, valid, offset, size, crc = self.entries[position]
+            self.f.seek(self.data_start + offset)
+            template = self.f.read(size)
+            if len(template) != size or zlib.crc32(template) != crc:
+                raise TemplateArchiveError(f"Template uid={uid} fid={fid} failed verification")
+            fingers.append(Finger(uid, fid, valid, template))
+            position += 1
+        return fingers
@@ -0,0 +1,61 @@
+"""
+Shared fixtures; the bridge modules are importable from the tests (they
+are not a package). Device tests run against the ZK simulator.
+"""
+
+from pathlib import Path
+import shutil
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from zk_simulator import ZKSimulator, SimulatedDevice
+
+
+@pytest.fixture
+def simulator():
+    """ZK simulator with five users and an empty attendance log"""
+    simulator = ZKSimulator(port=0, device=SimulatedDevice(users=5))
+    simulator.enroll_press_delay = 0.01
+    simulator.start()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def service(simulator):
+    """FingerprintService connected to the simulator"""
+    from fingerprint_service import FingerprintService
+    service = FingerprintService(ip="127.0.0.1", port=simulator.port, ommit_ping=True, debounce_seconds=0)
+    service.connect()
+    yield service
+    service.disconnect()
+    service.actor.stop()
+
+
+@pytest.fixture(scope="session")
+def bridge_dir(tmp_path_factory):
+    """Working directory for the app (main.py creates logs/ and data/ on import)"""
+    return tmp_path_factory.mktemp("bridge")
+
+
+@pytest.fixture
+def bridge(bridge_dir, simulator, monkeypatch):
+    """TestClient of the bridge app with one reader on the simulator"""
+    monkeypatch.chdir(bridge_dir)
+    import main
+    from device_registry import DeviceRegistry
+    from fastapi.testclient import TestClient
+
+    reader = {"ip": "127.0.0.1", "port": simulator.port, "ommit_ping": True, "debounce_seconds": 0}
+    monkeypatch.setattr(main, "load_config", lambda: {
+        "hardware": {"fingerprint": reader},
+        "python_bridge": {"event_journal": {"directory": str(bridge_dir / "journal")}}
+    })
+    monkeypatch.setattr(main, "device_registry", DeviceRegistry(ws_manager=main.ws_manager))
+    # Cursors and archives of the previous test
+    shutil.rmtree(bridge_dir / "data", ignore_errors=True)
+    (bridge_dir / "data").mkdir()
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,92 @@
+"""Attendance archive: verification, rollback of a failed clear, and serving archived records"""
+
+from attendance_archive import AttendanceArchive
+from fingerprint_service import FingerprintService
+from streaming import json_records_stream
+from datetime import datetime, timedelta
+from zk.attendance import Attendance
+import asyncio
+import gzip
+import json
+import pytest
+import time
+
+
+def punches(count, start=datetime(2026, 1, 5, 8, 0)):
+    return [Attendance(str(uid), start + timedelta(minutes=uid), 1, 0, uid) for uid in range(1, count + 1)]
+
+
+def test_archive_round_trips_and_verifies(tmp_path):
+    archive = AttendanceArchive(str(tmp_path))
+    entry = archive.write(punches(3))
+    assert entry["records"] == 3
+    assert [record.user_id for record in archive.records()] == ["1", "2", "3"]
+
+    # A reloaded manifest serves the same records
+    assert [record.user_id for record in AttendanceArchive(str(tmp_path)).records()] == ["1", "2", "3"]
+
+    with gzip.open(tmp_path / entry["file"], "wb") as f:
+        f.write(b'{"uid": 1, "user_id": "1", "timestamp": "2026-01-05T08:01:00"}\n')
+    assert archive.verify() == [{"file": entry["file"], "ok": False,
+                                 "error": f"Archive {entry['file']} holds 1 records, expected 3"}]
+
+
+def test_records_still_on_the_device_are_not_served_twice(tmp_path):
+    archive = AttendanceArchive(str(tmp_path))
+    records = punches(3)
+    archive.write(records)
+
+    # The clear failed: the device still holds the archived punches plus a new one
+    newer = Attendance("9", records[-1].timestamp + timedelta(minutes=5), 1, 0, 9)
+    assert list(archive.drop_archived(records + [newer])) == [newer]
+
+    # A second run after an unconfirmed clear repeats the first run's records
+    archive.write(records + [newer])
+    assert [record.user_id for record in archive.records()] == ["1", "2", "3", "9"]
+
+
+def test_failed_clear_discards_the_archive_run(service, simulator, tmp_path, monkeypatch):
+    service.attendance_archive = AttendanceArchive(str(tmp_path))
+    for user_id in ("1", "2"):
+        simulator.scan(user_id)
+    time.sleep(0.05)
+
+    def fail():
+        raise RuntimeError("clear failed")
+    monkeypatch.setattr(service.conn, "clear_attendance", fail)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.run(service.archive_and_clear_attendance))
+    assert service.attendance_archive.entries == []
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["manifest.json"]
+    assert len(simulator.device.attendance) == 2
+
+
+def test_full_read_streams_archived_records_before_the_device_log(bridge, simulator):
+    for user_id in ("1", "2"):
+        simulator.scan(user_id)
+        time.sleep(0.01)
+    assert bridge.post("/fingerprint/attendance/archive").json()["archived"] == 2
+
+    time.sleep(1.1)  # device timestamps have one-second resolution
+    simulator.scan("3")
+    time.sleep(0.05)
+
+    response = bridge.get("/fingerprint/attendance")
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert body["success"] is True
+    assert body["count"] == 3
+    assert [record["user_id"] for record in body["records"]] == ["1", "2", "3"]
+
+
+def test_read_error_mid_stream_is_reported_in_the_totals():
+    def records():
+        yield from punches(2)
+        raise OSError("archive unreadable")
+
+    body = json.loads(b"".join(json_records_stream(records(), FingerprintService.attendance_to_dict, chunk_size=1)))
+    assert [record["user_id"] for record in body["records"]] == ["1", "2"]
+    assert body["count"] == 2
+    assert body["success"] is False
+    assert body["error"] == "archive unreadable"
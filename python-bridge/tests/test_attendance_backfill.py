@@ -0,0 +1,93 @@
+"""Gap backfill: device log diff against seen scans, repeat suppression, count skip"""
+
+from attendance_backfill import GapBackfill, journaled_scans
+from datetime import datetime, timedelta
+from zk.attendance import Attendance
+import json
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+def punch(user_id, seconds_ago: float, uid: int = 1) -> Attendance:
+    return Attendance(str(user_id), NOW - timedelta(seconds=seconds_ago), 1, 0, uid)
+
+
+def started_backfill(debounce_seconds: float = 5.0, **kwargs) -> GapBackfill:
+    """Backfill that reconciles from ten minutes ago"""
+    backfill = GapBackfill(debounce_seconds, **kwargs)
+    backfill.reconciled_until = NOW - timedelta(seconds=600)
+    return backfill
+
+
+def test_diff_returns_only_unseen_punches_oldest_first():
+    backfill = started_backfill()
+    seen = punch(1, 120)
+    backfill.note_live(seen.user_id, seen.timestamp)
+
+    missing = backfill.diff([punch(2, 30), seen, punch(3, 90)])
+
+    assert [record.user_id for record in missing] == ["3", "2"]
+    assert backfill.expected_count == 3
+    # Emitted punches are indexed: the same log yields nothing new
+    assert backfill.diff([punch(2, 30), seen, punch(3, 90)]) == []
+
+
+def test_repeat_within_debounce_window_is_not_backfilled():
+    backfill = started_backfill(debounce_seconds=5)
+    first = punch(1, 60)
+    backfill.note_live(first.user_id, first.timestamp)
+
+    missing = backfill.diff([first, punch(1, 57), punch(1, 40)])
+
+    assert [record.timestamp for record in missing] == [NOW - timedelta(seconds=40)]
+
+
+def test_punches_before_the_reconciled_point_or_max_age_are_ignored():
+    backfill = GapBackfill(max_age=3600)
+    backfill.reconciled_until = NOW - timedelta(days=2)
+
+    missing = backfill.diff([punch(1, 7200), punch(2, 1800)])
+
+    assert [record.user_id for record in missing] == ["2"]
+    assert backfill.reconciled_until == NOW - timedelta(seconds=1800)
+    assert backfill.diff([punch(3, 2400)]) == []  # older than the reconciled point
+
+
+def test_matching_record_count_skips_the_download():
+    backfill = GapBackfill()
+    # First run without a journal: start from the current count
+    assert backfill.needs_download(10) is False
+
+    live = punch(1, 5)
+    backfill.note_live(live.user_id, live.timestamp)
+    assert backfill.expected_count == 11
+    assert backfill.needs_download(11) is False
+    assert backfill.needs_download(12) is True
+    assert backfill.get_stats()["skipped"] == 2
+
+
+def test_after_a_clear_the_count_restarts_from_zero():
+    backfill = started_backfill()
+    backfill.expected_count = 0  # what FingerprintService does on clear
+
+    assert backfill.needs_download(0) is False
+    assert backfill.needs_download(1) is True
+
+
+def test_seed_resumes_from_the_last_journaled_scan():
+    lines = [
+        json.dumps({"seq": 1, "type": "finger_scanned", "device_id": "gate", "user_id": "1",
+                    "punched_at": (NOW - timedelta(seconds=100)).isoformat()}),
+        json.dumps({"seq": 2, "type": "attendance_backfilled", "device_id": "gate", "user_id": "2",
+                    "punched_at": (NOW - timedelta(seconds=80)).isoformat()}),
+        json.dumps({"seq": 3, "type": "finger_scanned", "device_id": "desk", "user_id": "3",
+                    "punched_at": (NOW - timedelta(seconds=10)).isoformat()}),
+        json.dumps({"seq": 4, "type": "sync_progress", "done": 1})
+    ]
+    backfill = GapBackfill()
+    backfill.seed(journaled_scans(lines, "gate"))
+
+    assert backfill.reconciled_until == NOW - timedelta(seconds=80)
+    assert backfill.needs_download(0) is True  # nothing counted yet after a restart
+    missing = backfill.diff([punch(1, 100), punch(2, 80), punch(4, 20)])
+    assert [record.user_id for record in missing] == ["4"]
@@ -0,0 +1,41 @@
+"""Incremental attendance reads and the persisted cursor"""
+
+import time
+
+
+def scan(simulator, *user_ids):
+    for user_id in user_ids:
+        simulator.scan(user_id)
+        time.sleep(0.01)
+
+
+def test_since_last_continues_from_the_persisted_cursor(bridge, simulator):
+    scan(simulator, "1", "2")
+    first = bridge.get("/fingerprint/attendance?since=start").json()
+    assert first["count"] == 2
+
+    assert bridge.get("/fingerprint/attendance?since=last").json()["count"] == 0
+    scan(simulator, "3")
+    assert bridge.get("/fingerprint/attendance?since=last").json()["count"] == 1
+
+
+def test_explicit_cursor_does_not_move_the_persisted_one(bridge, simulator):
+    scan(simulator, "1", "2")
+    synced = bridge.get("/fingerprint/attendance?since=start").json()
+    scan(simulator, "3")
+
+    # Another client pages from its own cursor
+    own = bridge.get(f"/fingerprint/attendance?since={synced['cursor']}").json()
+    assert own["count"] == 1
+
+    assert bridge.get("/fingerprint/attendance?since=last").json()["count"] == 1
+
+
+def test_clear_then_refill_to_the_same_count_is_not_skipped(bridge, simulator):
+    scan(simulator, "1", "2")
+    bridge.get("/fingerprint/attendance?since=start")
+    assert bridge.post("/fingerprint/clear-attendance").json()["success"]
+
+    time.sleep(1.1)  # device timestamps have one-second resolution
+    scan(simulator, "4", "5")
+    assert bridge.get("/fingerprint/attendance?since=last").json()["count"] == 2
@@ -0,0 +1,78 @@
+"""Reconnect backoff and the connection supervisor against the ZK simulator"""
+
+from connection_supervisor import Backoff, ConnectionSupervisor
+from device_registry import DeviceRegistry
+import asyncio
+import time
+
+
+async def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+
+def drop_connections(simulator, outage: float = 0.0):
+    asyncio.run_coroutine_threadsafe(simulator.disconnect_all(outage), simulator.loop)
+
+
+def test_backoff_doubles_up_to_the_cap():
+    backoff = Backoff(initial=1, maximum=8, jitter=0)
+    assert [backoff.next_delay() for _ in range(5)] == [1, 2, 4, 8, 8]
+    backoff.reset()
+    assert backoff.next_delay() == 1
+
+
+def test_jitter_only_shortens_the_delay():
+    backoff = Backoff(initial=4, maximum=4, jitter=0.5)
+    assert all(2 <= backoff.next_delay() <= 4 for _ in range(50))
+
+
+def test_lost_capture_session_is_reconnected_and_capture_resumed(service, simulator):
+    supervisor = ConnectionSupervisor(service, probe_interval=60, initial_delay=0.01, max_delay=0.05)
+    service.supervisor = supervisor
+
+    async def scenario():
+        task = asyncio.create_task(supervisor.run())
+        await service.start_live_capture()
+        await asyncio.sleep(0.2)
+
+        drop_connections(simulator)
+        await wait_for(lambda: supervisor.reconnect_count == 1 and service.is_capturing)
+
+        before = service.device_counts["attendance_count"]
+        await asyncio.sleep(0.2)
+        simulator.scan("1")
+        await wait_for(lambda: service.device_counts["attendance_count"] == before + 1)
+        task.cancel()
+        service.stop_live_capture()
+        await service.run(service.is_connected)  # lets the actor end the capture session
+
+    asyncio.run(scenario())
+    stats = supervisor.get_stats()
+    assert stats["state"] == "connected"
+    assert stats["last_recovery_seconds"] is not None
+
+
+def test_reader_down_at_startup_is_registered_once_it_comes_up(simulator, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = DeviceRegistry()
+    reader = {"id": "door", "ip": "127.0.0.1", "port": simulator.port, "ommit_ping": True,
+              "reconnect_initial_delay": 0.05, "reconnect_max_delay": 0.1}
+
+    async def scenario():
+        drop_connections(simulator, outage=0.5)
+        await asyncio.sleep(0.1)
+
+        await registry.start([reader])
+        assert "door" in registry.pending
+        assert registry.get("door") is None
+
+        await wait_for(lambda: registry.get("door") is not None)
+        assert registry.pending == {}
+        assert registry.errors == {}
+        await wait_for(lambda: registry.get("door").is_capturing)
+        await registry.stop()
+
+    asyncio.run(scenario())
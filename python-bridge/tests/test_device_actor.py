@@ -0,0 +1,95 @@
+"""Device actor scheduling and live capture interplay"""
+
+from device_actor import DeviceActor, PRIORITY_DOOR
+import asyncio
+import threading
+import time
+
+
+class FakeCapture:
+    """Idle work that keeps "capturing" while active, counting suspensions"""
+
+    def __init__(self):
+        self.active = True
+        self.suspended = 0
+
+    def idle(self) -> bool:
+        if not self.active:
+            return False
+        time.sleep(0.005)
+        return True
+
+    def suspend(self):
+        self.suspended += 1
+
+
+def test_background_commands_wait_for_a_break_in_idle_work():
+    capture = FakeCapture()
+    actor = DeviceActor("test", idle=capture.idle, before_command=capture.suspend)
+    actor.start()
+    try:
+        held = actor.submit(lambda: "refreshed", background=True)
+        time.sleep(0.05)
+        assert not held.done()
+        assert capture.suspended == 0
+        assert actor.get_stats()["deferred"] == 1
+
+        # A foreground command suspends idle work, the held command rides along
+        assert actor.submit(lambda: "door", priority=PRIORITY_DOOR).result(1) == "door"
+        assert held.result(1) == "refreshed"
+
+        held = actor.submit(lambda: "later", background=True)
+        time.sleep(0.02)
+        capture.active = False
+        assert held.result(1) == "later"
+    finally:
+        actor.stop()
+
+
+def test_stopping_cancels_held_background_commands():
+    capture = FakeCapture()
+    actor = DeviceActor("test", idle=capture.idle, before_command=capture.suspend)
+    actor.start()
+    held = actor.submit(lambda: None, background=True)
+    time.sleep(0.02)
+    actor.stop()
+    assert held.cancelled()
+
+
+def test_periodic_refreshes_do_not_interrupt_live_capture(service, simulator):
+    suspensions = []
+    suspend = service._suspend_capture
+
+    def record_suspend():
+        if service._capture_records is not None:
+            suspensions.append(threading.current_thread().name)
+        suspend()
+    service.actor.before_command = record_suspend
+
+    async def scenario():
+        await service.start_live_capture()
+        await asyncio.sleep(0.2)
+        before = service.device_counts["attendance_count"]
+        simulator.scan("1")
+        await asyncio.sleep(0.3)
+
+        refresher = asyncio.create_task(service.run_snapshot_refresher(interval=60))
+        backfill = asyncio.create_task(service.run(service.backfill_gaps, background=True))
+        await asyncio.sleep(0.3)
+        snapshot = service.get_snapshot()
+        assert snapshot["attendance_count"] == before + 1
+        assert not backfill.done()
+        assert suspensions == []
+
+        # A queued command is picked up within one capture poll
+        started = time.monotonic()
+        await service.run(service.is_connected)
+        assert time.monotonic() - started < service.capture_poll_interval + 0.2
+        await backfill
+        assert len(suspensions) == 1
+
+        refresher.cancel()
+        service.stop_live_capture()
+        await service.run(service.is_connected)  # lets the actor end the capture session
+
+    asyncio.run(scenario())
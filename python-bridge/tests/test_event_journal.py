@@ -0,0 +1,101 @@
+"""Event journal: sequence recovery after a restart or a crash mid-write"""
+
+from event_journal import EventJournal
+import json
+
+
+def open_journal(path, **kwargs):
+    return EventJournal(str(path), commit_interval=0, **kwargs)
+
+
+def append(journal, count):
+    for index in range(count):
+        journal.append({"type": "finger_scanned", "user_id": str(index)})
+
+
+def test_reopen_continues_the_sequence(tmp_path):
+    journal = open_journal(tmp_path)
+    append(journal, 5)
+    journal.close()
+
+    journal = open_journal(tmp_path)
+    assert journal.last_seq == 5
+    assert journal.append({"type": "heartbeat"}).message["seq"] == 6
+    journal.close()
+
+
+def test_torn_final_line_is_truncated(tmp_path):
+    journal = open_journal(tmp_path)
+    append(journal, 3)
+    journal.close()
+
+    # Crash halfway through writing event 4
+    segment = next(tmp_path.glob("*"))
+    with open(segment, "ab") as f:
+        f.write(b'{"seq":4,"type":"finger_sc')
+
+    journal = open_journal(tmp_path)
+    assert journal.last_seq == 3
+    assert segment.read_bytes().endswith(b"\n")
+
+    journal.append({"type": "finger_scanned", "user_id": "again"})
+    journal.close()
+
+    journal = open_journal(tmp_path)
+    lines = [json.loads(line) for line in journal.read_range(0, journal.last_seq)]
+    assert [line["seq"] for line in lines] == [1, 2, 3, 4]
+    assert lines[-1]["user_id"] == "again"
+    journal.close()
+
+
+def test_empty_journal_starts_at_zero(tmp_path):
+    journal = open_journal(tmp_path)
+    assert journal.last_seq == 0
+    assert journal.first_seq() is None
+    journal.close()
+
+
+def test_rotation_and_retention(tmp_path):
+    journal = open_journal(tmp_path, segment_max_bytes=200, max_segments=2)
+    for _ in range(10):
+        append(journal, 1)
+        journal.wait_durable(journal.last_seq, timeout=5)
+    journal.close()
+
+    journal = open_journal(tmp_path, segment_max_bytes=200, max_segments=2)
+    assert journal.last_seq == 10
+    assert len(journal.segments) == 2
+    first = journal.first_seq()
+    seqs = [json.loads(line)["seq"] for line in journal.read_range(0, journal.last_seq)]
+    assert seqs == list(range(first, 11))
+    journal.close()
+
+
+def test_segment_that_cannot_be_deleted_stays_indexed(tmp_path, monkeypatch):
+    journal = open_journal(tmp_path, segment_max_bytes=200, max_segments=2)
+    unlink = type(tmp_path).unlink
+    failing = {"count": 1}
+
+    def flaky_unlink(path, *args, **kwargs):
+        if failing["count"]:
+            failing["count"] -= 1
+            raise PermissionError("segment in use")
+        return unlink(path, *args, **kwargs)
+    monkeypatch.setattr(type(tmp_path), "unlink", flaky_unlink)
+
+    def fill_segment():
+        first = journal.segments[-1] if journal.segments else None
+        while not journal.segments or journal.segments[-1] == first:
+            append(journal, 1)
+            journal.wait_durable(journal.last_seq, timeout=5)
+
+    for _ in range(3):
+        fill_segment()
+    # The failed delete keeps the oldest segment on disk and in the index
+    assert len(journal.segments) == 3
+    assert all(journal._segment_path(first).exists() for first in journal.segments)
+
+    fill_segment()
+    assert len(journal.segments) == 2
+    assert sorted(tmp_path.iterdir()) == [journal._segment_path(first) for first in journal.segments]
+    journal.close()
@@ -0,0 +1,36 @@
+"""Instrumented thread pools: counters and the recent utilization window"""
+
+from executors import InstrumentedExecutor
+import executors
+import time
+
+
+def test_reading_stats_changes_nothing():
+    pool = InstrumentedExecutor("test", max_workers=1)
+    try:
+        pool.submit(time.sleep, 0.05).result()
+        first = pool.get_stats()
+        time.sleep(0.01)
+        second = pool.get_stats()
+        assert first["completed"] == second["completed"] == 1
+        assert second["recent_utilization"] > 0
+        assert second["recent_utilization"] <= first["recent_utilization"]
+    finally:
+        pool.shutdown()
+
+
+def test_recent_window_rolls_as_tasks_finish(monkeypatch):
+    monkeypatch.setattr(executors, "RECENT_WINDOW_SECONDS", 0.05)
+    pool = InstrumentedExecutor("test", max_workers=2)
+    try:
+        pool.submit(time.sleep, 0.1).result()
+        busy = pool.get_stats()["recent_utilization"]
+
+        # Idle windows roll in once tasks run again, and the busy one ages out
+        time.sleep(0.06)
+        pool.submit(lambda: None).result()
+        time.sleep(0.06)
+        pool.submit(lambda: None).result()
+        assert pool.get_stats()["recent_utilization"] < busy / 2
+    finally:
+        pool.shutdown()
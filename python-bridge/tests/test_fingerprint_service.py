@@ -0,0 +1,70 @@
+"""FingerprintService against the ZK simulator"""
+
+from fingerprint_service import FingerprintService
+import pytest
+
+
+def new_service(simulator):
+    return FingerprintService(ip="127.0.0.1", port=simulator.port, ommit_ping=True, debounce_seconds=0)
+
+
+def recording(service, calls):
+    """Wrap the connection so device commands are recorded in order"""
+    conn = service.conn
+    for name in ("disable_device", "enable_device", "get_users"):
+        original = getattr(conn, name)
+
+        def wrapper(*args, _name=name, _original=original, **kwargs):
+            calls.append(_name)
+            return _original(*args, **kwargs)
+        setattr(conn, name, wrapper)
+
+
+def test_connect_loads_the_directory_outside_the_disable_window(simulator, monkeypatch):
+    service = new_service(simulator)
+    calls = []
+    connect = service.zk.connect
+
+    def connect_and_record():
+        conn = connect()
+        service.conn = conn
+        recording(service, calls)
+        return conn
+    monkeypatch.setattr(service.zk, "connect", connect_and_record)
+
+    try:
+        assert service.connect() is True
+        assert calls == ["disable_device", "enable_device", "get_users"]
+        assert service.user_directory.is_loaded
+    finally:
+        service.disconnect()
+        service.actor.stop()
+
+
+def test_failed_setup_re_enables_the_reader_and_allows_a_retry(simulator, monkeypatch):
+    service = new_service(simulator)
+    calls = []
+    connect = service.zk.connect
+
+    def connect_and_record():
+        conn = connect()
+        service.conn = conn
+        recording(service, calls)
+        return conn
+    monkeypatch.setattr(service.zk, "connect", connect_and_record)
+
+    def fail():
+        raise RuntimeError("read failed")
+    monkeypatch.setattr(service, "read_device_counts", fail)
+
+    try:
+        with pytest.raises(RuntimeError):
+            service.connect()
+        assert calls == ["disable_device", "enable_device"]
+        assert service.conn is None
+
+        monkeypatch.undo()
+        assert service.connect() is True
+    finally:
+        service.disconnect()
+        service.actor.stop()
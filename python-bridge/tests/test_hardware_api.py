@@ -0,0 +1,66 @@
+"""Fingerprint facade: per-priority timeouts, busy rejection and connect priority"""
+
+from device_actor import PRIORITY_ADMIN, PRIORITY_DOOR
+from hardware_api import FingerprintAPI, HardwareBusy, HardwareTimeout, DEFAULT_TIMEOUTS
+import asyncio
+import pytest
+import threading
+
+
+def blocker(service):
+    """Occupy the actor until the returned event is set"""
+    release = threading.Event()
+    service.actor.submit(release.wait, 5, priority=PRIORITY_DOOR)
+    return release
+
+
+def test_timeouts_are_configured_by_priority_name(service):
+    api = FingerprintAPI(service, timeouts={"door": 3})
+    assert api.timeouts[PRIORITY_DOOR] == 3
+    assert api.timeouts[PRIORITY_ADMIN] == DEFAULT_TIMEOUTS[PRIORITY_ADMIN]
+
+
+def test_timed_out_queued_call_is_cancelled(service):
+    api = FingerprintAPI(service)
+    ran = []
+    release = blocker(service)
+
+    async def scenario():
+        with pytest.raises(HardwareTimeout):
+            await api.call(lambda: ran.append(True), timeout=0.05)
+        release.set()
+        await service.run(service.is_connected)
+
+    asyncio.run(scenario())
+    assert ran == []
+    assert api.timed_out == 1
+    assert api.last_timeout["timeout"] == 0.05
+
+
+def test_full_queue_rejects_new_calls(service):
+    api = FingerprintAPI(service, max_pending=1)
+    release = blocker(service)
+    queued = service.actor.submit(service.is_connected)
+    try:
+        with pytest.raises(HardwareBusy):
+            api.call_blocking(service.is_connected)
+        assert api.rejected == 1
+    finally:
+        release.set()
+    assert queued.result(5) is True
+
+
+def test_connect_runs_at_admin_priority(service, monkeypatch):
+    api = FingerprintAPI(service)
+    priorities = []
+    run = service.run
+
+    async def recording_run(fn, *args, priority, **kwargs):
+        priorities.append(priority)
+        return await run(fn, *args, priority=priority, **kwargs)
+    monkeypatch.setattr(service, "run", recording_run)
+    monkeypatch.setattr(service, "reconnect", lambda: None)  # skips the settle delay
+
+    assert asyncio.run(api.connect()) is True  # already connected
+    asyncio.run(api.reconnect())
+    assert priorities == [PRIORITY_ADMIN, PRIORITY_ADMIN]
@@ -0,0 +1,169 @@
+"""Pub/sub hub: routing, per-client send queues and slow-consumer policies"""
+
+from pubsub_hub import Channel, RoomChannel, POLICY_DISCONNECT, SLOW_CONSUMER_CLOSE_CODE
+import asyncio
+import json
+
+
+class FakeSocket:
+    """Records what was sent; sends wait while the gate is closed"""
+    client = None
+
+    def __init__(self):
+        self.messages = []
+        self.closed = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await self.gate.wait()
+        self.messages.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.closed = code
+
+    def values(self):
+        return [message.get("n") for message in self.messages]
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_messages_reach_only_matching_subscriptions():
+    async def scenario():
+        channel = Channel("test")
+        everything, front_scans = FakeSocket(), FakeSocket()
+        await channel.connect(everything)
+        await channel.connect(front_scans)
+        channel.subscribe(front_scans, ["scans"], device_id="front")
+
+        channel.publish({"type": "finger_scanned", "device_id": "front", "n": 1})
+        channel.publish({"type": "finger_scanned", "device_id": "back", "n": 2})
+        channel.publish({"type": "sync_progress", "device_id": "front", "n": 3})
+        await settle()
+
+        assert everything.values() == [1, 2, 3]
+        assert front_scans.values() == [1]
+
+    asyncio.run(scenario())
+
+
+def test_drop_oldest_keeps_the_newest_messages():
+    async def scenario():
+        channel = Channel("test", send_queue_size=3)
+        socket = FakeSocket()
+        await channel.connect(socket)
+        socket.gate.clear()
+
+        channel.publish({"type": "tick", "n": 0})
+        await settle()  # the writer is now stuck sending message 0
+        for n in range(1, 6):
+            channel.publish({"type": "tick", "n": n})
+        socket.gate.set()
+        await settle()
+
+        assert socket.values() == [0, 3, 4, 5]
+        assert channel.clients[socket].dropped == 2
+        assert channel.dropped == 2
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_policy_closes_a_slow_client():
+    async def scenario():
+        channel = Channel("test", send_queue_size=2, slow_consumer_policy=POLICY_DISCONNECT)
+        slow, fast = FakeSocket(), FakeSocket()
+        await channel.connect(slow)
+        await channel.connect(fast)
+        slow.gate.clear()
+
+        for n in range(4):
+            channel.publish({"type": "tick", "n": n})
+            await settle()
+
+        assert slow not in channel.clients
+        assert slow.closed == SLOW_CONSUMER_CLOSE_CODE
+        assert channel.slow_disconnects == 1
+        assert fast.values() == [0, 1, 2, 3]
+
+    asyncio.run(scenario())
+
+
+def test_stalled_send_is_dropped_on_heartbeat():
+    async def scenario():
+        channel = Channel("test", stall_timeout=0.01)
+        stuck, healthy = FakeSocket(), FakeSocket()
+        await channel.connect(stuck)
+        await channel.connect(healthy)
+        stuck.gate.clear()
+        channel.publish({"type": "tick", "n": 0})
+        await asyncio.sleep(0.03)
+
+        channel.heartbeat()
+        await settle()
+        assert stuck not in channel.clients
+        assert channel.stalled_disconnects == 1
+        assert [message["type"] for message in healthy.messages] == ["tick", "heartbeat"]
+
+    asyncio.run(scenario())
+
+
+def test_room_messages_skip_the_sender_and_other_rooms():
+    async def scenario():
+        channel = RoomChannel("mirror")
+        sender, partner, elsewhere = FakeSocket(), FakeSocket(), FakeSocket()
+        await channel.connect(sender, room="desk-1")
+        await channel.connect(partner, room="desk-1")
+        await channel.connect(elsewhere, room="desk-2")
+
+        frame = Channel("events").publish({"type": "member_shown", "n": 1})
+        assert channel.publish_to_room(frame, "desk-1", exclude=sender) == 1
+        await settle()
+
+        assert partner.values() == [1]
+        assert sender.messages == elsewhere.messages == []
+        channel.disconnect(partner)
+        channel.disconnect(sender)
+        assert channel.get_client_stats()["rooms"] == {"desk-2": 1}
+
+    asyncio.run(scenario())
+
+
+def test_forwarded_event_types_reach_the_other_channel():
+    async def scenario():
+        events, mirror = Channel("events"), Channel("mirror")
+        events.forward(mirror, ["finger_scanned"])
+        socket = FakeSocket()
+        await mirror.connect(socket)
+
+        events.publish({"type": "finger_scanned", "n": 1})
+        events.publish({"type": "sync_progress", "n": 2})
+        await settle()
+        assert socket.values() == [1]
+
+    asyncio.run(scenario())
+
+
+def test_direct_reply_waits_for_the_send_in_progress():
+    async def scenario():
+        channel = Channel("test")
+        socket = FakeSocket()
+        await channel.connect(socket)
+        client = channel.clients[socket]
+
+        await client.send_lock.acquire()  # a queued send or replay in progress
+        reply = asyncio.create_task(channel.send_to(socket, {"type": "response", "request_id": "r1"}))
+        await asyncio.sleep(0.01)
+        assert socket.messages == []
+
+        client.send_lock.release()
+        await reply
+        assert socket.messages == [{"type": "response", "request_id": "r1"}]
+        channel.disconnect(socket)
+
+    asyncio.run(scenario())
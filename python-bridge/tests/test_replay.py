@@ -0,0 +1,139 @@
+"""/ws/events replay: resuming clients get every missed event once, in order"""
+
+from event_journal import EventJournal
+from websocket_manager import WebSocketManager
+import asyncio
+import json
+import pytest
+
+
+class FakeSocket:
+    """Records what was sent; each send takes send_delay seconds"""
+    client = None
+
+    def __init__(self, send_delay: float = 0):
+        self.send_delay = send_delay
+        self.messages = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.messages.append(json.loads(text))
+
+    def seqs(self):
+        return [message["seq"] for message in self.messages if "seq" in message]
+
+    def types(self):
+        return [message["type"] for message in self.messages]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    journal = EventJournal(str(tmp_path), commit_interval=0)
+    manager = WebSocketManager(journal=journal)
+    yield manager
+    journal.close()
+
+
+async def broadcast(manager, count, event_type="finger_scanned"):
+    for _ in range(count):
+        await manager.broadcast({"type": event_type, "user_id": "7"})
+
+
+async def settle(socket, manager):
+    """Wait until the writer has sent everything queued"""
+    for _ in range(200):
+        await asyncio.sleep(0.01)
+        client = manager.clients.get(socket)
+        if not client or (client.queue.empty() and client.in_flight is None and not client.send_lock.locked()):
+            return
+
+
+def test_resume_replays_then_goes_live(manager):
+    async def run():
+        await broadcast(manager, 10)
+        socket = FakeSocket()
+        await manager.connect(socket, resuming=True)
+        await manager.replay(socket, 4)
+        await broadcast(manager, 2)
+        await settle(socket, manager)
+        return socket
+
+    socket = asyncio.run(run())
+    assert socket.seqs() == list(range(5, 13))
+    assert socket.types()[6] == "replay_complete"
+    assert all(message.get("replayed") for message in socket.messages[:6])
+    assert not any(message.get("replayed") for message in socket.messages[7:])
+
+
+def test_replay_reads_events_older_than_the_ring_from_the_journal(manager):
+    manager.configure_replay(ring_size=3, batch_size=2)
+
+    async def run():
+        await broadcast(manager, 12)
+        socket = FakeSocket()
+        await manager.connect(socket, resuming=True)
+        await manager.replay(socket, 0)
+        await settle(socket, manager)
+        return socket
+
+    socket = asyncio.run(run())
+    assert socket.seqs() == list(range(1, 13))
+    complete = socket.messages[-1]
+    assert complete["type"] == "replay_complete"
+    assert complete["from_journal"] == 9 and complete["replayed"] == 12
+
+
+def test_events_broadcast_during_replay_follow_it_in_order(manager):
+    manager.configure_replay(ring_size=2, batch_size=1)
+
+    async def run():
+        await broadcast(manager, 8)
+        socket = FakeSocket(send_delay=0.002)
+        await manager.connect(socket, resuming=True)
+        replay = asyncio.create_task(manager.replay(socket, 0))
+        for _ in range(5):
+            await asyncio.sleep(0.003)
+            await broadcast(manager, 1)
+        await replay
+        await settle(socket, manager)
+        return socket
+
+    socket = asyncio.run(run())
+    assert socket.seqs() == list(range(1, 14))
+
+
+def test_replay_while_the_writer_is_mid_send(manager):
+    async def run():
+        socket = FakeSocket(send_delay=0.02)
+        await manager.connect(socket)
+        await broadcast(manager, 4)
+        await asyncio.sleep(0.03)  # seq 1 sent, seq 2 in flight
+        replay = asyncio.create_task(manager.replay(socket, 2))
+        for _ in range(3):
+            await asyncio.sleep(0.01)
+            await broadcast(manager, 1)
+        await replay
+        await settle(socket, manager)
+        return socket
+
+    socket = asyncio.run(run())
+    assert socket.seqs() == list(range(1, 8))
+
+
+def test_replay_only_sends_subscribed_topics(manager):
+    async def run():
+        await broadcast(manager, 2)
+        await broadcast(manager, 2, event_type="sync_progress")
+        socket = FakeSocket()
+        await manager.connect(socket, resuming=True)
+        manager.subscribe(socket, ["sync"])
+        await manager.replay(socket, 0)
+        await settle(socket, manager)
+        return socket
+
+    socket = asyncio.run(run())
+    assert socket.seqs() == [3, 4]
@@ -0,0 +1,49 @@
+"""Bulk user sync and delete against the ZK simulator"""
+
+import asyncio
+
+
+def entry(user_id, fingers=1):
+    return {
+        "user_id": str(user_id),
+        "name": f"Synced {user_id}",
+        "templates": [{"fid": fid, "template": (bytes([user_id, fid]) * 256).hex()} for fid in range(fingers)]
+    }
+
+
+def test_sync_uploads_each_batch_with_one_buffered_write(service, simulator):
+    entries = [entry(user_id, fingers=2) for user_id in range(10, 15)] + [entry(20, fingers=0)]
+
+    result = asyncio.run(service.sync_users(entries, batch_size=3))
+
+    assert result["success"] is True
+    assert result["synced"] == 6
+    assert simulator.stats["template_uploads"] == 2
+    assert simulator.stats["refreshes"] == 1
+    device = simulator.device
+    assert device.users[12].name == "Synced 12"
+    assert device.templates[(14, 1)] == bytes([14, 1]) * 256
+    assert 20 in device.users
+    assert service.user_directory.get_by_uid(13) is not None
+
+
+def test_malformed_entries_fail_on_their_own(bridge):
+    response = bridge.post("/fingerprint/users/sync", json={"users": ["x", entry(30), {"user_id": "31", "templates": [7]}]})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["synced"] == 1
+    failed = [r for r in result["results"] if not r["success"]]
+    assert [r["user_id"] for r in failed] == [None, "31"]
+    assert "object" in failed[0]["error"]
+
+
+def test_deleting_an_unknown_uid_reports_not_found(service, simulator):
+    result = asyncio.run(service.delete_users([2, 99, 2]))
+
+    assert result["deleted"] == 1
+    assert result["results"][0] == {"user_id": 2, "success": True}
+    assert result["results"][1] == {"user_id": 99, "success": False, "error": "not found"}
+    assert result["results"][2]["success"] is False
+    assert 2 not in simulator.device.users
+    assert service.user_directory.get_by_uid(2) is None
@@ -0,0 +1,28 @@
+"""User directory endpoints"""
+
+
+def test_users_are_paged_from_the_directory(bridge):
+    page = bridge.get("/fingerprint/users?offset=1&limit=2").json()
+    assert page["total"] == 5
+    assert [user["uid"] for user in page["users"]] == [2, 3]
+
+
+def test_negative_offset_and_limit_are_rejected(bridge):
+    assert bridge.get("/fingerprint/users?offset=-3").status_code == 422
+    assert bridge.get("/fingerprint/users?limit=-1").status_code == 422
+    assert bridge.get("/fingerprint/users?limit=0").status_code == 422
+
+
+def test_get_users_command_rejects_a_negative_offset(bridge):
+    with bridge.websocket_connect("/ws/events") as ws:
+        ws.send_json({"action": "get_users", "request_id": "r1", "payload": {"offset": -3}})
+        reply = receive_reply(ws, "r1")
+    assert reply["success"] is False
+    assert "offset" in reply["error"]
+
+
+def receive_reply(ws, request_id):
+    while True:
+        message = ws.receive_json()
+        if message.get("type") == "response" and message.get("request_id") == request_id:
+            return message["data"]
@@ -0,0 +1,153 @@
+"""
+User Directory - Bridge-side index of the device user table
+Serves user lookups, name search and pagination from memory instead of
+downloading the user table from the device on every request
+"""
+
+from zk.user import User
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _user_fields(user: User) -> Tuple:
+    """Fields compared when reconciling against the device"""
+    return (user.user_id, user.name, user.privilege, user.password, user.group_id, user.card)
+
+
+class UserDirectory:
+    def __init__(self):
+        """Initialize an empty user directory"""
+        self._by_uid: Dict[int, User] = {}
+        self._by_user_id: Dict[str, User] = {}
+        self._uids: List[int] = []  # sorted, for pagination
+        self._names: List[Tuple[str, int]] = []  # sorted (lowercase name, uid), for prefix search
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[datetime] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the directory has been loaded from the device"""
+        return self.loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._by_uid)
+
+    # ---------- updates ----------
+
+    def _insert(self, user: User):
+        self._by_uid[user.uid] = user
+        self._by_user_id[str(user.user_id)] = user
+        insort(self._uids, user.uid)
+        insort(self._names, (user.name.lower(), user.uid))
+
+    def _discard(self, user: User):
+        del self._by_uid[user.uid]
+        if self._by_user_id.get(str(user.user_id)) is user:
+            del self._by_user_id[str(user.user_id)]
+        self._uids.pop(bisect_left(self._uids, user.uid))
+        self._names.pop(bisect_left(self._names, (user.name.lower(), user.uid)))
+
+    def upsert(self, user: User):
+        """Add a user or replace the entry with the same uid"""
+        with self._lock:
+            existing = self._by_uid.get(user.uid)
+            if existing is not None:
+                self._discard(existing)
+            self._insert(user)
+
+    def remove(self, uid: Optional[int] = None, user_id: Optional[str] = None) -> bool:
+        """
+        Remove a user by uid or user_id
+
+        Returns:
+            True if a user was removed
+        """
+        with self._lock:
+            if uid is not None:
+                user = self._by_uid.get(uid)
+            else:
+                user = self._by_user_id.get(str(user_id))
+            if user is None:
+                return False
+            self._discard(user)
+            return True
+
+    def reconcile(self, users: List[User]) -> Dict:
+        """
+        Bring the directory in line with a full user table read from the device
+
+        Args:
+            users: Users as returned by conn.get_users()
+
+        Returns:
+            Dict with added/updated/removed counts
+        """
+        device_users = {user.uid: user for user in users}
+        added = updated = removed = 0
+
+        with self._lock:
+            for uid in [uid for uid in self._by_uid if uid not in device_users]:
+                self._discard(self._by_uid[uid])
+                removed += 1
+
+            for uid, user in device_users.items():
+                existing = self._by_uid.get(uid)
+                if existing is None:
+                    self._insert(user)
+                    added += 1
+                elif _user_fields(existing) != _user_fields(user):
+                    self._discard(existing)
+                    self._insert(user)
+                    updated += 1
+
+            self.loaded_at = datetime.now()
+
+        if added or updated or removed:
+            logger.info(f"User directory reconciled: +{added} ~{updated} -{removed} ({len(device_users)} users)")
+        return {"added": added, "updated": updated, "removed": removed, "total": len(device_users)}
+
+    # ---------- queries ----------
+
+    def get(self, user_id: str) -> Optional[User]:
+        """Look up a user by user_id"""
+        return self._by_user_id.get(str(user_id))
+
+    def get_by_uid(self, uid: int) -> Optional[User]:
+        """Look up a user by device uid"""
+        return self._by_uid.get(uid)
+
+    def users(self) -> List[User]:
+        """Get every user (unordered)"""
+        with self._lock:
+            return list(self._by_uid.values())
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[User]]:
+        """
+        Get a page of users ordered by uid
+
+        Returns:
+            Tuple of (total users, users in the page)
+        """
+        with self._lock:
+            end = None if limit is None else offset + limit
+            return len(self._uids), [self._by_uid[uid] for uid in self._uids[offset:end]]
+
+    def search(self, prefix: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[User]]:
+        """
+        Find users whose name starts with prefix (case-insensitive)
+
+        Returns:
+            Tuple of (total matches, users in the page) ordered by name
+        """
+        prefix = prefix.lower()
+        with self._lock:
+            lo = bisect_left(self._names, (prefix,))
+            hi = bisect_left(self._names, (prefix + "\uffff",))
+            start = lo + offset
+            end = hi if limit is None else min(hi, start + limit)
+            return hi - lo, [self._by_uid[uid] for _, uid in self._names[start:end]]
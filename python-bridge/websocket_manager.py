@@ -1,74 +1,276 @@
 """
-WebSocket Manager - Manages WebSocket connections and broadcasts events
+WebSocket Manager - The /ws/events channel: journaled, replayable hardware events
+Delivery (per-client send queues, topic subscriptions, heartbeats) comes
+from the pub/sub hub (see pubsub_hub.py); this channel adds the event
+journal, sequence numbers and replay for reconnecting clients.
 """
 
 from fastapi import WebSocket
-from typing import List, Dict
-import json
+from pubsub_hub import Channel, ClientQueue, ALL_TOPICS, route_keys
+from event_codec import Frame
+import event_codec
+import executors
+from collections import deque
+from typing import List, Dict, Tuple
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
-class WebSocketManager:
-    def __init__(self):
-        """Initialize WebSocket manager"""
-        self.active_connections: List[WebSocket] = []
+class WebSocketManager(Channel):
+    def __init__(self, journal=None, name: str = "events"):
+        """
+        Initialize WebSocket manager
+        
+        Args:
+            journal: Optional EventJournal; broadcast events are appended to
+                     it (and get a "seq" number) before they are sent
+            name: Channel name in the hub
+        """
+        super().__init__(name)
+        self.journal = journal
+        
+        # Recent events as (seq, json text, route keys), replayed to reconnecting clients
+        self.ring: deque = deque(maxlen=1000)
+        self.replay_batch_size = 500
+        # Clients still replaying: live events are held here until they catch up
+        self._replaying: Dict[WebSocket, List[Tuple[int, str]]] = {}
+        self.replay_stats = {
+            "replays": 0,
+            "from_ring": 0,
+            "from_journal": 0,
+            "gaps": 0,
+            "last_duration_ms": None,
+            "last_events_per_sec": None
+        }
         logger.info("WebSocket manager initialized")
     
-    async def connect(self, websocket: WebSocket):
-        """Accept new WebSocket connection"""
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"New WebSocket connection. Total active: {len(self.active_connections)}")
+    def configure_replay(self, ring_size: int, batch_size: int):
+        """
+        Size the in-memory replay ring and the journal read batch
+        
+        Args:
+            ring_size: Recent events kept in memory for resuming clients
+            batch_size: Events read from the journal per worker-thread call
+        """
+        self.ring = deque(self.ring, maxlen=ring_size)
+        self.replay_batch_size = batch_size
+    
+    async def connect(self, websocket: WebSocket, resuming: bool = False):
+        """
+        Accept new WebSocket connection and start its writer task
+        
+        Args:
+            websocket: New client
+            resuming: The client will call replay(); live events are held for
+                      it from the start, so none is sent ahead of the replay
+        """
+        if resuming and self.journal:
+            self._replaying[websocket] = []
+        try:
+            await super().connect(websocket)
+        except Exception:
+            self._replaying.pop(websocket, None)
+            raise
     
     def disconnect(self, websocket: WebSocket):
-        """Remove WebSocket connection"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            logger.info(f"WebSocket disconnected. Total active: {len(self.active_connections)}")
+        """Remove WebSocket connection and stop its writer task"""
+        self._replaying.pop(websocket, None)
+        super().disconnect(websocket)
     
     async def broadcast(self, message: Dict):
         """
-        Broadcast message to all connected clients
+        Broadcast message to the clients subscribed to it
+        Only queues the message for each client's writer task; never waits
+        on a client.
         
         Args:
             message: Dictionary to send as JSON
         """
-        if not self.active_connections:
-            logger.warning("No active WebSocket connections to broadcast to")
-            return
-        
-        # Convert message to JSON string
-        json_message = json.dumps(message)
+        # Encoded once; the same text is journaled and sent to every client
+        if self.journal:
+            frame = self.journal.append(message)
+            message = frame.message
+        else:
+            frame = event_codec.encode(message)
+        keys = route_keys(message)
+        if self.journal:
+            self.ring.append((message["seq"], frame.text, keys))
         
-        # Send to all connections
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json_message)
-            except Exception as e:
-                logger.error(f"Error sending to WebSocket: {e}")
-                disconnected.append(connection)
+        if not self.clients:
+            if self.journal:
+                logger.info(f"No active WebSocket connections, event {message['seq']} kept in journal")
+            else:
+                logger.warning("No active WebSocket connections to broadcast to")
         
-        # Remove dead connections
-        for conn in disconnected:
-            self.disconnect(conn)
+        self.publish_frame(frame, keys)
+    
+    def _deliver(self, client: ClientQueue, frame: Frame):
+        pending = self._replaying.get(client.websocket)
+        if pending is not None:
+            pending.append((frame.message["seq"], frame.text))
+        else:
+            self._enqueue(client, frame.text)
+    
+    def _holding(self, client: ClientQueue) -> bool:
+        return client.websocket in self._replaying
     
-    async def send_to(self, websocket: WebSocket, message: Dict):
+    async def replay(self, websocket: WebSocket, resume_from: int):
         """
-        Send message to specific WebSocket connection
+        Send a reconnecting client every event after resume_from, then
+        switch it to live events with no gap and no duplicates
+        
+        Older events come from the journal, recent ones from the in-memory
+        ring; live events broadcast meanwhile are held and sent afterwards.
+        Only events matching the client's subscriptions are sent. Replayed
+        finger_scanned events carry "replayed": true so the door path can
+        tell them from live scans. Ends with a replay_complete message.
         
         Args:
-            websocket: Target WebSocket
-            message: Dictionary to send as JSON
+            websocket: Connected client
+            resume_from: Last sequence number the client has seen
         """
+        if not self.journal:
+            self._replaying.pop(websocket, None)
+            await self.send_to(websocket, {"type": "replay_unavailable",
+                                           "error": "Event journal disabled"})
+            return
+        
+        started = time.perf_counter()
+        pending = self._replaying.setdefault(websocket, [])
+        client = self.clients.get(websocket)
+        everything = not client or (ALL_TOPICS, None, None) in client.subscriptions
+        if client:
+            # Wait out a send in progress; the writer stays paused until the
+            # replay is done, so nothing else is sent on this socket meanwhile
+            await client.send_lock.acquire()
+            # Anything the writer dequeued or still has queued is older than the
+            # replay end point; hold it with the live events so it is not sent
+            # twice or ahead of the replay
+            held, client.in_flight = [client.in_flight], None
+            while not client.queue.empty():
+                held.append(client.queue.get_nowait())
+            for text in held:
+                seq = event_codec.loads(text).get("seq") if text is not None else None
+                if seq is not None:  # heartbeats are not replayed
+                    pending.append((seq, text))
+        last_sent = resume_from
+        from_journal = from_ring = 0
+        
         try:
-            await websocket.send_json(message)
-        except Exception as e:
-            logger.error(f"Error sending to specific WebSocket: {e}")
-            self.disconnect(websocket)
+            if resume_from > self.journal.last_seq:
+                # The client's sequence predates a journal reset; continue live
+                last_sent = self.journal.last_seq
+                await websocket.send_text(event_codec.encode({"type": "replay_reset", "last_seq": last_sent}).text)
+            
+            # Everything after start_seq is held for this client by broadcast
+            start_seq = self.journal.last_seq
+            
+            # Events older than the ring are read from disk in batches; the
+            # ring keeps moving meanwhile, so repeat until it catches up
+            while last_sent < start_seq:
+                ring = list(self.ring)
+                ring_start = ring[0][0] if ring else start_seq + 1
+                if last_sent + 1 >= ring_start:
+                    break
+                
+                until_seq = min(ring_start - 1, start_seq)
+                # Segments only appear once committed; a gap is judged on disk
+                await executors.run_in("background", self.journal.wait_durable, until_seq, 5)
+                first_on_disk = self.journal.first_seq()
+                if first_on_disk is None or first_on_disk > last_sent + 1:
+                    # Retention already dropped some of the missed events
+                    available = min(first_on_disk or ring_start, ring_start)
+                    self.replay_stats["gaps"] += 1
+                    await websocket.send_text(event_codec.encode({"type": "replay_gap", "from_seq": last_sent + 1,
+                                                                  "to_seq": available - 1}).text)
+                    last_sent = available - 1
+                
+                lines = self.journal.read_range(last_sent, until_seq)
+                while True:
+                    batch = await executors.run_in("background", _take, lines, self.replay_batch_size)
+                    if not batch:
+                        break
+                    for line in batch:
+                        if everything or not client.subscriptions.isdisjoint(route_keys(event_codec.loads(line))):
+                            await websocket.send_text(_replayed(line))
+                            from_journal += 1
+                last_sent = until_seq
+            
+            # Then the ring, as long as it continues where the journal stopped
+            for seq, text, keys in list(self.ring):
+                if seq <= last_sent:
+                    continue
+                if seq != last_sent + 1:
+                    break
+                if everything or not client.subscriptions.isdisjoint(keys):
+                    await websocket.send_text(_replayed(text))
+                    from_ring += 1
+                last_sent = seq
+            
+            # Then whatever was broadcast while replaying, in seq order and
+            # without anything the replay already sent
+            while pending:
+                held, pending[:] = sorted(pending), []
+                for seq, text in held:
+                    if seq > last_sent:
+                        await websocket.send_text(text)
+                        last_sent = seq
+        finally:
+            # No await between the last drain and going live
+            self._replaying.pop(websocket, None)
+            if client:
+                client.send_lock.release()
+        
+        duration = time.perf_counter() - started
+        replayed = from_journal + from_ring
+        self.replay_stats["replays"] += 1
+        self.replay_stats["from_ring"] += from_ring
+        self.replay_stats["from_journal"] += from_journal
+        self.replay_stats["last_duration_ms"] = round(duration * 1000, 2)
+        self.replay_stats["last_events_per_sec"] = round(replayed / duration) if duration else None
+        logger.info(f"Replayed {replayed} event(s) after seq {resume_from} "
+                    f"({from_journal} from journal) in {duration * 1000:.1f} ms")
+        
+        # Queued ahead of any live event broadcast from here on
+        if client and websocket in self.clients:
+            self._enqueue(client, event_codec.encode({
+                "type": "replay_complete",
+                "resume_from": resume_from,
+                "last_seq": last_sent,
+                "replayed": replayed,
+                "from_journal": from_journal,
+                "duration_ms": round(duration * 1000, 2)
+            }).text)
     
-    def get_connection_count(self) -> int:
-        """Get number of active connections"""
-        return len(self.active_connections)
+    def get_replay_stats(self) -> Dict:
+        """Ring occupancy and replay throughput"""
+        return {
+            "ring_size": self.ring.maxlen,
+            "ring_events": len(self.ring),
+            "ring_first_seq": self.ring[0][0] if self.ring else None,
+            "replay_batch_size": self.replay_batch_size,
+            "replaying_clients": len(self._replaying),
+            **self.replay_stats
+        }
+
+
+def _replayed(text: str) -> str:
+    """Flag a replayed finger_scanned event (other events are sent as journaled)"""
+    if '"finger_scanned"' not in text:
+        return text
+    message = event_codec.loads(text)
+    if message.get("type") != "finger_scanned":
+        return text
+    return event_codec.encode({**message, "replayed": True}).text
+
+
+def _take(iterator, count: int) -> List:
+    """Next count items of an iterator (runs in a worker thread for journal reads)"""
+    items = []
+    for item in iterator:
+        items.append(item)
+        if len(items) == count:
+            break
+    return items
@@ -0,0 +1,511 @@
+"""
+ZK Simulator - Local stand-in for a ZKTeco fingerprint reader
+Speaks enough of the ZK TCP protocol for pyzk to connect, read device info,
+list and write users, templates and attendance, enroll, and run
+live_capture, so the bridge can be exercised without hardware.
+
+Only the TCP transport is emulated (pyzk uses TCP whenever the port accepts
+connections). Faults are configurable: response latency, dropped
+responses, periodic disconnects followed by an outage.
+
+Usage:
+    python zk_simulator.py --port 4370 --users 200 --scan-rate 2
+    python zk_simulator.py --script scans.txt --latency-ms 20 --loss 0.01
+    python zk_simulator.py --disconnect-every 60 --outage 5
+
+Scan scripts have one "<delay seconds> <user_id> [punch]" per line.
+"""
+
+from zk import const
+from datetime import datetime
+from struct import pack, unpack
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+ACK_TIMEOUT = 5.0  # seconds to wait for pyzk to acknowledge an event
+CMD_PREPARE_BUFFER = 1503
+CMD_SAVE_USERTEMPS = 110
+USER_RECORD_SIZE = 73  # User.repack73()
+
+# Enrollment event results pyzk looks at (first two data bytes)
+ENROLL_FINGER_PLACED = 0x01
+ENROLL_FINGER_READ = 0x64
+ENROLL_OK = 0x00
+
+
+def checksum(packet: bytes) -> int:
+    """ZK packet checksum (same algorithm as zkemsdk / pyzk)"""
+    if len(packet) % 2:
+        packet += b"\x00"
+    total = 0
+    for word in unpack(f"<{len(packet) // 2}H", packet):
+        total += word
+        if total > const.USHRT_MAX:
+            total -= const.USHRT_MAX
+    total = ~total
+    while total < 0:
+        total += const.USHRT_MAX
+    return total
+
+
+def make_packet(command: int, session_id: int, reply_id: int, data: bytes = b"") -> bytes:
+    """Build a TCP-framed ZK packet"""
+    header = pack("<4H", command, 0, session_id, reply_id)
+    header = pack("<4H", command, checksum(header + data), session_id, reply_id)
+    body = header + data
+    return pack("<HHI", const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2, len(body)) + body
+
+
+def encode_time(t: datetime) -> int:
+    """Attendance log time encoding (zkemsdk EncodeTime)"""
+    return (((t.year % 100) * 12 * 31 + ((t.month - 1) * 31) + t.day - 1) * (24 * 60 * 60)
+            + (t.hour * 60 + t.minute) * 60 + t.second)
+
+
+def encode_timehex(t: datetime) -> bytes:
+    """Live event time encoding"""
+    return pack("6B", t.year - 2000, t.month, t.day, t.hour, t.minute, t.second)
+
+
+class SimulatedUser:
+    def __init__(self, uid: int, user_id: str, name: str, privilege: int = 0,
+                 password: str = "", group_id: str = "", card: int = 0):
+        self.uid = uid
+        self.user_id = user_id
+        self.name = name
+        self.privilege = privilege
+        self.password = password
+        self.group_id = group_id
+        self.card = card
+
+    def pack72(self) -> bytes:
+        return pack("<HB8s24sIx7sx24s", self.uid, self.privilege, self.password.encode(),
+                    self.name.encode(), self.card, self.group_id.encode(), self.user_id.encode())
+
+
+def _cstr(raw: bytes) -> str:
+    return raw.split(b"\x00")[0].decode(errors="ignore")
+
+
+class SimulatedDevice:
+    def __init__(self, users: int = 0, fingers_per_user: int = 0, records: int = 0):
+        """
+        Device state shared by every connection
+
+        Args:
+            users: Users to create (uid/user_id 1..users)
+            fingers_per_user: Random templates per user
+            records: Historical attendance records to create
+        """
+        self.users: Dict[int, SimulatedUser] = {}
+        self.templates: Dict[Tuple[int, int], bytes] = {}
+        self.attendance: List[Tuple[int, str, int, datetime, int]] = []  # uid, user_id, status, time, punch
+        self.options = {
+            "~SerialNumber": "SIM0000001",
+            "~Platform": "ZMM220_TFT",
+            "~DeviceName": "ZK Simulator",
+            "~ZKFPVersion": "10",
+            "ZKFaceVersion": "0",
+            "MAC": "00:17:61:00:00:01",
+        }
+        self.firmware = "Ver 6.60 Sim"
+        self.users_cap, self.fingers_cap, self.rec_cap = 3000, 3000, 100000
+
+        for uid in range(1, users + 1):
+            self.users[uid] = SimulatedUser(uid, str(uid), f"Member {uid}")
+            for fid in range(fingers_per_user):
+                self.templates[(uid, fid)] = os.urandom(512)
+
+        now = datetime.now().replace(microsecond=0)
+        for index in range(records):
+            uid = random.randint(1, users) if users else 1
+            self.attendance.append((uid, str(uid), 1, now.replace(second=index % 60), index % 2))
+
+    def find_user(self, user_id: str) -> Optional[SimulatedUser]:
+        for user in self.users.values():
+            if user.user_id == user_id:
+                return user
+        return None
+
+    def free_sizes(self) -> bytes:
+        fields = [0] * 20
+        fields[4] = len(self.users)
+        fields[6] = len(self.templates)
+        fields[8] = len(self.attendance)
+        fields[14] = self.fingers_cap
+        fields[15] = self.users_cap
+        fields[16] = self.rec_cap
+        fields[17] = self.fingers_cap - len(self.templates)
+        fields[18] = self.users_cap - len(self.users)
+        fields[19] = self.rec_cap - len(self.attendance)
+        return pack("20i", *fields) + pack("3i", 0, 0, 0)
+
+    def user_table(self) -> bytes:
+        data = b"".join(user.pack72() for user in sorted(self.users.values(), key=lambda u: u.uid))
+        return pack("I", len(data)) + data
+
+    def template_table(self) -> bytes:
+        data = b"".join(pack("HHbb", len(template) + 6, uid, fid, 1) + template
+                        for (uid, fid), template in sorted(self.templates.items()))
+        return pack("i", len(data)) + data
+
+    def attendance_table(self) -> bytes:
+        data = b"".join(pack("<H24sB4sB8s", uid, user_id.encode(), status,
+                             pack("<I", encode_time(timestamp)), punch, b"")
+                        for uid, user_id, status, timestamp, punch in self.attendance)
+        return pack("I", len(data)) + data
+
+    def save_user_templates(self, buffer: bytes):
+        """
+        Apply a user/template upload (user records, template table, templates);
+        save_user_template sends one user, a batch upload several
+        """
+        user_size, table_size, _ = unpack("III", buffer[:12])
+        records = buffer[12:12 + user_size]
+        for offset in range(0, len(records), USER_RECORD_SIZE):
+            record = records[offset:offset + USER_RECORD_SIZE]
+            _, uid, privilege, password, name, card, _, group_id, user_id = unpack("<BHB8s24sIB7sx24s", record)
+            self.users[uid] = SimulatedUser(uid, _cstr(user_id), _cstr(name), privilege,
+                                            _cstr(password), _cstr(group_id), card)
+
+        table = buffer[12 + user_size:12 + user_size + table_size]
+        templates = buffer[12 + user_size + table_size:]
+        for offset in range(0, len(table), 8):
+            _, uid, finger, start = unpack("<bHbI", table[offset:offset + 8])
+            size = unpack("H", templates[start:start + 2])[0]
+            self.templates[(uid, finger - 0x10)] = templates[start + 2:start + 2 + size]
+
+
+class SimulatorConnection:
+    def __init__(self, simulator: "ZKSimulator", reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter, session_id: int):
+        self.simulator = simulator
+        self.device = simulator.device
+        self.reader = reader
+        self.writer = writer
+        self.session_id = session_id
+        self.event_flags = 0
+        self.upload = bytearray()
+        self.events: asyncio.Queue = asyncio.Queue()
+        self._ack: Optional[asyncio.Future] = None
+        self._write_lock = asyncio.Lock()
+
+    async def serve(self):
+        sender = asyncio.create_task(self._send_events())
+        try:
+            while True:
+                top = await self.reader.readexactly(8)
+                _, _, length = unpack("<HHI", top)
+                body = await self.reader.readexactly(length)
+                command, _, _, reply_id = unpack("<4H", body[:8])
+                if command == const.CMD_ACK_OK:
+                    # pyzk acknowledging an event we sent
+                    if self._ack and not self._ack.done():
+                        self._ack.set_result(True)
+                    continue
+                if not await self._handle(command, reply_id, body[8:]):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            sender.cancel()
+            self.simulator.connections.discard(self)
+            self.writer.close()
+
+    async def _respond(self, reply_id: int, command: int = const.CMD_ACK_OK, data: bytes = b""):
+        if self.simulator.latency:
+            await asyncio.sleep(self.simulator.latency * random.uniform(0.5, 1.5))
+        if self.simulator.loss and random.random() < self.simulator.loss:
+            self.simulator.stats["dropped_responses"] += 1
+            return
+        async with self._write_lock:
+            self.writer.write(make_packet(command, self.session_id, reply_id, data))
+            await self.writer.drain()
+
+    async def _handle(self, command: int, reply_id: int, data: bytes) -> bool:
+        """Answer one command; returns False when the client disconnects"""
+        device = self.device
+        self.simulator.stats["commands"] += 1
+
+        if command == const.CMD_EXIT:
+            await self._respond(reply_id)
+            return False
+        elif command == const.CMD_GET_VERSION:
+            await self._respond(reply_id, data=device.firmware.encode() + b"\x00")
+        elif command == const.CMD_OPTIONS_RRQ:
+            key = _cstr(data)
+            await self._respond(reply_id, data=f"{key}={device.options.get(key, '')}".encode() + b"\x00")
+        elif command == const.CMD_GET_FREE_SIZES:
+            await self._respond(reply_id, data=device.free_sizes())
+        elif command == CMD_PREPARE_BUFFER:
+            _, table, _, _ = unpack("<bhii", data[:11])
+            payload = {
+                const.CMD_USERTEMP_RRQ: device.user_table,
+                const.CMD_DB_RRQ: device.template_table,
+                const.CMD_ATTLOG_RRQ: device.attendance_table,
+            }.get(table)
+            if payload is None:
+                await self._respond(reply_id, const.CMD_ACK_ERROR)
+            else:
+                await self._respond(reply_id, const.CMD_DATA, payload())
+        elif command == const.CMD_PREPARE_DATA:
+            self.upload = bytearray()
+            await self._respond(reply_id)
+        elif command == const.CMD_DATA:
+            self.upload += data
+            await self._respond(reply_id)
+        elif command == CMD_SAVE_USERTEMPS:
+            device.save_user_templates(bytes(self.upload))
+            self.simulator.stats["template_uploads"] += 1
+            await self._respond(reply_id)
+        elif command == const.CMD_USER_WRQ:
+            uid, privilege, password, name, card, group_id, user_id = unpack("<HB8s24s4sx7sx24s", data[:72])
+            device.users[uid] = SimulatedUser(uid, _cstr(user_id), _cstr(name), privilege,
+                                              _cstr(password), _cstr(group_id), unpack("<I", card)[0])
+            await self._respond(reply_id)
+        elif command == const.CMD_DELETE_USER:
+            uid = unpack("h", data[:2])[0]
+            device.users.pop(uid, None)
+            for key in [key for key in device.templates if key[0] == uid]:
+                del device.templates[key]
+            await self._respond(reply_id)
+        elif command == const.CMD_CLEAR_ATTLOG:
+            device.attendance.clear()
+            await self._respond(reply_id)
+        elif command == const.CMD_REG_EVENT:
+            self.event_flags = unpack("I", data[:4])[0]
+            await self._respond(reply_id)
+        elif command == const.CMD_REFRESHDATA:
+            self.simulator.stats["refreshes"] += 1
+            await self._respond(reply_id)
+        elif command == const.CMD_STARTENROLL:
+            user_id, fid, _ = unpack("<24sbb", data[:26])
+            await self._respond(reply_id)
+            self._enroll(_cstr(user_id), fid)
+        elif command in (const.CMD_CONNECT, const.CMD_AUTH, const.CMD_ENABLEDEVICE, const.CMD_DISABLEDEVICE,
+                         const.CMD_FREE_DATA, const.CMD_TESTVOICE,
+                         const.CMD_CANCELCAPTURE, const.CMD_STARTVERIFY, const.CMD_OPTIONS_WRQ):
+            await self._respond(reply_id)
+        else:
+            await self._respond(reply_id, const.CMD_ACK_UNKNOWN)
+        return True
+
+    def _enroll(self, user_id: str, fid: int):
+        """Queue the event sequence of three good finger presses"""
+        delay = self.simulator.enroll_press_delay
+        for _ in range(3):
+            self.events.put_nowait((delay, pack("<H", ENROLL_FINGER_PLACED) + b"\x00" * 6))
+            self.events.put_nowait((0, pack("<H", ENROLL_FINGER_READ) + b"\x00" * 6))
+        self.events.put_nowait((0, pack("<H", ENROLL_OK) + b"\x00" * 6))
+
+        user = self.device.find_user(user_id)
+        if user:
+            self.device.templates[(user.uid, fid)] = os.urandom(512)
+
+    def push_scan(self, user_id: str, status: int, punch: int, timestamp: datetime):
+        """Deliver a scan if the client registered for attendance events"""
+        if self.event_flags & const.EF_ATTLOG:
+            data = pack("<24sBB6s20s", user_id.encode(), status, punch, encode_timehex(timestamp), b"")
+            self.events.put_nowait((0, data))
+
+    async def _send_events(self):
+        """Send queued events one at a time, each after pyzk acknowledged the previous"""
+        while True:
+            delay, data = await self.events.get()
+            if delay:
+                await asyncio.sleep(delay)
+            self._ack = asyncio.get_running_loop().create_future()
+            async with self._write_lock:
+                self.writer.write(make_packet(const.CMD_REG_EVENT, self.session_id, 0, data))
+                await self.writer.drain()
+            self.simulator.stats["events"] += 1
+            try:
+                await asyncio.wait_for(self._ack, ACK_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.simulator.stats["unacked_events"] += 1
+
+
+class ZKSimulator:
+    def __init__(self, host: str = "127.0.0.1", port: int = 4370, device: Optional[SimulatedDevice] = None,
+                 latency: float = 0.0, loss: float = 0.0, enroll_press_delay: float = 0.3):
+        """
+        Initialize simulator
+
+        Args:
+            host: Listen address
+            port: Listen port (0 picks a free one, see .port after start)
+            device: Device state (an empty device by default)
+            latency: Mean response delay in seconds (uniformly 0.5x-1.5x)
+            loss: Probability of dropping a command response
+            enroll_press_delay: Seconds between simulated enrollment presses
+        """
+        self.host = host
+        self.port = port
+        self.device = device or SimulatedDevice()
+        self.latency = latency
+        self.loss = loss
+        self.enroll_press_delay = enroll_press_delay
+
+        self.connections = set()
+        self.stats = {"connections": 0, "commands": 0, "events": 0, "scans": 0,
+                      "dropped_responses": 0, "unacked_events": 0, "disconnects": 0,
+                      "template_uploads": 0, "refreshes": 0}
+        self._sessions = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- server ----------
+
+    async def listen(self):
+        """Start accepting connections"""
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"ZK simulator listening on {self.host}:{self.port}")
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = SimulatorConnection(self, reader, writer, next(self._sessions) & 0xFFFF)
+        self.connections.add(connection)
+        self.stats["connections"] += 1
+        await connection.serve()
+
+    async def close_server(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start(self):
+        """Run the simulator on a background thread (for in-process tests)"""
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.listen())
+            ready.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="zk-simulator", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop a simulator started with start()"""
+        if self.loop and self._thread:
+            asyncio.run_coroutine_threadsafe(self.close_server(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    # ---------- injection ----------
+
+    def scan(self, user_id: str, punch: int = 0, status: int = 1):
+        """Simulate a finger scan (thread-safe)"""
+        if self._thread and threading.current_thread() is not self._thread:
+            self.loop.call_soon_threadsafe(self.scan, user_id, punch, status)
+            return
+
+        user_id = str(user_id)
+        user = self.device.find_user(user_id)
+        timestamp = datetime.now().replace(microsecond=0)
+        self.device.attendance.append((user.uid if user else int(user_id), user_id, status, timestamp, punch))
+        self.stats["scans"] += 1
+        for connection in list(self.connections):
+            connection.push_scan(user_id, status, punch, timestamp)
+
+    async def disconnect_all(self, outage: float = 0.0):
+        """
+        Drop every client connection; with outage, also stop accepting
+        connections for that many seconds (a switch or power blip)
+        """
+        self.stats["disconnects"] += 1
+        logger.info(f"Dropping {len(self.connections)} connection(s), outage {outage}s")
+        if outage:
+            await self.close_server()
+        for connection in list(self.connections):
+            connection.writer.transport.abort()
+        if outage:
+            await asyncio.sleep(outage)
+            await self.listen()
+
+    async def run_scan_rate(self, rate: float):
+        """Inject random user scans as a Poisson process of rate scans/second"""
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            if self.device.users:
+                self.scan(random.choice(list(self.device.users.values())).user_id)
+
+    async def run_script(self, path: str, repeat: bool = False):
+        """Replay "<delay seconds> <user_id> [punch]" lines"""
+        with open(path) as f:
+            steps = [line.split() for line in f if line.strip() and not line.startswith("#")]
+        while True:
+            for step in steps:
+                await asyncio.sleep(float(step[0]))
+                self.scan(step[1], int(step[2]) if len(step) > 2 else 0)
+            if not repeat:
+                return
+
+    async def run_disconnects(self, every: float, outage: float):
+        while True:
+            await asyncio.sleep(every)
+            await self.disconnect_all(outage)
+
+
+async def _main(args):
+    device = SimulatedDevice(users=args.users, fingers_per_user=args.fingers, records=args.records)
+    simulator = ZKSimulator(args.host, args.port, device, latency=args.latency_ms / 1000, loss=args.loss)
+    await simulator.listen()
+
+    tasks = []
+    if args.scan_rate:
+        tasks.append(simulator.run_scan_rate(args.scan_rate))
+    if args.script:
+        tasks.append(simulator.run_script(args.script, args.repeat))
+    if args.disconnect_every:
+        tasks.append(simulator.run_disconnects(args.disconnect_every, args.outage))
+
+    async def report():
+        while True:
+            await asyncio.sleep(10)
+            logger.info(f"Stats: {simulator.stats}")
+
+    tasks.append(report())
+    await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ZKTeco reader simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4370)
+    parser.add_argument("--users", type=int, default=50, help="users on the simulated device")
+    parser.add_argument("--fingers", type=int, default=1, help="templates per user")
+    parser.add_argument("--records", type=int, default=0, help="historical attendance records")
+    parser.add_argument("--scan-rate", type=float, default=0, help="random scans per second")
+    parser.add_argument("--script", help="scan script: '<delay seconds> <user_id> [punch]' per line")
+    parser.add_argument("--repeat", action="store_true", help="loop the scan script")
+    parser.add_argument("--latency-ms", type=float, default=0, help="mean response latency")
+    parser.add_argument("--loss", type=float, default=0, help="probability of dropping a response")
+    parser.add_argument("--disconnect-every", type=float, default=0, help="drop all connections every N seconds")
+    parser.add_argument("--outage", type=float, default=0, help="seconds to refuse connections after a drop")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()